@@ -0,0 +1,27 @@
+"""Store question embeddings in qa_cache for semantic cache hits
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by init_db() already have the column
+    columns = [column["name"] for column in sa.inspect(op.get_bind()).get_columns("qa_cache")]
+    if "question_embedding" not in columns:
+        op.add_column("qa_cache", sa.Column("question_embedding", sa.LargeBinary(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("qa_cache", "question_embedding")
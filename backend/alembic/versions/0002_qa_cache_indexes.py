@@ -0,0 +1,30 @@
+"""Add qa_cache indexes for lookups and eviction
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by init_db() already have the indexes
+    existing = [index["name"] for index in sa.inspect(op.get_bind()).get_indexes("qa_cache")]
+    if "ix_qa_cache_candidate_question" not in existing:
+        op.create_index("ix_qa_cache_candidate_question", "qa_cache", ["candidate_id", "question_hash"])
+    if "ix_qa_cache_last_used" not in existing:
+        op.create_index("ix_qa_cache_last_used", "qa_cache", ["last_used"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_qa_cache_last_used", table_name="qa_cache")
+    op.drop_index("ix_qa_cache_candidate_question", table_name="qa_cache")
@@ -0,0 +1,27 @@
+"""Record the worker process running each ingestion job
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by init_db() already have the column
+    columns = [column["name"] for column in sa.inspect(op.get_bind()).get_columns("ingestion_jobs")]
+    if "worker" not in columns:
+        op.add_column("ingestion_jobs", sa.Column("worker", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("ingestion_jobs", "worker")
@@ -0,0 +1,27 @@
+"""Record when each ingestion job was last reported alive by its worker
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 18:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by init_db() already have the column
+    columns = [column["name"] for column in sa.inspect(op.get_bind()).get_columns("ingestion_jobs")]
+    if "heartbeat_at" not in columns:
+        op.add_column("ingestion_jobs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("ingestion_jobs", "heartbeat_at")
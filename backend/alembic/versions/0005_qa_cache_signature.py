@@ -0,0 +1,27 @@
+"""Record the candidate signature each cached answer was generated under
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 20:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Databases created by init_db() already have the column
+    columns = [column["name"] for column in sa.inspect(op.get_bind()).get_columns("qa_cache")]
+    if "signature" not in columns:
+        op.add_column("qa_cache", sa.Column("signature", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("qa_cache", "signature")
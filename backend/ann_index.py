@@ -0,0 +1,83 @@
+from typing import Optional, Tuple
+import numpy as np
+
+# Rows assigned to centroids per step, bounding the (rows, n_lists) score temporary
+ASSIGN_BLOCK_ROWS = 8192
+
+# k-means is trained on at most this many rows per list, then every row is assigned
+TRAINING_ROWS_PER_LIST = 256
+
+def default_n_lists(n_rows: int) -> int:
+    """Number of inverted lists for a corpus: about sqrt(n), as usual for IVF."""
+    return max(1, int(round(np.sqrt(n_rows))))
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(len(embeddings), dtype=np.int32)
+    for start in range(0, len(embeddings), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def build_ivf(embeddings: np.ndarray, n_lists: Optional[int] = None,
+              iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Cluster normalized embeddings with spherical k-means into an inverted file.
+
+    Returns (centroids, offsets, rows): rows holds row ids grouped by list and
+    list i spans rows[offsets[i]:offsets[i + 1]].
+    """
+    n_rows = len(embeddings)
+    n_lists = min(n_lists or default_n_lists(n_rows), n_rows)
+    rng = np.random.default_rng(seed)
+
+    training = embeddings
+    if n_rows > n_lists * TRAINING_ROWS_PER_LIST:
+        training = embeddings[np.sort(rng.choice(n_rows, n_lists * TRAINING_ROWS_PER_LIST, replace=False))]
+    training = np.asarray(training, dtype=np.float32)
+
+    centroids = training[rng.choice(len(training), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(training, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, training)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        empty = norms[:, 0] == 0
+        sums[empty] = centroids[empty]
+        norms[empty] = 1.0
+        centroids = sums / norms
+
+    assignments = _assign(embeddings, centroids)
+    rows = np.argsort(assignments, kind="stable").astype(np.int32)
+    counts = np.bincount(assignments, minlength=n_lists)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return centroids.astype(np.float32), offsets, rows
+
+class IVFIndex:
+    """Inverted file over one document's rows: only the closest lists are scored."""
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def nbytes(self) -> int:
+        return self.centroids.nbytes + self.offsets.nbytes + self.rows.nbytes
+
+    def probe(self, query: np.ndarray, n_probe: int, min_rows: int = 0) -> np.ndarray:
+        """Row ids of the n_probe lists closest to a normalized query.
+
+        More lists are probed when needed to return at least min_rows rows.
+        """
+        order = np.argsort(-(self.centroids @ query))
+        sizes = self.offsets[order + 1] - self.offsets[order]
+        n_probe = max(1, min(n_probe, self.n_lists))
+        covered = np.cumsum(sizes)
+        if covered[n_probe - 1] < min_rows:
+            n_probe = min(int(np.searchsorted(covered, min_rows)) + 1, self.n_lists)
+        lists = order[:n_probe]
+        return np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in lists])
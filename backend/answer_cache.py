@@ -0,0 +1,118 @@
+import time
+import asyncio
+import threading
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import bindparam, or_, update
+from cache import LRUCache
+from config import settings
+from database import AsyncSessionLocal, Candidate, QACache
+from metrics import errors
+
+def candidate_signature(candidate: Candidate) -> str:
+    """Everything about a candidate that changes the correct answer to a question.
+
+    Part of every in-memory cache key, so a worker never serves an answer
+    cached before a document upload or a tone change made through another worker.
+    """
+    return "|".join(str(value) for value in (
+        candidate.tone,
+        candidate.response_length,
+        candidate.program_processed_at,
+        candidate.talking_points_processed_at,
+        candidate.competitive_processed_at
+    ))
+
+def signature_matches(signature: str):
+    """QACache filter for answers generated under this candidate signature.
+
+    An answer that was queued or in flight when the candidate changed is
+    written after invalidate_cached_answers() and must never be served.
+    Rows cached before signatures were stored are kept: the first
+    invalidation deletes them.
+    """
+    return or_(QACache.signature == signature, QACache.signature.is_(None))
+
+class AnswerCache:
+    """In-process L1 in front of QACache, with write-behind hit counters.
+
+    Hits are counted in memory and flushed to QACache.hit_count/last_used in
+    one batched UPDATE every few seconds instead of a write per hit.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._entries = LRUCache(max_entries=max_entries)
+        self._pending_hits = {}
+        self._lock = threading.Lock()
+
+    def get(self, candidate_id: int, signature: str, question_hash: str) -> Optional[Tuple[int, str]]:
+        """(QACache id, answer) of a cached question, if present and fresh."""
+        key = (candidate_id, signature, question_hash)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        cache_id, answer, expires_at = entry
+        if time.monotonic() > expires_at:
+            self._entries.pop(key)
+            return None
+        return cache_id, answer
+
+    def put(self, candidate_id: int, signature: str, question_hash: str, cache_id: int, answer: str):
+        self._entries.put((candidate_id, signature, question_hash), (cache_id, answer, time.monotonic() + self.ttl))
+
+    def record_hit(self, cache_id: int):
+        with self._lock:
+            hits, _ = self._pending_hits.get(cache_id, (0, None))
+            self._pending_hits[cache_id] = (hits + 1, datetime.utcnow())
+
+    def invalidate(self, candidate_id: int):
+        self._entries.discard_where(lambda key: key[0] == candidate_id)
+
+    async def flush(self):
+        """Write accumulated hit counters to QACache in one batch."""
+        with self._lock:
+            pending, self._pending_hits = self._pending_hits, {}
+        if not pending:
+            return
+
+        table = QACache.__table__
+        stmt = update(table).where(table.c.id == bindparam("cache_id")).values(
+            hit_count=table.c.hit_count + bindparam("hits"),
+            last_used=bindparam("used_at")
+        )
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt, [
+                    {"cache_id": cache_id, "hits": hits, "used_at": used_at}
+                    for cache_id, (hits, used_at) in pending.items()
+                ])
+                await db.commit()
+        except Exception:
+            # Keep the counts for the next flush
+            with self._lock:
+                for cache_id, (hits, used_at) in pending.items():
+                    newer_hits, newer_used_at = self._pending_hits.get(cache_id, (0, used_at))
+                    self._pending_hits[cache_id] = (hits + newer_hits, newer_used_at)
+            raise
+
+    async def run_flusher(self, interval: float):
+        """Flush hit counters every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Answer cache flush failed: {e}")
+                errors.inc(kind="answer_cache_flush")
+
+    def stats(self) -> dict:
+        stats = self._entries.stats()
+        with self._lock:
+            stats["pending_hit_updates"] = len(self._pending_hits)
+        return stats
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_SIZE,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,183 @@
+"""
+Load benchmark: the public chat endpoint under concurrent voters.
+
+Usage: python benchmarks/bench_chat.py [--candidates 20] [--chunks 500] [--requests 2000]
+                                       [--concurrency 50] [--questions 100]
+                                       [--llm-latency-ms 800] [--llm-jitter-ms 200]
+                                       [--input-tokens 1500] [--output-tokens 250]
+                                       [--stub-embeddings] [--seed 0]
+
+Runs the FastAPI app in-process against a fresh SQLite database in a temporary
+directory, with mistral_client replaced by a stub that sleeps for the given
+latency and reports the given token counts. Seeds --candidates candidates with
+--chunks synthetic program chunks each, then sends --requests questions to
+/api/chat/{slug}/message from --concurrency concurrent clients, picking a
+random candidate and one of --questions questions each time (a smaller pool
+means more cache hits). Reports throughput, end-to-end p50/p95/p99 and the
+same percentiles per hot-path stage. --stub-embeddings replaces the
+embedding model with a hash-based encoder.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+
+# Add parent directory to path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+from synthetic import question_pool, stub_encode, synthetic_text
+
+def stub_complete(latency_ms: float, jitter_ms: float, input_tokens: int, output_tokens: int, seed: int):
+    """Stand-in for mistral_client.chat.complete_async."""
+    rng = random.Random(seed)
+
+    async def complete_async(**kwargs):
+        await asyncio.sleep(max(0.0, rng.gauss(latency_ms, jitter_ms)) / 1000.0)
+        question = kwargs["messages"][-1]["content"]
+        message = SimpleNamespace(content=f"Réponse simulée à la question : {question}")
+        usage = SimpleNamespace(prompt_tokens=input_tokens, completion_tokens=output_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+    return complete_async
+
+def seed_candidates(n_candidates: int, n_chunks: int, encode, rng: random.Random) -> list:
+    """Create candidates with a processed synthetic program. Returns their slugs."""
+    from database import SessionLocal, Candidate
+    from vector_store import save_document_vectors
+
+    db = SessionLocal()
+    slugs = []
+    try:
+        for i in range(n_candidates):
+            candidate = Candidate(
+                email=f"bench{i}@example.org",
+                hashed_password="benchmark",
+                name=f"Candidat {i}",
+                slug=f"bench-{i}",
+                program_uploaded=True,
+                program_filename="programme.pdf",
+                program_processed=True,
+                program_processed_at=datetime.utcnow()
+            )
+            db.add(candidate)
+            db.commit()
+
+            chunks = [synthetic_text(rng, 150) for _ in range(n_chunks)]
+            metadata = [{"page": j // 4 + 1, "chunk": j % 4, "source": "programme.pdf"} for j in range(n_chunks)]
+            save_document_vectors(candidate.id, "program", chunks, metadata, encode(chunks), source="programme.pdf")
+            slugs.append(candidate.slug)
+    finally:
+        db.close()
+    return slugs
+
+def percentiles(values) -> str:
+    values = np.array(values) * 1000
+    return (f"p50 {np.percentile(values, 50):9.2f} ms   p95 {np.percentile(values, 95):9.2f} ms   "
+            f"p99 {np.percentile(values, 99):9.2f} ms")
+
+async def run(args, slugs: list, questions: list):
+    import httpx
+    import main
+
+    await main.startup_event()
+    rng = random.Random(args.seed)
+    latencies = []
+    statuses = defaultdict(int)
+    cached = 0
+    remaining = args.requests
+
+    async def client_loop(client, client_id: int):
+        nonlocal remaining, cached
+        while remaining > 0:
+            remaining -= 1
+            slug = rng.choice(slugs)
+            question = rng.choice(questions)
+            start = time.perf_counter()
+            response = await client.post(
+                f"/api/chat/{slug}/message",
+                json={"question": question},
+                headers={"X-Forwarded-For": f"10.{client_id // 256}.{client_id % 256}.{rng.randint(1, 254)}"}
+            )
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            if response.status_code == 200 and response.json().get("cached"):
+                cached += 1
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[client_loop(client, i) for i in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+    await main.shutdown_event()
+    return latencies, statuses, cached, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=500, help="Program chunks per candidate")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--questions", type=int, default=100, help="Distinct questions voters pick from")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200.0)
+    parser.add_argument("--input-tokens", type=int, default=1500)
+    parser.add_argument("--output-tokens", type=int, default=250)
+    parser.add_argument("--stub-embeddings", action="store_true", help="Use a hash-based encoder instead of the model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Everything (SQLite database, vectors) lives in a scratch directory
+    workdir = tempfile.mkdtemp(prefix="bench_chat_")
+    os.chdir(workdir)
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ.setdefault("RATE_LIMIT_PER_DAY", str(10 ** 9))
+
+    import document_processor
+    import llm
+    import metrics
+    from database import init_db
+
+    if args.stub_embeddings:
+        document_processor.create_embeddings = stub_encode
+        document_processor.query_batcher.encode = stub_encode
+    llm.mistral_client.chat.complete_async = stub_complete(
+        args.llm_latency_ms, args.llm_jitter_ms, args.input_tokens, args.output_tokens, args.seed
+    )
+
+    # Keep raw stage durations for exact percentiles
+    stages = defaultdict(list)
+    observe = metrics.stage_seconds.observe
+
+    def record(value, **labels):
+        stages[labels["stage"]].append(value)
+        observe(value, **labels)
+    metrics.stage_seconds.observe = record
+
+    init_db()
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    slugs = seed_candidates(args.candidates, args.chunks, document_processor.create_embeddings, rng)
+    print(f"Seeded {args.candidates} candidates x {args.chunks} chunks in {time.perf_counter() - started:.1f}s ({workdir})")
+    stages.clear()
+
+    latencies, statuses, cached, elapsed = asyncio.run(run(args, slugs, question_pool(args.questions)))
+
+    print(f"\n{len(latencies)} requests, {args.concurrency} concurrent, LLM stub {args.llm_latency_ms:.0f}"
+          f"±{args.llm_jitter_ms:.0f} ms ({'stub encoder' if args.stub_embeddings else 'SentenceTransformer'})")
+    print(f"status codes   {dict(statuses)}")
+    print(f"throughput     {len(latencies) / elapsed:9.1f} req/s")
+    print(f"cached answers {cached / max(1, len(latencies)):9.1%}")
+    print(f"llm calls      {llm.llm_calls.stats()}")
+    print(f"\n{'end-to-end':<14} {percentiles(latencies)}   n={len(latencies)}")
+    for stage, values in sorted(stages.items(), key=lambda item: -np.sum(item[1])):
+        print(f"{stage:<14} {percentiles(values)}   n={len(values)}")
+
+if __name__ == "__main__":
+    main()
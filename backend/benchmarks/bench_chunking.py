@@ -0,0 +1,151 @@
+"""
+Quality benchmark: retrieval and prompt size, 1000-word windows versus sentence units with parents.
+
+Usage: python benchmarks/bench_chunking.py [--file programme.pdf] [--pages 30] [--words-per-page 400]
+                                           [--queries 200] [--query-drop 0.2] [--k 5]
+                                           [--parent-words 250] [--stub-embeddings] [--seed 0]
+
+Chunks a document (--file, PDF or DOCX, or a synthetic program of --pages
+pages) with both strategies and embeds the chunks. Queries are sentences of
+the document with --query-drop of their words removed; a query is answered
+when its sentence is in the text that reaches the prompt for a retrieved
+chunk (the chunk itself for word windows, its parent passage for sentence
+units). Reports recall@1, recall@k and MRR over the top --k chunks, the
+context tokens the top k would put in the prompt (raw, as before, and after
+context assembly), and recall once packed into the concise context budget.
+--stub-embeddings replaces the embedding model with a hash-based encoder:
+the pipeline runs, but the quality figures mean nothing.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import numpy as np
+
+# Add parent directory to path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+from synthetic import stub_encode, synthetic_text
+
+def load_pages(args, rng: random.Random) -> list:
+    """(page number, text) of the benchmarked document."""
+    if args.file:
+        from extraction import extract_text_from_docx, extract_text_from_pdf
+        if args.file.lower().endswith(".pdf"):
+            return extract_text_from_pdf(args.file, max_pages=10 ** 6)
+        return extract_text_from_docx(args.file)
+    pages = []
+    for page in range(1, args.pages + 1):
+        paragraphs = []
+        words = args.words_per_page
+        while words > 0:
+            length = min(words, rng.randint(40, 150))
+            paragraphs.append(synthetic_text(rng, length))
+            words -= length
+        pages.append((page, "\n".join(paragraphs)))
+    return pages
+
+def make_queries(pages: list, n_queries: int, drop: float, rng: random.Random) -> list:
+    """(query, sentence) pairs: sentences of at least 8 words with some words dropped."""
+    from chunking import split_paragraphs, split_sentences
+    sentences = [
+        sentence for _, text in pages
+        for paragraph in split_paragraphs(text)
+        for sentence in split_sentences(paragraph)
+        if len(sentence.split()) >= 8
+    ]
+    queries = []
+    for sentence in rng.sample(sentences, min(n_queries, len(sentences))):
+        words = sentence.split()
+        kept = [word for word in words if rng.random() >= drop] or words
+        queries.append((" ".join(kept), sentence))
+    return queries
+
+def evaluate(name: str, chunker, pages: list, queries: list, encode, k: int):
+    from context_assembly import assemble_context, context_token_budget, estimate_tokens
+
+    started = time.perf_counter()
+    sections = []
+    for page, text in pages:
+        units, parents, parent_ids = chunker.split(text)
+        for i, unit in enumerate(units):
+            section = {"text": unit, "page": page, "source": "bench", "doc_type": "program"}
+            if parents is not None:
+                section["parent"] = parents[parent_ids[i]]
+            sections.append(section)
+    embeddings = np.asarray(encode([section["text"] for section in sections]), dtype=np.float32)
+    embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    index_seconds = time.perf_counter() - started
+
+    query_embeddings = np.asarray(encode([query for query, _ in queries]), dtype=np.float32)
+    query_embeddings /= np.maximum(np.linalg.norm(query_embeddings, axis=1, keepdims=True), 1e-12)
+    scores = query_embeddings @ embeddings.T
+
+    budget = context_token_budget("concise")
+    hits_at_1 = hits_at_k = budget_hits = 0
+    reciprocal_ranks = []
+    raw_tokens, assembled_tokens = [], []
+    for (_, sentence), row in zip(queries, scores):
+        top = np.argsort(-row)[:k]
+        results = [sections[i] for i in top]
+        prompt_texts = [result.get("parent") or result["text"] for result in results]
+        ranks = [rank for rank, text in enumerate(prompt_texts, start=1) if sentence in text]
+        hits_at_1 += bool(ranks) and ranks[0] == 1
+        hits_at_k += bool(ranks)
+        reciprocal_ranks.append(1.0 / ranks[0] if ranks else 0.0)
+
+        # Before context assembly, the prompt got the retrieved texts as is
+        raw_tokens.append(sum(estimate_tokens(text) for text in prompt_texts))
+        context, _ = assemble_context(results, 10 ** 9)
+        assembled_tokens.append(sum(estimate_tokens(section["text"]) for section in context))
+        packed, _ = assemble_context(results, budget)
+        budget_hits += any(sentence in section["text"] for section in packed)
+
+    n = len(queries)
+    words = [len(section["text"].split()) for section in sections]
+    print(f"{name:<10} {len(sections):6d} chunks  {np.mean(words):7.1f} words/chunk  "
+          f"index {index_seconds:6.2f}s\n"
+          f"{'':<10} recall@1 {hits_at_1 / n:6.1%}  recall@{k} {hits_at_k / n:6.1%}  MRR {np.mean(reciprocal_ranks):.3f}  "
+          f"recall in {budget}-token budget {budget_hits / n:6.1%}\n"
+          f"{'':<10} context tokens/request: raw {np.mean(raw_tokens):7.0f}  assembled {np.mean(assembled_tokens):7.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", help="PDF or DOCX to chunk instead of a synthetic program")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-drop", type=float, default=0.2, help="Fraction of words removed from each query")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per query, as in the chat endpoint")
+    parser.add_argument("--parent-words", type=int, default=None, help="Defaults to CHUNK_PARENT_WORDS")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Use a hash-based encoder instead of the model")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from chunking import SPECIAL_TOKENS, SentenceChunker, WordWindowChunker, estimate_tokens
+    from config import settings
+
+    if args.stub_embeddings:
+        encode, count_tokens, max_tokens = stub_encode, estimate_tokens, 128 - SPECIAL_TOKENS
+    else:
+        import document_processor
+        model = document_processor.get_embedding_model()
+        encode, count_tokens = document_processor.create_embeddings, document_processor.count_model_tokens
+        max_tokens = model.max_seq_length - SPECIAL_TOKENS
+
+    rng = random.Random(args.seed)
+    pages = load_pages(args, rng)
+    queries = make_queries(pages, args.queries, args.query_drop, rng)
+    print(f"{len(pages)} pages, {len(queries)} queries ({args.query_drop:.0%} of words dropped), top {args.k}, "
+          f"{'stub encoder' if args.stub_embeddings else 'SentenceTransformer'} "
+          f"(encodes at most {max_tokens} tokens per chunk)\n")
+
+    parent_words = args.parent_words or settings.CHUNK_PARENT_WORDS
+    evaluate("words", WordWindowChunker(), pages, queries, encode, args.k)
+    evaluate("sentence", SentenceChunker(max_tokens, parent_words, count_tokens=count_tokens),
+             pages, queries, encode, args.k)
+
+if __name__ == "__main__":
+    main()
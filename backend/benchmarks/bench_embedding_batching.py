@@ -0,0 +1,92 @@
+"""
+Load benchmark: micro-batched query embedding versus one encode call per request.
+
+Usage: python benchmarks/bench_embedding_batching.py [--concurrency 32] [--requests 20]
+                                                       [--window-ms 2] [--max-batch 32] [--stub]
+
+Each of --concurrency threads (standing in for the request threadpool) embeds
+--requests distinct questions back to back, first calling the model directly
+with a batch of one, then going through EmbeddingBatcher. Reports p50/p99
+latency per query and overall throughput. --stub replaces the model with a
+synthetic encoder whose cost is a fixed overhead plus a per-text cost.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+# Add parent directory to path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+from embedding_batcher import EmbeddingBatcher
+
+def stub_encoder(overhead_ms: float = 8.0, per_text_ms: float = 0.5):
+    """Encoder with the cost profile of a batched forward pass, holding one core."""
+    lock = threading.Lock()
+
+    def encode(texts):
+        with lock:
+            time.sleep((overhead_ms + per_text_ms * len(texts)) / 1000.0)
+        return np.random.default_rng(len(texts)).standard_normal((len(texts), 512)).astype(np.float32)
+    return encode
+
+def run(embed, concurrency: int, requests: int) -> tuple:
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        local = []
+        for i in range(requests):
+            text = f"Question {worker_id}-{i} : que proposez-vous pour le quartier {i} ?"
+            start = time.perf_counter()
+            embed(text)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return np.array(latencies) * 1000, elapsed
+
+def report(name: str, latencies_ms: np.ndarray, elapsed: float):
+    print(f"{name:<12} p50 {np.percentile(latencies_ms, 50):8.1f} ms   "
+          f"p99 {np.percentile(latencies_ms, 99):8.1f} ms   "
+          f"throughput {len(latencies_ms) / elapsed:8.1f} q/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="Queries per thread")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--stub", action="store_true", help="Use a synthetic encoder instead of the model")
+    args = parser.parse_args()
+
+    if args.stub:
+        encode = stub_encoder()
+    else:
+        from document_processor import create_embeddings
+        encode = create_embeddings
+        encode(["warm-up"])
+
+    print(f"{args.concurrency} concurrent callers x {args.requests} queries "
+          f"({'stub encoder' if args.stub else 'SentenceTransformer'})")
+
+    latencies, elapsed = run(lambda text: encode([text])[0], args.concurrency, args.requests)
+    report("one-by-one", latencies, elapsed)
+
+    batcher = EmbeddingBatcher(encode, window_ms=args.window_ms, max_batch_size=args.max_batch)
+    latencies, elapsed = run(batcher.embed, args.concurrency, args.requests)
+    report("batched", latencies, elapsed)
+    print(f"batcher: {batcher.stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput benchmark: document ingestion (extract, chunk, embed, persist).
+
+Usage: python benchmarks/bench_ingestion.py [--pages 10 50 100] [--formats pdf docx]
+                                            [--words-per-page 400] [--repeat 3]
+                                            [--process-workers 2] [--stub-embeddings]
+
+For each size and format, generates --repeat synthetic programs of --pages
+pages and runs process_document on each, as a fresh candidate with text that
+no earlier run has seen, so every chunk goes through the model. Then
+re-ingests the last document for the same candidate to measure the
+incremental path, where every chunk is reused. Reports pages/s, chunks/s
+and the median time of each stage. --process-workers parses pages in a
+process pool, as the ingestion jobs do; 0 parses in-process.
+--stub-embeddings replaces the embedding model with a hash-based encoder,
+and chunk tokens are then estimated from words: the model is never loaded.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+from synthetic import StubEncoder, synthetic_text, write_docx, write_pdf
+
+STAGES = ("extract", "chunk", "embed", "persist")
+
+def ingest(process_document, path: str, candidate_id: int, filename: str, cpu_pool) -> tuple:
+    start = time.perf_counter()
+    result = process_document(path, candidate_id, filename, cpu_pool=cpu_pool)
+    return time.perf_counter() - start, result
+
+def report(label: str, runs: list):
+    elapsed = statistics.median(seconds for seconds, _ in runs)
+    result = runs[-1][1]
+    stages = "  ".join(
+        f"{stage} {statistics.median(r['timings_ms'][stage] for _, r in runs):8.1f}" for stage in STAGES
+    )
+    print(f"{label:<28} {result['total_pages'] / elapsed:8.1f} pages/s {result['total_chunks'] / elapsed:8.1f} chunks/s"
+          f"   median ms: {stages}   embedded {result['chunks_embedded']}/{result['total_chunks']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--formats", nargs="+", choices=["pdf", "docx"], default=["pdf", "docx"])
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--process-workers", type=int, default=2, help="Page parsing processes (0: in-process)")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Use a hash-based encoder instead of the model")
+    args = parser.parse_args()
+
+    # Vectors and chunk stores are written relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="bench_ingestion_")
+    os.chdir(workdir)
+
+    import document_processor
+    if args.stub_embeddings:
+        # The chunker also asks the model for its tokenizer and max sequence length
+        document_processor.embedding_model = StubEncoder()
+
+    cpu_pool = None
+    if args.process_workers:
+        cpu_pool = ProcessPoolExecutor(args.process_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    print(f"{args.words_per_page} words/page, {args.process_workers} parsing processes, "
+          f"{'stub encoder' if args.stub_embeddings else 'SentenceTransformer'} ({workdir})\n")
+    candidate_id = 0
+    seed = 0
+    try:
+        for fmt in args.formats:
+            for n_pages in args.pages:
+                runs = []
+                for _ in range(args.repeat):
+                    # Distinct text per run, so neither chunk store can skip the model
+                    seed += 1
+                    rng = random.Random(seed)
+                    pages = [synthetic_text(rng, args.words_per_page) for _ in range(n_pages)]
+                    filename = f"programme_{seed}.{fmt}"
+                    path = os.path.join(workdir, filename)
+                    (write_pdf if fmt == "pdf" else write_docx)(path, pages)
+                    candidate_id += 1
+                    runs.append(ingest(document_processor.process_document, path, candidate_id, filename, cpu_pool))
+                report(f"{fmt} {n_pages:>4} pages", runs)
+
+                # Same document again for the same candidate: all chunks reused
+                rerun = [ingest(document_processor.process_document, path, candidate_id, filename, cpu_pool)]
+                report(f"{fmt} {n_pages:>4} pages re-ingest", rerun)
+    finally:
+        if cpu_pool is not None:
+            cpu_pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Recall benchmark for the vector storage dtypes (float32, float16, int8).
+
+Usage: python benchmarks/bench_quantization.py [--file ../sample_program.md] [--k 5]
+
+Embeds the sections of a sample program with the production embedding model,
+stores them in each storage dtype and compares the top-k results of a set of
+voter questions against the float32 ranking. Also reports bytes per candidate
+and mean scoring time.
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add parent directory to path to import our modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+from document_processor import create_embeddings
+from synthetic import QUESTIONS
+from vector_store import STORAGE_DTYPES, normalize_embeddings, quantize_embeddings, score_embeddings
+
+def load_sections(path: str, min_words: int = 5) -> list:
+    """Split a markdown program into paragraph-sized sections."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    sections = []
+    for block in text.split("\n\n"):
+        block = block.strip()
+        if len(block.split()) >= min_words:
+            sections.append(block)
+    return sections
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=os.path.join(os.path.dirname(__file__), "..", "..", "sample_program.md"))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=200, help="Scoring repetitions for timing")
+    args = parser.parse_args()
+
+    sections = load_sections(args.file)
+    print(f"Corpus: {len(sections)} sections from {args.file}")
+    corpus = normalize_embeddings(create_embeddings(sections))
+    queries = normalize_embeddings(create_embeddings(QUESTIONS))
+
+    reference = [top_k(corpus @ q, args.k) for q in queries]
+
+    print(f"\n{'dtype':<8} {'bytes':>10} {'ratio':>6} {'recall@' + str(args.k):>9} {'top1':>6} {'max |Δscore|':>13} {'µs/query':>9}")
+    for dtype in STORAGE_DTYPES:
+        matrix, scales = quantize_embeddings(corpus, dtype)
+        stored_bytes = matrix.nbytes + (scales.nbytes if scales is not None else 0)
+
+        recalls, top1, max_error = [], [], 0.0
+        for q, expected in zip(queries, reference):
+            scores = score_embeddings(matrix, q, scales)
+            found = top_k(scores, args.k)
+            recalls.append(len(set(found) & set(expected)) / len(expected))
+            top1.append(found[0] == expected[0])
+            max_error = max(max_error, float(np.abs(scores - corpus @ q).max()))
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for q in queries:
+                top_k(score_embeddings(matrix, q, scales), args.k)
+        per_query_us = (time.perf_counter() - start) / (args.repeat * len(queries)) * 1e6
+
+        print(f"{dtype:<8} {stored_bytes:>10} {corpus.nbytes / stored_bytes:>5.1f}x "
+              f"{np.mean(recalls):>9.3f} {np.mean(top1):>6.2f} {max_error:>13.5f} {per_query_us:>9.1f}")
+
+if __name__ == "__main__":
+    main()
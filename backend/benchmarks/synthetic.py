@@ -0,0 +1,125 @@
+"""
+Synthetic data for the benchmarks and tests: program text, PDF/DOCX files and a stub encoder.
+"""
+import hashlib
+import random
+from typing import List
+import numpy as np
+
+VOCABULARY = (
+    "commune quartier habitants logement social rénovation énergétique écoles crèches "
+    "transports pistes cyclables sécurité police municipale propreté déchets recyclage "
+    "commerces centre-ville marché emploi jeunes seniors santé médecins culture sport "
+    "associations budget impôts locaux investissement concertation démocratie participative "
+    "environnement parcs arbres eau énergie solaire mobilité stationnement voirie éclairage "
+    "numérique services publics mairie conseil municipal projet mandat engagement proposition "
+    "création développement accompagnement solidarité inclusion handicap accessibilité famille "
+    "enfants éducation périscolaire cantine bio local agriculture patrimoine tourisme"
+).split()
+
+QUESTIONS = [
+    "Quel est votre programme sur la sécurité ?",
+    "Que proposez-vous pour l'écologie ?",
+    "Combien de pistes cyclables allez-vous créer ?",
+    "Quelles aides pour les personnes âgées ?",
+    "Que comptez-vous faire pour les écoles ?",
+    "Allez-vous baisser les impôts locaux ?",
+    "Quelle est votre position sur le logement social ?",
+    "Que prévoyez-vous pour les jeunes ?",
+    "Comment allez-vous soutenir les commerces du centre-ville ?",
+    "Quelles mesures pour la santé et l'accès aux médecins ?",
+    "Que ferez-vous pour la culture et le sport ?",
+    "Comment gérer les déchets et le recyclage ?",
+    "Quel budget pour la rénovation énergétique ?",
+    "Que proposez-vous pour les transports en commun ?",
+    "Comment associer les habitants aux décisions ?",
+]
+
+def synthetic_text(rng: random.Random, words: int) -> str:
+    """Sentences of random program vocabulary."""
+    sentences = []
+    while words > 0:
+        length = min(words, rng.randint(8, 20))
+        sentence = " ".join(rng.choice(VOCABULARY) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        words -= length
+    return " ".join(sentences)
+
+def question_pool(size: int) -> List[str]:
+    """size distinct voter questions, cycling through QUESTIONS with a numbered suffix."""
+    pool = []
+    for i in range(size):
+        question = QUESTIONS[i % len(QUESTIONS)]
+        rounds = i // len(QUESTIONS)
+        pool.append(f"{question} ({rounds + 1})" if rounds else question)
+    return pool
+
+def stub_encode(texts: List[str], dim: int = 512) -> np.ndarray:
+    """Deterministic pseudo-embeddings (same text, same vector) at a fraction of the model's cost."""
+    vectors = np.empty((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vectors[i] = np.random.default_rng(seed).standard_normal(dim)
+    return vectors
+
+class StubEncoder:
+    """Stands in for the SentenceTransformer: stub_encode vectors, no download.
+
+    It has no tokenizer, so document_processor sizes chunks with the
+    word-based token estimate instead of loading the real model for it.
+    """
+
+    tokenizer = None
+
+    def __init__(self, dim: int = 512, max_seq_length: int = 128):
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+        self.encoded = 0
+
+    def encode(self, texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        self.encoded += len(texts)
+        return stub_encode(texts, self.dim)
+
+def write_pdf(path: str, pages: List[str], chars_per_line: int = 90, lines_per_page: int = 60):
+    """Minimal uncompressed PDF with one Helvetica text page per entry (latin-1 text)."""
+    streams = []
+    for text in pages:
+        text = text.replace("\\", "").replace("(", "").replace(")", "")
+        lines = [text[i:i + chars_per_line] for i in range(0, len(text), chars_per_line)][:lines_per_page]
+        streams.append("BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET")
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    ]
+    for i, stream in enumerate(streams):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream.encode('latin-1'))} >>\nstream\n{stream}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_docx(path: str, pages: List[str], words_per_paragraph: int = 100):
+    """DOCX with the pages' text split into paragraphs."""
+    from docx import Document
+    document = Document()
+    for text in pages:
+        words = text.split()
+        for start in range(0, len(words), words_per_paragraph):
+            document.add_paragraph(" ".join(words[start:start + words_per_paragraph]))
+    document.save(path)
@@ -0,0 +1,79 @@
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from database import CostRollup
+
+class DailyCostTracker:
+    """Running LLM cost of each candidate for the current UTC day.
+
+    Seeded from cost_rollups at startup, then fed by log_cost with the
+    per-model totals returned by its cost_rollups upsert, so totals include
+    costs logged by other workers for the models this worker also uses.
+    Reading a total never touches the database.
+    """
+
+    def __init__(self):
+        self._day: Optional[date] = None
+        self._totals: Dict[Tuple[int, str], float] = {}
+        self._alerted = set()
+        self._lock = threading.Lock()
+
+    def record(self, candidate_id: int, model: str, day: date, model_total: float):
+        """Set today's total cost of one model for a candidate."""
+        with self._lock:
+            self._roll(day)
+            if day == self._day:
+                self._totals[(candidate_id, model)] = model_total
+
+    async def load(self, db: AsyncSession):
+        """Seed today's totals from cost_rollups (a restarted worker starts from zero otherwise)."""
+        today = datetime.utcnow().date()
+        result = await db.execute(
+            select(CostRollup.candidate_id, CostRollup.model, CostRollup.cost_usd).where(CostRollup.day == today)
+        )
+        for candidate_id, model, model_total in result.all():
+            self.record(candidate_id, model, today, model_total)
+
+    def daily_cost(self, candidate_id: int) -> float:
+        with self._lock:
+            self._roll(datetime.utcnow().date())
+            return sum(cost for (cid, _), cost in self._totals.items() if cid == candidate_id)
+
+    def first_alert(self, candidate_id: int) -> bool:
+        """True once per candidate and day, when its budget is first found exceeded."""
+        with self._lock:
+            if candidate_id in self._alerted:
+                return False
+            self._alerted.add(candidate_id)
+            return True
+
+    def _roll(self, day: date):
+        if self._day is None or day > self._day:
+            self._day = day
+            self._totals = {}
+            self._alerted = set()
+
+cost_tracker = DailyCostTracker()
+
+def select_model(candidate_id: int) -> Optional[str]:
+    """Model for the next chat completion of a candidate, or None to answer from cache only.
+
+    Once today's cost reaches DAILY_BUDGET_ALERT_USD, BUDGET_EXCEEDED_MODE
+    decides: "fallback" switches to BUDGET_FALLBACK_MODEL, "cache_only"
+    stops calling the LLM and "alert" only logs.
+    """
+    budget = settings.DAILY_BUDGET_ALERT_USD
+    if budget <= 0 or cost_tracker.daily_cost(candidate_id) < budget:
+        return settings.PRIMARY_MODEL
+    
+    if cost_tracker.first_alert(candidate_id):
+        print(f"Daily budget of ${budget:.2f} reached for candidate {candidate_id} "
+              f"({settings.BUDGET_EXCEEDED_MODE})")
+    if settings.BUDGET_EXCEEDED_MODE == "fallback":
+        return settings.BUDGET_FALLBACK_MODEL
+    if settings.BUDGET_EXCEEDED_MODE == "cache_only":
+        return None
+    return settings.PRIMARY_MODEL
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from answer_cache import answer_cache
+from config import settings
+from database import AsyncSessionLocal, QACache
+from metrics import errors
+
+# Order in which the answers of an over-capacity candidate are evicted
+EVICTION_ORDER = {
+    "lru": (QACache.last_used.asc(), QACache.id.asc()),
+    "lfu": (QACache.hit_count.asc(), QACache.last_used.asc(), QACache.id.asc())
+}
+
+class QACacheEvictor:
+    """Keeps the qa_cache table bounded.
+
+    Each pass deletes answers unused for max_age_days, then trims every
+    candidate to max_entries_per_candidate, dropping the least recently used
+    (lru) or least hit (lfu) answers first. Deletes run in batches of
+    batch_size rows, one transaction each. 0 disables a limit.
+    """
+
+    def __init__(self, max_entries_per_candidate: int, max_age_days: float, policy: str, batch_size: int):
+        if policy not in EVICTION_ORDER:
+            raise ValueError(f"Unknown QACache eviction policy: {policy}")
+        self.max_entries_per_candidate = max_entries_per_candidate
+        self.max_age_days = max_age_days
+        self.policy = policy
+        self.batch_size = batch_size
+        self.passes = 0
+        self.expired = 0
+        self.trimmed = 0
+
+    async def evict(self) -> dict:
+        """Run one eviction pass. Returns the number of expired and trimmed rows."""
+        # Pending hits count towards last_used/hit_count
+        await answer_cache.flush()
+        expired = trimmed = 0
+        async with AsyncSessionLocal() as db:
+            if self.max_age_days:
+                cutoff = datetime.utcnow() - timedelta(days=self.max_age_days)
+                expired = await self._delete_batches(db, select(QACache.id).where(
+                    or_(QACache.last_used < cutoff, QACache.last_used.is_(None))
+                ))
+
+            if self.max_entries_per_candidate:
+                result = await db.execute(
+                    select(QACache.candidate_id, func.count(QACache.id))
+                    .group_by(QACache.candidate_id)
+                    .having(func.count(QACache.id) > self.max_entries_per_candidate)
+                )
+                for candidate_id, count in result.all():
+                    trimmed += await self._delete_batches(
+                        db,
+                        select(QACache.id).where(QACache.candidate_id == candidate_id)
+                        .order_by(*EVICTION_ORDER[self.policy]),
+                        limit=count - self.max_entries_per_candidate
+                    )
+
+        self.passes += 1
+        self.expired += expired
+        self.trimmed += trimmed
+        return {"expired": expired, "trimmed": trimmed}
+
+    async def run(self, interval: float):
+        """Evict every interval seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict()
+            except Exception as e:
+                print(f"QACache eviction failed: {e}")
+                errors.inc(kind="qa_cache_eviction")
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "passes": self.passes,
+            "expired": self.expired,
+            "trimmed": self.trimmed
+        }
+
+    async def _delete_batches(self, db: AsyncSession, query, limit: Optional[int] = None) -> int:
+        deleted = 0
+        while limit is None or deleted < limit:
+            batch = self.batch_size if limit is None else min(self.batch_size, limit - deleted)
+            result = await db.execute(query.limit(batch))
+            ids = result.scalars().all()
+            if not ids:
+                break
+            await db.execute(delete(QACache).where(QACache.id.in_(ids)))
+            await db.commit()
+            deleted += len(ids)
+        return deleted
+
+qa_cache_evictor = QACacheEvictor(
+    max_entries_per_candidate=settings.QA_CACHE_MAX_ENTRIES_PER_CANDIDATE,
+    max_age_days=settings.QA_CACHE_MAX_AGE_DAYS,
+    policy=settings.QA_CACHE_EVICTION_POLICY,
+    batch_size=settings.QA_CACHE_EVICTION_BATCH_SIZE
+)
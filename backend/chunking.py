@@ -0,0 +1,174 @@
+import re
+import json
+import math
+from typing import Callable, List, Optional, Tuple
+from config import settings
+
+# Embedding-model tokens per word of French text, when the model's tokenizer is not available
+TOKENS_PER_WORD = 1.5
+# [CLS] and [SEP], added by the model to every encoded text
+SPECIAL_TOKENS = 2
+
+# Blank lines, a line starting a list item, or a line ending a sentence
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n|\n(?=\s*(?:[-•*–]|\d+[.)])\s)|(?<=[.!?:…])[ \t]*\n")
+# End punctuation (optionally closing a quote), whitespace, then what can start a sentence
+SENTENCE_BREAK = re.compile(r"(?:(?<=[.!?…])|(?<=[.!?…][»\")\]])|(?<=[.!?…]\s»))\s+(?=(?:[«\"(\[]\s?)?[A-ZÀ-ÖØ-Þ0-9])")
+# Abbreviations followed by a capitalized word that does not start a sentence
+ABBREVIATIONS = {"m.", "mm.", "mme.", "mmes.", "mlle.", "dr.", "pr.", "me.", "st.", "ste.", "av.", "bd.", "art.", "cf.", "n°."}
+
+# (unit texts, parent passages or None, parent index of each unit or None)
+Chunks = Tuple[List[str], Optional[List[str]], Optional[List[int]]]
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """Split text into overlapping chunks."""
+    words = text.split()
+    chunks = []
+
+    for i in range(0, len(words), chunk_size - overlap):
+        chunk = " ".join(words[i:i + chunk_size])
+        if chunk.strip():
+            chunks.append(chunk)
+
+    return chunks
+
+def split_paragraphs(text: str) -> List[str]:
+    """Paragraphs of extracted page text, each on one line."""
+    paragraphs = (" ".join(part.split()) for part in PARAGRAPH_BREAK.split(text))
+    return [paragraph for paragraph in paragraphs if paragraph]
+
+def split_sentences(paragraph: str) -> List[str]:
+    sentences = []
+    for piece in SENTENCE_BREAK.split(paragraph):
+        last_word = sentences[-1].rsplit(" ", 1)[-1].lower() if sentences else ""
+        # "M. Dupont", "J. Martin": the break was not the end of a sentence
+        if last_word in ABBREVIATIONS or re.fullmatch(r"\w\.", last_word):
+            sentences[-1] += " " + piece
+        else:
+            sentences.append(piece)
+    return sentences
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    return [math.ceil(len(text.split()) * TOKENS_PER_WORD) for text in texts]
+
+class WordWindowChunker:
+    """Fixed windows of words, each embedded and sent to the LLM as is (the original chunking)."""
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+
+    def split(self, text: str) -> Chunks:
+        return chunk_text(text, self.chunk_size, self.overlap), None, None
+
+class SentenceChunker:
+    """Small retrieval units made of whole sentences, linked to the larger passage around them.
+
+    Paragraphs are packed into parent passages of up to parent_words words
+    (long paragraphs are split between sentences). Each parent is cut into
+    units of consecutive sentences of at most max_tokens model tokens, so the
+    whole unit fits in what the embedding model actually encodes; a sentence
+    longer than that is split into even word windows. Search matches units,
+    and the prompt gets their parent passage.
+    """
+
+    def __init__(self, max_tokens: int, parent_words: int, overlap_sentences: int = 0,
+                 count_tokens: Callable[[List[str]], List[int]] = estimate_tokens):
+        self.max_tokens = max(8, max_tokens)
+        self.parent_words = max(1, parent_words)
+        self.overlap_sentences = max(0, overlap_sentences)
+        self.count_tokens = count_tokens
+
+    def split(self, text: str) -> Chunks:
+        paragraphs = [split_sentences(paragraph) for paragraph in split_paragraphs(text)]
+        sentences = [sentence for paragraph in paragraphs for sentence in paragraph]
+        if not sentences:
+            return [], [], []
+        tokens = dict(zip(sentences, self.count_tokens(sentences)))
+
+        units, parents, parent_ids = [], [], []
+        for parent in self._parents(paragraphs):
+            pieces = []
+            for sentence in parent:
+                pieces.extend(self._fit(sentence, tokens[sentence]))
+            for unit in self._pack(pieces):
+                units.append(" ".join(text for text, _ in unit))
+                parent_ids.append(len(parents))
+            parents.append(" ".join(parent))
+        return units, parents, parent_ids
+
+    def _parents(self, paragraphs: List[List[str]]) -> List[List[str]]:
+        """Sentences of each parent passage: whole paragraphs where they fit."""
+        parents = [[]]
+        size = 0
+        for paragraph in paragraphs:
+            for sentence in paragraph:
+                words = len(sentence.split())
+                if parents[-1] and size + words > self.parent_words:
+                    parents.append([])
+                    size = 0
+                parents[-1].append(sentence)
+                size += words
+            # Start the next paragraph in a new parent unless this one has room for some of it
+            if size >= self.parent_words / 2:
+                parents.append([])
+                size = 0
+        return [parent for parent in parents if parent]
+
+    def _fit(self, sentence: str, tokens: int) -> List[Tuple[str, int]]:
+        """The sentence as (text, tokens) pieces of at most max_tokens."""
+        if tokens <= self.max_tokens:
+            return [(sentence, tokens)]
+        words = sentence.split()
+        n_pieces = math.ceil(tokens / self.max_tokens)
+        # Word windows are even in words, not tokens: leave some slack
+        n_pieces = math.ceil(n_pieces * 1.2)
+        size = math.ceil(len(words) / n_pieces)
+        return [(" ".join(words[i:i + size]), math.ceil(tokens / n_pieces)) for i in range(0, len(words), size)]
+
+    def _pack(self, pieces: List[Tuple[str, int]]) -> List[List[Tuple[str, int]]]:
+        """Consecutive pieces grouped into units of at most max_tokens."""
+        units = []
+        current, size = [], 0
+        for piece in pieces:
+            if current and size + piece[1] > self.max_tokens:
+                units.append(current)
+                # Repeat the last sentences when they leave room for the new one
+                current = current[len(current) - self.overlap_sentences:] if self.overlap_sentences else []
+                size = sum(tokens for _, tokens in current)
+                while current and size + piece[1] > self.max_tokens:
+                    size -= current.pop(0)[1]
+            current.append(piece)
+            size += piece[1]
+        if current:
+            units.append(current)
+        return units
+
+CHUNKING_STRATEGIES = ("sentence", "words")
+
+def chunking_options(doc_type: str) -> dict:
+    """Settings for a document type: the defaults, with its CHUNKING_BY_DOC_TYPE overrides."""
+    options = {
+        "strategy": settings.CHUNKING_STRATEGY,
+        "max_tokens": settings.CHUNK_MAX_TOKENS,
+        "parent_words": settings.CHUNK_PARENT_WORDS,
+        "overlap_sentences": settings.CHUNK_OVERLAP_SENTENCES
+    }
+    options.update(json.loads(settings.CHUNKING_BY_DOC_TYPE or "{}").get(doc_type, {}))
+    return options
+
+def get_chunker(doc_type: str, count_tokens: Callable[[List[str]], List[int]] = estimate_tokens,
+                model_max_tokens: Optional[int] = None):
+    """Chunker configured for a document type.
+
+    count_tokens and model_max_tokens describe the embedding model; a
+    max_tokens of 0 means the model's maximum sequence length.
+    """
+    options = chunking_options(doc_type)
+    if options["strategy"] == "words":
+        return WordWindowChunker()
+    if options["strategy"] != "sentence":
+        raise ValueError(
+            f"Unsupported chunking strategy: {options['strategy']} (expected one of {', '.join(CHUNKING_STRATEGIES)})"
+        )
+    max_tokens = options["max_tokens"] or (model_max_tokens or 128) - SPECIAL_TOKENS
+    return SentenceChunker(max_tokens, options["parent_words"], options["overlap_sentences"], count_tokens)
@@ -12,6 +12,8 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./politic_chat.db"
+    ASYNC_DB_POOL_SIZE: int = 20  # Async connections per worker for the chat path
+    ASYNC_DB_MAX_OVERFLOW: int = 20
     CHROMA_PERSIST_DIR: str = "./chroma_db"
     
     # Production: Railway auto-provides DATABASE_URL as PostgreSQL
@@ -19,16 +21,62 @@ class Settings(BaseSettings):
     
     # Rate Limiting
     RATE_LIMIT_PER_DAY: int = 20
+    RATE_LIMIT_BACKEND: str = "database"  # database (shared by all workers) or memory (per worker)
+    
+    # Logging (conversations and costs are written in the background)
+    LOG_WRITE_BATCH_SIZE: int = 200  # Records per bulk insert
+    LOG_WRITE_INTERVAL_SECONDS: float = 1.0  # Max delay before queued records are written
+    LOG_WRITE_MAX_QUEUE: int = 10000  # Requests wait for room beyond this
     
     # Cost Monitoring
-    DAILY_BUDGET_ALERT_USD: float = 10.0
+    DAILY_BUDGET_ALERT_USD: float = 10.0  # Per candidate (0 = no budget)
+    BUDGET_EXCEEDED_MODE: str = "fallback"  # fallback (cheaper model), cache_only or alert
+    BUDGET_FALLBACK_MODEL: str = "mistral-small-latest"
+    
+    # Answer Cache
+    ANSWER_CACHE_SIZE: int = 5000  # Answers kept in memory per worker in front of QACache
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    ANSWER_CACHE_FLUSH_SECONDS: float = 10.0  # Interval of batched hit_count/last_used writes
+    QA_CACHE_MAX_ENTRIES_PER_CANDIDATE: int = 5000  # 0 = unlimited
+    QA_CACHE_MAX_AGE_DAYS: float = 90.0  # Evict answers unused for this long (0 = never)
+    QA_CACHE_EVICTION_POLICY: str = "lfu"  # lfu (hit_count, then last_used) or lru (last_used)
+    QA_CACHE_EVICTION_INTERVAL_SECONDS: float = 3600.0
+    QA_CACHE_EVICTION_BATCH_SIZE: int = 1000  # Rows deleted per transaction
+    SEMANTIC_CACHE_ENABLED: bool = True  # Serve cached answers to paraphrased questions
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92  # Min cosine similarity to a cached question
+    SEMANTIC_CACHE_REFRESH_SECONDS: float = 30.0  # Pick up answers cached by other workers
+    SEMANTIC_CACHE_MAX_CANDIDATES: int = 1000  # Candidates with a resident question index
     
     # Document Processing
     MAX_PAGES: int = 100
     MAX_FILE_SIZE_MB: int = 50
+    VECTOR_CACHE_MAX_MB: int = 512  # Per-process budget for resident candidate vectors
+    VECTOR_STORAGE_DTYPE: str = "float32"  # float32, float16 or int8 (scalar-quantized)
+    ANN_MIN_CHUNKS: int = 2000  # Build/use an IVF index from this many chunks; exact search below
+    ANN_NPROBE: int = 8  # Lists scored per query: higher is better recall, slower (0 = exact)
+    INGESTION_WORKERS: int = 2  # Documents ingested concurrently per process
+    INGESTION_PROCESS_WORKERS: int = 2  # Processes for CPU-bound text extraction
+    INGESTION_HEARTBEAT_SECONDS: float = 30.0  # How often a process marks its ingestion jobs alive
+    INGESTION_STALE_SECONDS: float = 300.0  # Jobs of another host without a heartbeat this long are failed
+    PDF_PAGES_PER_TASK: int = 10  # Pages per parallel extraction task
+    CHUNKING_STRATEGY: str = "sentence"  # sentence (small units expanded to their passage) or words (1000-word windows)
+    CHUNK_MAX_TOKENS: int = 0  # Embedded unit size in model tokens (0 = the embedding model's max sequence length)
+    CHUNK_PARENT_WORDS: int = 250  # Passage sent to the LLM for a retrieved unit
+    CHUNK_OVERLAP_SENTENCES: int = 0  # Sentences repeated at the start of the next unit
+    CHUNKING_BY_DOC_TYPE: str = '{}'  # JSON overrides per doc type, e.g. {"talking_points": {"parent_words": 120}}
+    SHARED_EMBEDDING_CACHE_MB: int = 1024  # Chunk embeddings shared across candidates (on disk)
+    QUERY_EMBEDDING_CACHE_SIZE: int = 10000  # Cached question embeddings per process
+    EMBED_BATCH_WINDOW_MS: float = 2.0  # Wait for concurrent queries before encoding a batch
+    EMBED_BATCH_MAX_SIZE: int = 32
+    SEARCH_EXECUTOR_WORKERS: int = 4  # Threads for embedding + vector search off the event loop
+    HYBRID_SEARCH_ENABLED: bool = True  # Fuse BM25 keyword matches with vector similarity
+    HYBRID_LEXICAL_WEIGHT: float = 1.0  # Weight of the keyword ranking in the fusion (vector ranking = 1)
+    HYBRID_CANDIDATES: int = 50  # Rows taken from each ranking before fusion
+    CONTEXT_TOKEN_BUDGET_CONCISE: int = 2000  # Estimated context tokens in the prompt, concise answers
+    CONTEXT_TOKEN_BUDGET_DETAILED: int = 4000  # Same, detailed answers
     
     # LLM Settings
-    PRIMARY_MODEL: str = "claude-3-haiku-20240307"
+    PRIMARY_MODEL: str = "mistral-small-latest"  # Must be priced in llm.PRICING
     FALLBACK_MODEL: str = "gpt-3.5-turbo"
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     
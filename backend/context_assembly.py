@@ -0,0 +1,117 @@
+import math
+from typing import Dict, List, Tuple
+from config import settings
+from metrics import timed
+
+# Mistral tokens per whitespace-separated word of French prose, roughly
+TOKENS_PER_WORD = 1.4
+# Shorter shared runs between two chunks are coincidence, not chunk overlap
+MIN_OVERLAP_WORDS = 20
+# A passage cut shorter than this is not worth its place in the prompt
+MIN_PASSAGE_TOKENS = 50
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text.split()) * TOKENS_PER_WORD)
+
+def context_token_budget(response_length: str) -> int:
+    """Context tokens allowed in the system prompt for a candidate's response length."""
+    if response_length == "detailed":
+        return settings.CONTEXT_TOKEN_BUDGET_DETAILED
+    return settings.CONTEXT_TOKEN_BUDGET_CONCISE
+
+def _overlap(left: List[str], right: List[str]) -> int:
+    """Number of words of the longest suffix of left that is a prefix of right (0 if too short)."""
+    if len(right) < MIN_OVERLAP_WORDS:
+        return 0
+    for start in range(max(0, len(left) - len(right)), len(left) - MIN_OVERLAP_WORDS + 1):
+        if left[start] == right[0] and left[start:] == right[:len(left) - start]:
+            return len(left) - start
+    return 0
+
+def _contains(outer: List[str], inner: List[str]) -> bool:
+    return len(inner) <= len(outer) and f" {' '.join(inner)} " in f" {' '.join(outer)} "
+
+def _merge_page(passages: List[dict]) -> List[dict]:
+    """Join overlapping passages of one page and drop those contained in another."""
+    merged = True
+    while merged:
+        merged = False
+        for a in passages:
+            for b in passages:
+                if a is b:
+                    continue
+                if _contains(a["words"], b["words"]):
+                    a["rank"] = min(a["rank"], b["rank"])
+                else:
+                    overlap = _overlap(a["words"], b["words"])
+                    if not overlap:
+                        continue
+                    a["words"] = a["words"] + b["words"][overlap:]
+                    a["rank"] = min(a["rank"], b["rank"])
+                passages.remove(b)
+                merged = True
+                break
+            if merged:
+                break
+    return passages
+
+def _truncate(words: List[str], max_words: int) -> List[str]:
+    """First max_words words, cut back to the last full sentence when that keeps at least half."""
+    words = words[:max_words]
+    for end in range(len(words), len(words) // 2, -1):
+        if words[end - 1].endswith((".", "!", "?")):
+            return words[:end]
+    return words
+
+@timed("context")
+def assemble_context(sections: List[Dict], max_tokens: int) -> Tuple[List[Dict], Dict]:
+    """Pack search results into at most max_tokens of context.
+
+    A hit on a small unit stands for its parent passage when it has one (see
+    chunking.SentenceChunker). Consecutive chunks of a page overlap by design,
+    so hits from the same page are merged into one passage, exact and
+    contained duplicates are dropped (units sharing a parent), and passages
+    are then taken in rank order (the rank of their best hit) until the
+    budget is spent, the last one cut at a sentence boundary.
+    Returns the passages, as sections in rank order, and token counts
+    (retrieved, counting each distinct text once, sent, saved).
+    """
+    texts = [section.get("parent") or section["text"] for section in sections]
+    # Hits sharing a parent retrieve it once
+    retrieved_tokens = sum(estimate_tokens(text) for text in set(texts))
+
+    pages = {}
+    for rank, (section, text) in enumerate(zip(sections, texts)):
+        key = (section.get("doc_type"), section.get("source"), section.get("page"))
+        pages.setdefault(key, []).append({"section": section, "words": text.split(), "rank": rank})
+
+    passages = []
+    for page_passages in pages.values():
+        passages.extend(_merge_page(page_passages))
+    passages.sort(key=lambda passage: passage["rank"])
+
+    assembled = []
+    seen = set()
+    remaining = max_tokens
+    for passage in passages:
+        text = " ".join(passage["words"])
+        # Same text under another page or document type
+        if text in seen:
+            continue
+        seen.add(text)
+
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            if remaining < MIN_PASSAGE_TOKENS:
+                break
+            text = " ".join(_truncate(passage["words"], int(remaining / TOKENS_PER_WORD)))
+            tokens = estimate_tokens(text)
+        assembled.append({**passage["section"], "text": text})
+        remaining -= tokens
+
+    sent_tokens = max_tokens - remaining
+    return assembled, {
+        "retrieved_tokens": retrieved_tokens,
+        "context_tokens": sent_tokens,
+        "tokens_saved": retrieved_tokens - sent_tokens
+    }
@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+import os
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, Boolean, Text, ForeignKey, LargeBinary, Index
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from datetime import datetime
 from config import settings
 
@@ -8,6 +11,26 @@ engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread":
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def get_async_database_url(url: str) -> str:
+    """Map the configured database URL to its asyncio driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+# Async engine used by the public chat path
+async_engine_options = {}
+if not settings.DATABASE_URL.startswith("sqlite:"):
+    async_engine_options = {
+        "pool_size": settings.ASYNC_DB_POOL_SIZE,
+        "max_overflow": settings.ASYNC_DB_MAX_OVERFLOW
+    }
+async_engine = create_async_engine(get_async_database_url(settings.DATABASE_URL), **async_engine_options)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 class Candidate(Base):
     __tablename__ = "candidates"
     
@@ -59,6 +82,15 @@ class Conversation(Base):
     
     candidate = relationship("Candidate", back_populates="conversations")
 
+class RateLimitCounter(Base):
+    """Messages sent per candidate, hashed IP and UTC day (database rate limit backend)."""
+    __tablename__ = "rate_limit_counters"
+    
+    candidate_id = Column(Integer, primary_key=True)
+    ip_hash = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    count = Column(Integer, nullable=False, default=0)
+
 class CostLog(Base):
     __tablename__ = "cost_logs"
     
@@ -73,8 +105,24 @@ class CostLog(Base):
     
     candidate = relationship("Candidate", back_populates="cost_logs")
 
+class CostRollup(Base):
+    """Daily LLM usage per candidate and model, updated as costs are logged."""
+    __tablename__ = "cost_rollups"
+    
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    model = Column(String, primary_key=True)
+    requests = Column(Integer, nullable=False, default=0)
+    input_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Float, nullable=False, default=0.0)
+
 class QACache(Base):
     __tablename__ = "qa_cache"
+    __table_args__ = (
+        Index("ix_qa_cache_candidate_question", "candidate_id", "question_hash"),
+        Index("ix_qa_cache_last_used", "last_used"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     candidate_id = Column(Integer, ForeignKey("candidates.id"), nullable=False, index=True)
@@ -82,11 +130,50 @@ class QACache(Base):
     question = Column(Text, nullable=False)
     answer = Column(Text, nullable=False)
     hit_count = Column(Integer, default=0)
+    question_embedding = Column(LargeBinary, nullable=True)  # Normalized float32, for semantic hits
+    signature = Column(String, nullable=True)  # candidate_signature() the answer was generated under
     created_at = Column(DateTime, default=datetime.utcnow)
     last_used = Column(DateTime, default=datetime.utcnow)
 
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(String, primary_key=True)  # UUID
+    candidate_id = Column(Integer, ForeignKey("candidates.id"), nullable=False, index=True)
+    doc_type = Column(String, nullable=False)  # program, talking_points, competitive
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    status = Column(String, default="queued")  # queued, running, succeeded, failed
+    stage = Column(String)  # extracting, chunking, embedding, persisting
+    pages_parsed = Column(Integer, default=0)
+    total_chunks = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    result = Column(Text)  # JSON stats returned by process_document
+    error = Column(Text)
+    worker = Column(String)  # host:pid of the process that runs the job
+    heartbeat_at = Column(DateTime)  # Last time that process reported the job alive
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+def dialect_insert(db, model):
+    """INSERT for the session's database, with on_conflict_do_update (SQLite or PostgreSQL)."""
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    return dialect.insert(model)
+
+def run_migrations():
+    """Apply pending alembic revisions (they are no-ops on tables created by create_all)."""
+    from alembic import command
+    from alembic.config import Config
+    
+    # No ini file: its logging config would replace the server's loggers
+    config = Config()
+    config.set_main_option("script_location", os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic"))
+    command.upgrade(config, "head")
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    run_migrations()
 
 def get_db():
     db = SessionLocal()
@@ -94,3 +181,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,14 +1,21 @@
 import os
-import json
-import pickle
-import hashlib
-from typing import List, Tuple
-from PyPDF2 import PdfReader
-from docx import Document as DocxDocument
+import re
+import time
+import asyncio
+import unicodedata
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from cache import LRUCache
+from embedding_batcher import EmbeddingBatcher
+from metrics import query_embedding_lookups, stage_seconds, timed
 from config import settings
+from extraction import iter_pdf_pages, iter_docx_pages
+from vector_store import save_document_vectors, vector_store
+from embedding_store import ChunkEmbeddingStore, chunk_hash, shared_embeddings
+from chunking import chunking_options, estimate_tokens, get_chunker
 
 # Lazy load embedding model
 embedding_model = None
@@ -22,155 +29,257 @@ def get_embedding_model():
         print("Embedding model loaded!")
     return embedding_model
 
-VECTORS_DIR = "./vectors"
-os.makedirs(VECTORS_DIR, exist_ok=True)
-
-def extract_text_from_pdf(file_path: str, max_pages: int = 100) -> List[Tuple[int, str]]:
-    """Extract text from PDF, returning list of (page_num, text) tuples."""
-    reader = PdfReader(file_path)
-    pages = []
-    
-    for i, page in enumerate(reader.pages[:max_pages]):
-        text = page.extract_text()
-        if text.strip():
-            pages.append((i + 1, text))
-    
-    return pages
-
-def extract_text_from_docx(file_path: str) -> List[Tuple[int, str]]:
-    """Extract text from DOCX, chunking by paragraphs and grouping into 'pages'."""
-    doc = DocxDocument(file_path)
-    chunks = []
-    current_chunk = []
-    chunk_num = 1
-    words_in_chunk = 0
-    
-    for para in doc.paragraphs:
-        text = para.text.strip()
-        if text:
-            current_chunk.append(text)
-            words_in_chunk += len(text.split())
-            
-            # Create a "page" every ~500 words
-            if words_in_chunk >= 500:
-                chunks.append((chunk_num, "\n".join(current_chunk)))
-                current_chunk = []
-                words_in_chunk = 0
-                chunk_num += 1
-    
-    # Add remaining text
-    if current_chunk:
-        chunks.append((chunk_num, "\n".join(current_chunk)))
-    
-    return chunks
-
-def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-    """Split text into overlapping chunks."""
-    words = text.split()
-    chunks = []
-    
-    for i in range(0, len(words), chunk_size - overlap):
-        chunk = " ".join(words[i:i + chunk_size])
-        if chunk.strip():
-            chunks.append(chunk)
-    
-    return chunks
+def count_model_tokens(texts: List[str]) -> List[int]:
+    """Tokens of each text for the embedding model, special tokens excluded."""
+    tokenizer = getattr(get_embedding_model(), "tokenizer", None)
+    if tokenizer is None:
+        return estimate_tokens(texts)
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False, verbose=False)["input_ids"]]
+
+def document_chunker(doc_type: str):
+    """Chunker for a document type, sized to the embedding model."""
+    if chunking_options(doc_type)["strategy"] == "words":
+        return get_chunker(doc_type)
+    return get_chunker(doc_type, count_model_tokens, getattr(get_embedding_model(), "max_seq_length", None))
+
+# Chunks embedded per model call during ingestion
+EMBEDDING_BATCH_SIZE = 64
 
 def create_embeddings(texts: List[str]) -> np.ndarray:
     """Create embeddings using sentence-transformers."""
     model = get_embedding_model()
     return model.encode(texts, show_progress_bar=False)
 
-def process_document(file_path: str, candidate_id: int, filename: str, doc_type: str = "program") -> dict:
-    """Process document and store embeddings locally."""
+# Query embeddings shared by all requests of this process
+query_embedding_cache = LRUCache(max_entries=settings.QUERY_EMBEDDING_CACHE_SIZE)
+
+# Concurrent queries are encoded together in one model call
+query_batcher = EmbeddingBatcher(
+    create_embeddings,
+    window_ms=settings.EMBED_BATCH_WINDOW_MS,
+    max_batch_size=settings.EMBED_BATCH_MAX_SIZE
+)
+
+def normalize_query(query: str) -> str:
+    """Normalize a question for cache lookups (case, unicode form, spacing)."""
+    text = unicodedata.normalize("NFC", query).lower()
+    text = re.sub(r"\s+([?!.,;:])", r"\1", text)
+    return " ".join(text.split())
+
+@timed("embed")
+def embed_query(query: str) -> np.ndarray:
+    """Embed a search query, reusing the embedding of an identical earlier question."""
+    key = normalize_query(query)
+    embedding = query_embedding_cache.get(key)
+    query_embedding_lookups.inc(result="miss" if embedding is None else "hit")
+    if embedding is None:
+        embedding = query_batcher.embed(query)
+        embedding.setflags(write=False)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+def process_document(
+    file_path: str,
+    candidate_id: int,
+    filename: str,
+    doc_type: str = "program",
+    progress: Optional[Callable[..., None]] = None,
+    cpu_pool: Optional[Executor] = None
+) -> dict:
+    """Process document and store embeddings locally.
+    
+    Pages stream from extraction into chunking and embedding: with a cpu_pool,
+    page ranges are parsed in parallel worker processes while chunks of earlier
+    pages are already being embedded. progress, if given, is called with
+    keyword updates (stage, pages_parsed, total_chunks, chunks_embedded).
+    Pages are split by the doc type's chunker (see chunking.get_chunker).
+    Chunks whose content hash is in the candidate's chunk store, or in the
+    store shared by all candidates, are reused instead of re-embedded. The
+    result includes reused/shared/embedded chunk counts, the dedup ratio and
+    per-stage timings in milliseconds.
+    """
+    report = progress or (lambda **update: None)
+    timings = {"extract": 0.0, "chunk": 0.0, "embed": 0.0, "persist": 0.0}
+    chunk_store = ChunkEmbeddingStore(candidate_id)
+    chunker = document_chunker(doc_type)
+    
     # Determine file type and extract text
     ext = os.path.splitext(filename)[1].lower()
     
     if ext == '.pdf':
-        pages = extract_text_from_pdf(file_path, settings.MAX_PAGES)
+        pages = iter_pdf_pages(file_path, settings.MAX_PAGES, cpu_pool, settings.PDF_PAGES_PER_TASK)
     elif ext in ['.docx', '.doc']:
-        pages = extract_text_from_docx(file_path)
+        pages = iter_docx_pages(file_path, cpu_pool)
     else:
         raise ValueError(f"Unsupported file type: {ext}")
     
-    if not pages:
-        raise ValueError("No text could be extracted from the document")
+    report(stage="extracting")
     
-    # Create chunks with metadata
+    # Create chunks with metadata, embedding them in batches as pages arrive
     all_chunks = []
     all_metadata = []
+    all_hashes = []
+    all_parents = []
+    vectors = {}
+    pending = []
+    embedded = 0
+    shared = 0
+    total_pages = 0
     
+    def embed_pending(final: bool = False):
+        nonlocal embedded, shared
+        while len(pending) - embedded >= EMBEDDING_BATCH_SIZE or (final and embedded < len(pending)):
+            batch = pending[embedded:embedded + EMBEDDING_BATCH_SIZE]
+            started = time.perf_counter()
+            # Chunks already embedded for another candidate skip the model
+            found = shared_embeddings.get_many([all_hashes[i] for i in batch])
+            missing = [i for i in batch if all_hashes[i] not in found]
+            if missing:
+                batch_embeddings = create_embeddings([all_chunks[i] for i in missing])
+                shared_embeddings.put_many(dict(zip((all_hashes[i] for i in missing), batch_embeddings)))
+                found.update(zip((all_hashes[i] for i in missing), batch_embeddings))
+            elapsed = time.perf_counter() - started
+            timings["embed"] += elapsed
+            # Kept apart from the query "embed" stage of the chat path
+            stage_seconds.observe(elapsed, stage="ingest_embed")
+            for i in batch:
+                vectors[all_hashes[i]] = found[all_hashes[i]]
+            shared += len(batch) - len(missing)
+            embedded += len(batch)
+            report(total_chunks=len(all_chunks), chunks_embedded=len(all_chunks) - len(pending) + embedded)
+    
+    started = time.perf_counter()
     for page_num, page_text in pages:
-        chunks = chunk_text(page_text)
+        timings["extract"] += time.perf_counter() - started
+        total_pages += 1
+        
+        started = time.perf_counter()
+        chunks, parents, parent_ids = chunker.split(page_text)
         for chunk_idx, chunk in enumerate(chunks):
+            key = chunk_hash(chunk)
+            # Only the first occurrence of unseen content needs the model
+            if key not in vectors:
+                vectors[key] = chunk_store.get(key)
+                if vectors[key] is None:
+                    pending.append(len(all_chunks))
+            all_hashes.append(key)
             all_chunks.append(chunk)
             all_metadata.append({
                 "page": page_num,
                 "chunk": chunk_idx,
                 "source": filename
             })
+            if parents is not None:
+                all_metadata[-1]["parent"] = len(all_parents) + parent_ids[chunk_idx]
+        if parents is not None:
+            all_parents.extend(parents)
+        timings["chunk"] += time.perf_counter() - started
+        report(pages_parsed=total_pages, total_chunks=len(all_chunks))
+        
+        embed_pending()
+        started = time.perf_counter()
+    timings["extract"] += time.perf_counter() - started
+    
+    if not all_chunks:
+        raise ValueError("No text could be extracted from the document")
     
-    # Create embeddings
-    embeddings = create_embeddings(all_chunks)
+    report(stage="embedding")
+    embed_pending(final=True)
+    embeddings = np.stack([vectors[key] for key in all_hashes])
     
     # Store data
-    candidate_data = {
-        "chunks": all_chunks,
-        "metadata": all_metadata,
-        "embeddings": embeddings,
-        "doc_type": doc_type
-    }
+    report(stage="persisting")
+    started = time.perf_counter()
+    vector_file = save_document_vectors(
+        candidate_id, doc_type, all_chunks, all_metadata, embeddings, source=filename, hashes=all_hashes,
+        parents=all_parents or None
+    )
+    vector_store.invalidate(candidate_id)
     
-    vector_file = os.path.join(VECTORS_DIR, f"candidate_{candidate_id}_{doc_type}.pkl")
-    with open(vector_file, 'wb') as f:
-        pickle.dump(candidate_data, f)
+    # Keep embeddings of chunks still present in any current document of the candidate
+    keep = set(all_hashes)
+    for other_type in vector_store.doc_types:
+        if other_type != doc_type:
+            document = vector_store.load(candidate_id, other_type)
+            if document is not None and document.hashes is not None:
+                keep.update(row.tobytes() for row in document.hashes)
+    chunk_store.save({all_hashes[i]: vectors[all_hashes[i]] for i in pending}, keep)
+    timings["persist"] += time.perf_counter() - started
     
     return {
-        "total_pages": len(pages),
+        "total_pages": total_pages,
         "total_chunks": len(all_chunks),
-        "vector_file": vector_file
+        "chunks_reused": len(all_chunks) - len(pending),
+        "chunks_shared": shared,
+        "chunks_embedded": len(pending) - shared,
+        "dedup_ratio": round(1 - (len(pending) - shared) / len(all_chunks), 3),
+        "vector_file": vector_file,
+        "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
     }
 
-def search_documents(candidate_id: int, query: str, n_results: int = 5, doc_types: List[str] = ["program", "talking_points", "competitive"]) -> List[dict]:
+@timed("search")
+def search_documents(
+    candidate_id: int,
+    query: str,
+    n_results: int = 5,
+    doc_types: List[str] = ["program", "talking_points", "competitive"],
+    weights: Optional[Dict[str, float]] = None
+) -> List[dict]:
     """Search for relevant sections across all candidate documents."""
-    all_results = []
+    # Load the unified index (all document types, cached per process)
+    index = vector_store.load_index(candidate_id)
     
-    # Create query embedding once
-    query_embedding = create_embeddings([query])[0]
+    if index is None:
+        return []
     
-    # Search each document type
-    for doc_type in doc_types:
-        vector_file = os.path.join(VECTORS_DIR, f"candidate_{candidate_id}_{doc_type}.pkl")
-        
-        if not os.path.exists(vector_file):
-            continue
-        
-        # Load candidate data
-        with open(vector_file, 'rb') as f:
-            candidate_data = pickle.load(f)
-        
-        chunks = candidate_data["chunks"]
-        metadata = candidate_data["metadata"]
-        embeddings = candidate_data["embeddings"]
-        
-        # Calculate similarities
-        similarities = cosine_similarity([query_embedding], embeddings)[0]
-        
-        # Add to all results with doc_type
-        for idx, similarity in enumerate(similarities):
-            all_results.append({
-                "text": chunks[idx],
-                "page": metadata[idx].get("page", "N/A"),
-                "source": metadata[idx].get("source", "Unknown"),
-                "doc_type": doc_type,
-                "similarity": float(similarity)
-            })
+    query_embedding = embed_query(query)
+    
+    return index.search(query_embedding, n_results, doc_types=doc_types, weights=weights, query_text=query)
+
+# Dedicated pool so CPU-bound search never occupies the request threadpool
+search_executor = ThreadPoolExecutor(
+    max_workers=settings.SEARCH_EXECUTOR_WORKERS,
+    thread_name_prefix="search"
+)
+
+@timed("embed")
+async def embed_query_async(query: str) -> np.ndarray:
+    """Async embed_query: waits on the batcher without holding a thread."""
+    key = normalize_query(query)
+    embedding = query_embedding_cache.get(key)
+    query_embedding_lookups.inc(result="miss" if embedding is None else "hit")
+    if embedding is None:
+        embedding = await asyncio.wrap_future(query_batcher.submit(query))
+        embedding.setflags(write=False)
+        query_embedding_cache.put(key, embedding)
+    return embedding
+
+@timed("search")
+async def search_documents_async(
+    candidate_id: int,
+    query: str,
+    n_results: int = 5,
+    doc_types: List[str] = ["program", "talking_points", "competitive"],
+    weights: Optional[Dict[str, float]] = None
+) -> Tuple[List[dict], Optional[np.ndarray]]:
+    """Async search_documents: index loading and scoring run on the search executor.
+    
+    Returns the sections and the query embedding (None when the candidate
+    has no documents), so callers reuse it instead of embedding again.
+    """
+    loop = asyncio.get_running_loop()
+    index = await loop.run_in_executor(search_executor, vector_store.load_index, candidate_id)
+    
+    if index is None:
+        return [], None
     
-    # Sort all results by similarity
-    all_results.sort(key=lambda x: x["similarity"], reverse=True)
+    query_embedding = await embed_query_async(query)
     
-    # Return top N results
-    return all_results[:n_results]
+    sections = await loop.run_in_executor(
+        search_executor,
+        partial(index.search, query_embedding, n_results, doc_types=doc_types, weights=weights, query_text=query)
+    )
+    return sections, query_embedding
 
 # Alias for backward compatibility
 search_program = search_documents
@@ -0,0 +1,94 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List
+import numpy as np
+
+class EmbeddingBatcher:
+    """Collects texts from concurrent callers and encodes them in shared batches.
+
+    A single dispatcher thread takes the first pending text, waits up to
+    window_ms for more (or until max_batch_size texts are queued), then runs one
+    encode call and hands every caller its own vector. Requests arriving while
+    a batch is being encoded accumulate and form the next batch.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], window_ms: float, max_batch_size: int):
+        self.encode = encode
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.texts = 0
+
+    def submit(self, text: str) -> Future:
+        """Queue a text for encoding. The future resolves to its embedding."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Encode one text as part of the next batch, blocking until it is ready."""
+        return self.submit(text).result()
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "avg_batch_size": round(self.texts / self.batches, 2) if self.batches else 0.0,
+            "pending": self._queue.qsize()
+        }
+
+    def _ensure_started(self):
+        # Started lazily, and again in a forked worker where the thread does not exist
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            try:
+                # Whatever is already queued joins the batch without waiting
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Identical texts in the same batch are encoded once
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = self.encode(unique_texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(batch)
+            positions = {text: i for i, text in enumerate(unique_texts)}
+            for text, future in batch:
+                future.set_result(np.array(vectors[positions[text]]))
@@ -0,0 +1,261 @@
+import os
+import time
+import fcntl
+import sqlite3
+import tempfile
+import hashlib
+import threading
+import unicodedata
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from config import settings
+from vector_store import VECTORS_DIR
+
+HASH_BYTES = 16
+
+# Keys per SELECT ... IN (...) statement, below SQLite's bound parameter limit
+SQL_BATCH = 500
+
+def chunk_hash(text: str) -> bytes:
+    """Content address of a chunk: hash of its text with normalized unicode and spacing."""
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=HASH_BYTES).digest()
+
+def chunk_store_path(candidate_id: int) -> str:
+    return os.path.join(VECTORS_DIR, f"candidate_{candidate_id}_chunks.npy")
+
+# One save at a time per candidate: a thread lock within the process, a file lock across processes
+_save_locks: Dict[int, threading.Lock] = {}
+_save_locks_guard = threading.Lock()
+
+@contextmanager
+def _save_lock(candidate_id: int):
+    with _save_locks_guard:
+        lock = _save_locks.setdefault(candidate_id, threading.Lock())
+    with lock, open(f"{chunk_store_path(candidate_id)}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def _load_records(path: str):
+    """(records, hash -> row) of a store file, or (None, {}) if there is none."""
+    if not os.path.exists(path):
+        return None, {}
+    records = np.load(path, mmap_mode="r")
+    return records, {h.tobytes(): i for i, h in enumerate(records["hash"])}
+
+class ChunkEmbeddingStore:
+    """Persistent chunk hash -> embedding map of one candidate.
+
+    Stored as a single structured .npy file (hash, float32 embedding) that is
+    replaced atomically and memory-mapped when read. Re-ingesting a document
+    only embeds chunks whose content hash is not already in the store.
+    """
+
+    def __init__(self, candidate_id: int):
+        self.candidate_id = candidate_id
+        self.path = chunk_store_path(candidate_id)
+        self._records, self._rows = _load_records(self.path)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._rows
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        return np.array(self._records["embedding"][row])
+
+    def save(self, new_entries: Dict[bytes, np.ndarray], keep: Iterable[bytes]):
+        """Write the store with new entries, keeping only hashes listed in keep.
+
+        Another document of the candidate may be ingested at the same time:
+        the file is re-read under a per-candidate lock and entries written
+        since this store was loaded are kept as well, so neither job drops
+        the other's embeddings.
+        """
+        with _save_lock(self.candidate_id):
+            current, current_rows = _load_records(self.path)
+            keep = set(keep) | (current_rows.keys() - self._rows.keys())
+            kept_rows = [row for key, row in current_rows.items() if key in keep and key not in new_entries]
+            new_keys = [key for key in new_entries if key in keep]
+            dim = self._dim(current, new_entries)
+            if dim is None:
+                return
+
+            records = np.zeros(len(kept_rows) + len(new_keys), dtype=[
+                ("hash", np.uint8, (HASH_BYTES,)),
+                ("embedding", np.float32, (dim,))
+            ])
+            if kept_rows:
+                records[:len(kept_rows)] = current[np.array(kept_rows)]
+            for i, key in enumerate(new_keys, start=len(kept_rows)):
+                records["hash"][i] = np.frombuffer(key, dtype=np.uint8)
+                records["embedding"][i] = new_entries[key]
+
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, records)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+
+        self._records = records
+        self._rows = {h.tobytes(): i for i, h in enumerate(records["hash"])}
+
+    @staticmethod
+    def _dim(current, new_entries: Dict[bytes, np.ndarray]) -> Optional[int]:
+        if current is not None:
+            return current.dtype["embedding"].shape[0]
+        for vector in new_entries.values():
+            return len(vector)
+        return None
+
+class SharedEmbeddingStore:
+    """Embeddings shared by all candidates, keyed by chunk content hash.
+
+    Backed by a SQLite file next to the vectors so every worker process sees
+    the same entries. When the stored embeddings exceed max_bytes, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._initialized = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the stored embeddings of the given hashes, marking them as used."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        if not keys:
+            return found
+        with self._connect() as conn:
+            for start in range(0, len(keys), SQL_BATCH):
+                batch = keys[start:start + SQL_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash, embedding FROM embeddings WHERE hash IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[bytes(key)] = np.frombuffer(blob, dtype=np.float32).copy()
+            if found:
+                conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE hash = ?",
+                    [(time.time(), key) for key in found]
+                )
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[bytes, np.ndarray]):
+        """Store new embeddings, then evict the least recently used ones over budget."""
+        if not entries:
+            return
+        now = time.time()
+        added = added_bytes = 0
+        with self._connect() as conn:
+            for key, vector in entries.items():
+                blob = np.asarray(vector, dtype=np.float32).tobytes()
+                # A write first, so the transaction holds the write lock from the start
+                if conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (hash, embedding, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), now)
+                ).rowcount:
+                    added += 1
+                    added_bytes += len(blob)
+                    continue
+                old_size = conn.execute("SELECT size FROM embeddings WHERE hash = ?", (key,)).fetchone()[0]
+                conn.execute(
+                    "UPDATE embeddings SET embedding = ?, size = ?, last_used = ? WHERE hash = ?",
+                    (blob, len(blob), now, key)
+                )
+                added_bytes += len(blob) - old_size
+            conn.execute("UPDATE totals SET entries = entries + ?, bytes = bytes + ?", (added, added_bytes))
+            self._evict(conn)
+
+    def size(self) -> dict:
+        """Entries and embedding bytes in the store, from its running totals."""
+        with self._connect() as conn:
+            entries, size = conn.execute("SELECT entries, bytes FROM totals").fetchone()
+        return {"entries": entries, "bytes": size}
+
+    def stats(self) -> dict:
+        """Lookup counters of this process, without touching the store."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+    @contextmanager
+    def _connect(self):
+        """Connection in a transaction: committed on success, rolled back on error, then closed."""
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                if not self._initialized:
+                    self._create_schema(conn)
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self, conn: sqlite3.Connection):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash BLOB PRIMARY KEY, embedding BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+        # Entry and byte counts kept up to date by put_many and _evict, so reading them is not a scan
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS totals ("
+            "id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)"
+        )
+        # Seeds the totals once, for stores created before they existed
+        conn.execute(
+            "INSERT OR IGNORE INTO totals (id, entries, bytes) "
+            "SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM embeddings"
+        )
+        self._initialized = True
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT bytes FROM totals").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT hash, size FROM embeddings ORDER BY last_used LIMIT ?", (SQL_BATCH,)
+            ).fetchall()
+            if not oldest:
+                break
+            evicted = []
+            for key, size in oldest:
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            conn.executemany("DELETE FROM embeddings WHERE hash = ?", evicted)
+            conn.execute("UPDATE totals SET entries = entries - ?, bytes = ?", (len(evicted), total))
+            with self._lock:
+                self.evictions += len(evicted)
+
+shared_embeddings = SharedEmbeddingStore(
+    os.path.join(VECTORS_DIR, "shared_embeddings.db"),
+    max_bytes=settings.SHARED_EMBEDDING_CACHE_MB * 1024 * 1024
+)
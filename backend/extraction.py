@@ -0,0 +1,93 @@
+from concurrent.futures import Executor
+from typing import Iterator, List, Optional, Tuple
+from PyPDF2 import PdfReader
+from docx import Document as DocxDocument
+
+# Kept free of model and database imports so it loads quickly in extraction worker processes
+
+def extract_text_from_pdf(file_path: str, max_pages: int = 100) -> List[Tuple[int, str]]:
+    """Extract text from PDF, returning list of (page_num, text) tuples."""
+    reader = PdfReader(file_path)
+    pages = []
+    
+    for i, page in enumerate(reader.pages[:max_pages]):
+        text = page.extract_text()
+        if text.strip():
+            pages.append((i + 1, text))
+    
+    return pages
+
+def extract_text_from_docx(file_path: str) -> List[Tuple[int, str]]:
+    """Extract text from DOCX, chunking by paragraphs and grouping into 'pages'."""
+    doc = DocxDocument(file_path)
+    chunks = []
+    current_chunk = []
+    chunk_num = 1
+    words_in_chunk = 0
+    
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if text:
+            current_chunk.append(text)
+            words_in_chunk += len(text.split())
+            
+            # Create a "page" every ~500 words
+            if words_in_chunk >= 500:
+                chunks.append((chunk_num, "\n".join(current_chunk)))
+                current_chunk = []
+                words_in_chunk = 0
+                chunk_num += 1
+    
+    # Add remaining text
+    if current_chunk:
+        chunks.append((chunk_num, "\n".join(current_chunk)))
+    
+    return chunks
+
+def count_pdf_pages(file_path: str) -> int:
+    """Number of pages in a PDF."""
+    return len(PdfReader(file_path).pages)
+
+def extract_pdf_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Extract pages [start, end) of a PDF, returning (page_num, text) tuples."""
+    reader = PdfReader(file_path)
+    pages = []
+    
+    for i in range(start, min(end, len(reader.pages))):
+        text = reader.pages[i].extract_text()
+        if text.strip():
+            pages.append((i + 1, text))
+    
+    return pages
+
+def iter_pdf_pages(file_path: str, max_pages: int = 100, pool: Optional[Executor] = None,
+                   pages_per_task: int = 10) -> Iterator[Tuple[int, str]]:
+    """Yield (page_num, text) in page order.
+    
+    With a pool, page ranges are extracted in parallel and each range is
+    yielded as soon as it and all earlier ranges are done, so callers can
+    process early pages while later ones are still being parsed.
+    """
+    if pool is None:
+        yield from extract_text_from_pdf(file_path, max_pages)
+        return
+    
+    total = min(count_pdf_pages(file_path), max_pages)
+    futures = [
+        pool.submit(extract_pdf_page_range, file_path, start, min(start + pages_per_task, total))
+        for start in range(0, total, pages_per_task)
+    ]
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Stop pending ranges if the consumer gives up early
+        for future in futures:
+            future.cancel()
+
+def iter_docx_pages(file_path: str, pool: Optional[Executor] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page_num, text) 'pages' of a DOCX."""
+    if pool is None:
+        yield from extract_text_from_docx(file_path)
+    else:
+        yield from pool.submit(extract_text_from_docx, file_path).result()
@@ -0,0 +1,252 @@
+import os
+import json
+import uuid
+import socket
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database import SessionLocal, Candidate, IngestionJob
+from llm import invalidate_cached_answers
+from document_processor import process_document
+from metrics import errors
+from config import settings
+
+DOC_TYPES = ("program", "talking_points", "competitive")
+
+# Jobs run in the process that accepted the upload
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+def _worker_dead(worker: str) -> bool:
+    """Whether a job's worker was a process of this host that no longer runs."""
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def job_to_dict(job: IngestionJob) -> dict:
+    """Public representation of an ingestion job."""
+    return {
+        "job_id": job.id,
+        "doc_type": job.doc_type,
+        "filename": job.filename,
+        "status": job.status,
+        "stage": job.stage,
+        "pages_parsed": job.pages_parsed,
+        "total_chunks": job.total_chunks,
+        "chunks_embedded": job.chunks_embedded,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
+
+class IngestionJobManager:
+    """Runs document ingestion in the background, outside upload requests.
+
+    Jobs are persisted in the ingestion_jobs table so any worker can report
+    their progress. Each job runs on a thread of a small pool that drives
+    process_document; CPU-bound text extraction is sent to a process pool
+    (spawned, so it does not inherit the server's threads), while embedding
+    stays in-process where the model is loaded.
+    """
+
+    def __init__(self, workers: int, process_workers: int):
+        self.workers = workers
+        self.process_workers = process_workers
+        self._threads = None
+        self._processes = None
+        self._lock = threading.Lock()
+
+    def submit(self, candidate_id: int, doc_type: str, filename: str, file_path: str) -> IngestionJob:
+        """Record a queued job and schedule it. Returns the job row."""
+        if doc_type not in DOC_TYPES:
+            raise ValueError(f"Unknown document type: {doc_type}")
+        
+        db = SessionLocal()
+        try:
+            job = IngestionJob(
+                id=str(uuid.uuid4()),
+                candidate_id=candidate_id,
+                doc_type=doc_type,
+                filename=filename,
+                file_path=file_path,
+                status="queued",
+                worker=WORKER_ID,
+                heartbeat_at=datetime.utcnow()
+            )
+            db.add(job)
+            db.commit()
+            db.refresh(job)
+        finally:
+            db.close()
+        
+        self._ensure_pools()
+        self._threads.submit(self._run, job.id)
+        return job
+
+    async def submit_async(self, candidate_id: int, doc_type: str, filename: str, file_path: str) -> IngestionJob:
+        """submit() for the event loop: the job insert runs on a worker thread."""
+        return await asyncio.to_thread(self.submit, candidate_id, doc_type, filename, file_path)
+
+    def fail_orphaned(self, restarted: bool = False) -> int:
+        """Mark queued or running jobs of dead processes as failed. Returns their number.
+
+        Their thread pool died with the process that accepted them. A job is
+        orphaned when its worker was a process of this host that is gone, or
+        when no heartbeat came for INGESTION_STALE_SECONDS (workers of other
+        hosts, whose processes cannot be checked). With restarted, jobs
+        recorded under this process's own id are orphaned too: in a restarted
+        container the new server can get the pid of the old one.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=settings.INGESTION_STALE_SECONDS)
+        last_seen = func.coalesce(IngestionJob.heartbeat_at, IngestionJob.started_at, IngestionJob.created_at)
+        db = SessionLocal()
+        try:
+            jobs = db.query(IngestionJob.id, IngestionJob.worker, last_seen).filter(
+                IngestionJob.status.in_(("queued", "running"))
+            ).all()
+            orphaned = [
+                job_id for job_id, worker, seen in jobs
+                if (worker == WORKER_ID and restarted) or (worker != WORKER_ID and (
+                    _worker_dead(worker) or seen is None or seen < stale_before
+                ))
+            ]
+            if not orphaned:
+                return 0
+            # Only jobs still unfinished: one may have completed since the SELECT
+            count = db.query(IngestionJob).filter(
+                IngestionJob.id.in_(orphaned), IngestionJob.status.in_(("queued", "running"))
+            ).update({
+                "status": "failed",
+                "error": "Interrupted by a server restart, please upload the document again",
+                "finished_at": datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+            return count
+        finally:
+            db.close()
+
+    def heartbeat(self):
+        """Mark the unfinished jobs of this process alive."""
+        db = SessionLocal()
+        try:
+            db.query(IngestionJob).filter(
+                IngestionJob.worker == WORKER_ID, IngestionJob.status.in_(("queued", "running"))
+            ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    async def run_heartbeat(self, interval: float):
+        """Every interval seconds until cancelled: heartbeat our jobs, fail orphaned ones of other workers."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.heartbeat)
+                orphaned = await asyncio.to_thread(self.fail_orphaned)
+                if orphaned:
+                    print(f"Marked {orphaned} ingestion jobs of vanished workers as failed")
+            except Exception as e:
+                print(f"Ingestion job heartbeat failed: {e}")
+                errors.inc(kind="ingestion_heartbeat")
+
+    def shutdown(self):
+        if self._threads:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+
+    def _ensure_pools(self):
+        with self._lock:
+            if self._threads is not None:
+                return
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingestion")
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def _update(self, job_id: str, **fields):
+        db = SessionLocal()
+        try:
+            db.query(IngestionJob).filter(IngestionJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _transition(db, job_id: str, from_statuses, **fields) -> bool:
+        """Conditional status change, so a job failed by another worker is never resurrected."""
+        return bool(db.query(IngestionJob).filter(
+            IngestionJob.id == job_id, IngestionJob.status.in_(from_statuses)
+        ).update(fields, synchronize_session=False))
+
+    def _run(self, job_id: str):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            if not self._transition(db, job_id, ("queued",), status="running", started_at=now, heartbeat_at=now):
+                # Failed as orphaned while it waited for a thread
+                db.rollback()
+                return
+            db.commit()
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            
+            result = process_document(
+                job.file_path,
+                job.candidate_id,
+                job.filename,
+                doc_type=job.doc_type,
+                progress=lambda **update: self._update(job_id, **update),
+                cpu_pool=self._processes
+            )
+            
+            if not self._transition(
+                db, job_id, ("running",),
+                status="succeeded", stage=None, result=json.dumps(result), finished_at=datetime.utcnow()
+            ):
+                # Already reported failed: leave the candidate flags alone
+                print(f"Ingestion job {job_id} finished after being marked failed")
+                db.rollback()
+                return
+            
+            # Flip the candidate flags only now that the vectors are live
+            candidate = db.query(Candidate).filter(Candidate.id == job.candidate_id).first()
+            setattr(candidate, f"{job.doc_type}_uploaded", True)
+            setattr(candidate, f"{job.doc_type}_filename", job.filename)
+            setattr(candidate, f"{job.doc_type}_processed", True)
+            setattr(candidate, f"{job.doc_type}_processed_at", datetime.utcnow())
+            invalidate_cached_answers(db, candidate.id)
+            db.commit()
+        
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            db.rollback()
+            job = db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+            if job:
+                self._transition(
+                    db, job_id, ("queued", "running"),
+                    status="failed", error=str(e), finished_at=datetime.utcnow()
+                )
+                db.commit()
+                # Clean up on error
+                if os.path.exists(job.file_path):
+                    os.remove(job.file_path)
+        
+        finally:
+            db.close()
+
+ingestion_jobs = IngestionJobManager(
+    workers=settings.INGESTION_WORKERS,
+    process_workers=settings.INGESTION_PROCESS_WORKERS
+)
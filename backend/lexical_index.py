@@ -0,0 +1,147 @@
+import re
+import zlib
+import unicodedata
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from metrics import timed
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal rank fusion constant: damps the weight of the very first ranks
+RRF_K = 60
+
+TOKEN = re.compile(r"[a-z0-9]+")
+# Accent-folded French function words, and the usual words of voters' questions
+STOPWORDS = frozenset("""
+a au aux avec ce ces cet cette comme comment dans de des du elle elles en est et etre eux il ils je la le les
+leur leurs lui ma mais me meme mes moi mon ne ni nos notre nous on ou par pas pour qu que quel quelle quelles
+quels qui quoi sa se ses si son sont sur ta te tes toi ton tu un une vos votre vous allez faites
+""".split())
+
+def fold(text: str) -> str:
+    """Lowercase text without accents or ligatures ("Œuvre à l'État" -> "oeuvre a l'etat")."""
+    text = text.lower().replace("œ", "oe").replace("æ", "ae")
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+def stem(token: str) -> str:
+    """Light French plural stripping, so "locaux" matches "local" and "pistes" matches "piste"."""
+    if len(token) > 4 and token.endswith("aux"):
+        return token[:-3] + "al"
+    if len(token) > 3 and token[-1] in "sx" and token[-2] != "s":
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Index terms of a text: folded, elisions and stopwords dropped, plurals stripped.
+
+    Digits and acronyms are kept ("PLU", "2027", "ZFE"), since questions that
+    hinge on them are the ones embeddings handle worst.
+    """
+    return [
+        stem(token) for token in TOKEN.findall(fold(text))
+        if (len(token) > 1 or token.isdigit()) and token not in STOPWORDS
+    ]
+
+def term_ids(tokens: Sequence[str]) -> np.ndarray:
+    """Stable 32-bit ids of terms (CRC-32): no vocabulary to store or share between processes."""
+    return np.array([zlib.crc32(token.encode("utf-8")) for token in tokens], dtype=np.uint32)
+
+def build_bm25(chunks: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Inverted index of chunk texts.
+
+    Returns (terms, offsets, rows, freqs, lengths): terms holds sorted term ids,
+    the postings of terms[i] are rows[offsets[i]:offsets[i + 1]] with their
+    in-chunk frequencies in freqs, and lengths gives each chunk's term count.
+    """
+    all_terms, all_rows = [], []
+    lengths = np.zeros(len(chunks), dtype=np.int32)
+    for row, chunk in enumerate(chunks):
+        ids = term_ids(tokenize(chunk))
+        lengths[row] = len(ids)
+        all_terms.append(ids)
+        all_rows.append(np.full(len(ids), row, dtype=np.int32))
+    terms = np.concatenate(all_terms) if all_terms else np.zeros(0, dtype=np.uint32)
+    rows = np.concatenate(all_rows) if all_rows else np.zeros(0, dtype=np.int32)
+
+    # One posting per (term, row), ordered by term then row
+    pairs = np.unique((terms.astype(np.uint64) << np.uint64(32)) | rows.astype(np.uint64), return_counts=True)
+    keys, freqs = pairs
+    posting_terms = (keys >> np.uint64(32)).astype(np.uint32)
+    posting_rows = (keys & np.uint64(0xFFFFFFFF)).astype(np.int32)
+    unique_terms, starts = np.unique(posting_terms, return_index=True)
+    offsets = np.concatenate([starts, [len(posting_rows)]]).astype(np.int64)
+    return unique_terms, offsets, posting_rows, np.minimum(freqs, 65535).astype(np.uint16), lengths
+
+class BM25Index:
+    """Inverted index over one document's rows, as flat arrays (memory-mappable)."""
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, rows: np.ndarray,
+                 freqs: np.ndarray, lengths: np.ndarray):
+        # Plain views of the mappings: np.memmap slicing is slow for many small postings
+        self.terms = terms.view(np.ndarray)
+        self.offsets = offsets.view(np.ndarray)
+        self.rows = rows.view(np.ndarray)
+        self.freqs = freqs.view(np.ndarray)
+        self.lengths = lengths.view(np.ndarray)
+        self.total_length = int(lengths.sum())
+
+    @property
+    def nbytes(self) -> int:
+        return (self.terms.nbytes + self.offsets.nbytes + self.rows.nbytes +
+                self.freqs.nbytes + self.lengths.nbytes)
+
+    def postings(self, query_terms: np.ndarray) -> List[Optional[Tuple[np.ndarray, np.ndarray]]]:
+        """(rows, freqs) of each query term, None for terms absent from the document."""
+        positions = np.searchsorted(self.terms, query_terms)
+        postings = []
+        for term, position in zip(query_terms, positions):
+            if position < len(self.terms) and self.terms[position] == term:
+                start, end = self.offsets[position], self.offsets[position + 1]
+                postings.append((self.rows[start:end], self.freqs[start:end]))
+            else:
+                postings.append(None)
+        return postings
+
+@timed("keyword_search")
+def bm25_scores(indexes: Sequence[Optional[BM25Index]], starts: np.ndarray, query: str) -> np.ndarray:
+    """BM25 score of every row of consecutive segments for a query.
+
+    Document frequencies and the average length are taken over all segments
+    with an index, so scores compare across a candidate's documents; rows of
+    segments without one score 0.
+    """
+    scores = np.zeros(int(starts[-1]), dtype=np.float32)
+    query_terms = np.unique(term_ids(tokenize(query)))
+    available = [(code, index) for code, index in enumerate(indexes) if index is not None]
+    if not len(query_terms) or not available:
+        return scores
+
+    n_rows = sum(len(index.lengths) for _, index in available)
+    average_length = max(1.0, sum(index.total_length for _, index in available) / max(1, n_rows))
+    postings = [(code, index, index.postings(query_terms)) for code, index in available]
+    document_frequency = np.zeros(len(query_terms))
+    for _, _, term_postings in postings:
+        document_frequency += [len(posting[0]) if posting is not None else 0 for posting in term_postings]
+    idf = np.log(1.0 + (n_rows - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    for code, index, term_postings in postings:
+        start = int(starts[code])
+        for term, posting in enumerate(term_postings):
+            if posting is None:
+                continue
+            rows, freqs = posting
+            freqs = freqs.astype(np.float32)
+            norm = BM25_K1 * (1.0 - BM25_B + BM25_B * index.lengths[rows] / average_length)
+            scores[start + rows] += idf[term] * freqs * (BM25_K1 + 1.0) / (freqs + norm)
+    return scores
+
+def reciprocal_rank_fusion(rankings: Sequence[np.ndarray], weights: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge rankings of row ids (best first). Returns (rows, fused scores), best first."""
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, row in enumerate(ranking.tolist()):
+            fused[row] = fused.get(row, 0.0) + weight / (RRF_K + rank + 1)
+    rows = np.array(sorted(fused, key=lambda row: -fused[row]), dtype=np.int64)
+    return rows, np.array([fused[row] for row in rows.tolist()], dtype=np.float32)
@@ -1,13 +1,34 @@
+import time
+import asyncio
 import hashlib
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import numpy as np
 from mistralai import Mistral
 from datetime import datetime
+from sqlalchemy import delete, func, select
 from sqlalchemy.orm import Session
-from database import Candidate, CostLog, QACache
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import Candidate, CostRollup, QACache
+from answer_cache import answer_cache, candidate_signature, signature_matches
+from budget import select_model
+from context_assembly import assemble_context, context_token_budget, estimate_tokens
+from log_writer import log_writer
+from metrics import (
+    answer_cache_lookups, context_tokens, context_tokens_saved, errors, llm_requests, llm_tokens, stage_seconds, timed
+)
+from semantic_cache import encode_embedding, semantic_cache
+from singleflight import SingleFlight
 from config import settings
 
 mistral_client = Mistral(api_key=settings.MISTRAL_API_KEY)
 
+# In-flight chat completions, shared by concurrent identical questions
+llm_calls = SingleFlight()
+# Bookkeeping of streams whose client went away, kept referenced until done
+_stream_bookkeeping = set()
+
+TECHNICAL_ERROR_ANSWER = "Désolé, une erreur technique est survenue. Veuillez réessayer dans quelques instants."
+
 # Pricing (per 1M tokens) - Mistral AI pricing (Feb 2026)
 PRICING = {
     "mistral-small-latest": {"input": 0.2, "output": 0.6},
@@ -15,6 +36,12 @@ PRICING = {
     "mistral-large-latest": {"input": 2.0, "output": 6.0}
 }
 
+def check_pricing(*models: str):
+    """Warn about models without a price: their calls would cost 0 and never reach the daily budget."""
+    for model in models:
+        if model not in PRICING:
+            print(f"Warning: no price for model {model} in llm.PRICING, its cost will be logged as $0")
+
 def calculate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
     """Calculate cost in USD based on token usage."""
     if model not in PRICING:
@@ -25,72 +52,107 @@ def calculate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
     output_cost = (output_tokens / 1_000_000) * pricing["output"]
     return input_cost + output_cost
 
-def log_cost(db: Session, candidate_id: int, model: str, input_tokens: int, 
-             output_tokens: int, operation: str):
-    """Log API cost to database."""
+@timed("log_cost")
+async def log_cost(candidate_id: int, model: str, input_tokens: int, 
+                   output_tokens: int, operation: str) -> float:
+    """Queue API cost for logging (CostLog and daily rollup). Returns the cost of this call."""
     cost = calculate_cost(model, input_tokens, output_tokens)
-    cost_log = CostLog(
+    llm_requests.inc(model=model, status="ok")
+    llm_tokens.inc(input_tokens, model=model, direction="input")
+    llm_tokens.inc(output_tokens, model=model, direction="output")
+    await log_writer.log_cost(
         candidate_id=candidate_id,
+        date=datetime.utcnow(),
         model=model,
         input_tokens=input_tokens,
         output_tokens=output_tokens,
         cost_usd=cost,
         operation=operation
     )
-    db.add(cost_log)
-    db.commit()
+    return cost
 
 def get_daily_cost(db: Session, candidate_id: int) -> float:
     """Get total cost for today."""
     today = datetime.utcnow().date()
-    logs = db.query(CostLog).filter(
-        CostLog.candidate_id == candidate_id,
-        CostLog.date >= today
-    ).all()
-    return sum(log.cost_usd for log in logs)
+    total = db.query(func.sum(CostRollup.cost_usd)).filter(
+        CostRollup.candidate_id == candidate_id,
+        CostRollup.day == today
+    ).scalar()
+    return total or 0.0
 
 def hash_question(question: str) -> str:
     """Create hash of question for caching."""
     return hashlib.sha256(question.lower().strip().encode()).hexdigest()
 
-def get_cached_answer(db: Session, candidate_id: int, question: str) -> Optional[str]:
-    """Check if question is cached."""
+@timed("cache_lookup")
+async def get_cached_answer(db: AsyncSession, candidate_id: int, question: str,
+                            question_embedding: Optional[np.ndarray] = None,
+                            signature: str = "") -> Optional[str]:
+    """Check if question is cached.
+    
+    The in-memory answer cache is consulted before QACache. Falls back to the
+    most similar cached question of the candidate when question_embedding is
+    given and semantic caching is enabled.
+    """
     q_hash = hash_question(question)
-    cache = db.query(QACache).filter(
+    hit = answer_cache.get(candidate_id, signature, q_hash)
+    if hit:
+        cache_id, answer = hit
+        answer_cache.record_hit(cache_id)
+        answer_cache_lookups.inc(result="memory_hit")
+        return answer
+    
+    result = await db.execute(select(QACache.id, QACache.answer).where(
         QACache.candidate_id == candidate_id,
-        QACache.question_hash == q_hash
-    ).first()
+        QACache.question_hash == q_hash,
+        signature_matches(signature)
+    ).limit(1))
+    cache = result.first()
+    outcome = "exact_hit"
+    
+    if not cache and question_embedding is not None and settings.SEMANTIC_CACHE_ENABLED:
+        cache_id = await semantic_cache.lookup(db, candidate_id, signature, question_embedding)
+        if cache_id is not None:
+            result = await db.execute(select(QACache.id, QACache.answer).where(QACache.id == cache_id))
+            cache = result.first()
+            outcome = "semantic_hit"
+            if cache is None:
+                semantic_cache.discard(candidate_id, cache_id)
     
     if cache:
-        # Update usage stats
-        cache.hit_count += 1
-        cache.last_used = datetime.utcnow()
-        db.commit()
+        # Usage stats are written in batches by the answer cache
+        answer_cache.record_hit(cache.id)
+        answer_cache.put(candidate_id, signature, q_hash, cache.id, cache.answer)
+        answer_cache_lookups.inc(result=outcome)
         return cache.answer
     
+    answer_cache_lookups.inc(result="miss")
     return None
 
-def cache_answer(db: Session, candidate_id: int, question: str, answer: str):
-    """Cache a question-answer pair."""
-    q_hash = hash_question(question)
+async def cache_answer(candidate_id: int, question: str, answer: str,
+                       question_embedding: Optional[np.ndarray] = None, signature: str = ""):
+    """Queue a question-answer pair for caching (written in the background, skipped if already cached)."""
+    await log_writer.cache_answer(
+        signature,
+        candidate_id=candidate_id,
+        question_hash=hash_question(question),
+        question=question,
+        answer=answer,
+        hit_count=0,
+        question_embedding=encode_embedding(question_embedding) if question_embedding is not None else None
+    )
+
+def invalidate_cached_answers(db: Session, candidate_id: int):
+    """Drop a candidate's cached answers once its documents or agent config change.
     
-    # Check if already exists
-    existing = db.query(QACache).filter(
-        QACache.candidate_id == candidate_id,
-        QACache.question_hash == q_hash
-    ).first()
-    
-    if not existing:
-        cache = QACache(
-            candidate_id=candidate_id,
-            question_hash=q_hash,
-            question=question,
-            answer=answer,
-            hit_count=0
-        )
-        db.add(cache)
-        db.commit()
+    The caller commits. Other workers stop serving their in-memory copies
+    because the candidate signature in their keys no longer matches.
+    """
+    db.execute(delete(QACache).where(QACache.candidate_id == candidate_id))
+    answer_cache.invalidate(candidate_id)
+    semantic_cache.invalidate(candidate_id)
 
+@timed("prompt")
 def build_system_prompt(candidate: Candidate, context_sections: List[Dict]) -> str:
     """Build system prompt with context from multiple document types."""
     tone_instructions = {
@@ -132,18 +194,39 @@ Important : Ces informations sont TA connaissance. Parle comme un candidat qui c
     
     return prompt
 
-def generate_response(
-    db: Session,
+def prompt_context(candidate: Candidate, context_sections: List[Dict]) -> Tuple[List[Dict], int]:
+    """Search results packed into the candidate's context budget, and the estimated tokens saved."""
+    sections, tokens = assemble_context(context_sections, context_token_budget(candidate.response_length))
+    context_tokens.inc(tokens["retrieved_tokens"], kind="retrieved")
+    context_tokens.inc(tokens["context_tokens"], kind="sent")
+    context_tokens_saved.observe(tokens["tokens_saved"])
+    return sections, tokens["tokens_saved"]
+
+def budget_exceeded_answer(candidate: Candidate) -> str:
+    """Reply to uncached questions once the candidate's daily budget is spent (cache_only mode)."""
+    return (f"Je reçois énormément de questions aujourd'hui et ne peux pas répondre à celle-ci pour le moment. "
+            f"Merci de réessayer demain ou de contacter directement {candidate.name}.")
+
+@timed("generate")
+async def generate_response(
+    db: AsyncSession,
     candidate: Candidate,
     question: str,
     context_sections: List[Dict],
-    use_cache: bool = True
+    use_cache: bool = True,
+    question_embedding: Optional[np.ndarray] = None
 ) -> Dict:
-    """Generate response using LLM."""
+    """Generate response using LLM.
+    
+    Concurrent requests for the same candidate and question share one LLM
+    call: only the first one pays for it, logs the cost and caches the answer.
+    """
     
     # Check cache first
     if use_cache:
-        cached = get_cached_answer(db, candidate.id, question)
+        cached = await get_cached_answer(
+            db, candidate.id, question, question_embedding, signature=candidate_signature(candidate)
+        )
         if cached:
             return {
                 "answer": cached,
@@ -151,12 +234,43 @@ def generate_response(
                 "cost": 0.0
             }
     
+    # Daily budget guard: in-memory running total, no query
+    model = select_model(candidate.id)
+    if model is None:
+        return {
+            "answer": budget_exceeded_answer(candidate),
+            "cached": False,
+            "cost": 0.0,
+            "budget_exceeded": True
+        }
+    
+    key = (candidate.id, candidate_signature(candidate), hash_question(question), model)
+    result, shared = await llm_calls.do(
+        key, lambda: call_llm(db, candidate, question, context_sections, use_cache, question_embedding, model)
+    )
+    if shared:
+        return {**result, "cost": 0.0, "coalesced": True}
+    return result
+
+async def call_llm(
+    db: AsyncSession,
+    candidate: Candidate,
+    question: str,
+    context_sections: List[Dict],
+    use_cache: bool,
+    question_embedding: Optional[np.ndarray],
+    model: str
+) -> Dict:
+    """Call the LLM, log its cost and cache the answer."""
+    
+    context_sections, tokens_saved = prompt_context(candidate, context_sections)
     system_prompt = build_system_prompt(candidate, context_sections)
     
+    started = time.perf_counter()
     try:
         # Use Mistral
-        response = mistral_client.chat.complete(
-            model=settings.PRIMARY_MODEL,
+        response = await mistral_client.chat.complete_async(
+            model=model,
             messages=[
                 {
                     "role": "system",
@@ -173,27 +287,149 @@ def generate_response(
         answer = response.choices[0].message.content
         input_tokens = response.usage.prompt_tokens
         output_tokens = response.usage.completion_tokens
-        model_used = settings.PRIMARY_MODEL
+        model_used = model
+        stage_seconds.observe(time.perf_counter() - started, stage="llm")
         
     except Exception as e:
         print(f"Mistral error: {e}")
+        llm_requests.inc(model=model, status="error")
+        errors.inc(kind="llm")
         return {
-            "answer": "Désolé, une erreur technique est survenue. Veuillez réessayer dans quelques instants.",
+            "answer": TECHNICAL_ERROR_ANSWER,
             "cached": False,
             "cost": 0.0,
             "error": True
         }
     
     # Log cost
-    log_cost(db, candidate.id, model_used, input_tokens, output_tokens, "chat")
-    cost = calculate_cost(model_used, input_tokens, output_tokens)
+    cost = await log_cost(candidate.id, model_used, input_tokens, output_tokens, "chat")
     
     # Cache the answer
     if use_cache:
-        cache_answer(db, candidate.id, question, answer)
+        await cache_answer(
+            candidate.id, question, answer, question_embedding, signature=candidate_signature(candidate)
+        )
     
     return {
         "answer": answer,
         "cached": False,
-        "cost": cost
+        "cost": cost,
+        "context_tokens_saved": tokens_saved
     }
+
+async def _record_stream(candidate: Candidate, model: str, question: str, answer: str,
+                         input_tokens: int, output_tokens: int, cache: bool,
+                         question_embedding: Optional[np.ndarray]) -> float:
+    """Log the cost of a stream and cache its answer. Returns the cost."""
+    cost = await log_cost(candidate.id, model, input_tokens, output_tokens, "chat")
+    if cache and answer:
+        await cache_answer(
+            candidate.id, question, answer, question_embedding, signature=candidate_signature(candidate)
+        )
+    return cost
+
+async def generate_response_stream(
+    db: AsyncSession,
+    candidate: Candidate,
+    question: str,
+    context_sections: List[Dict],
+    use_cache: bool = True,
+    question_embedding: Optional[np.ndarray] = None
+) -> AsyncIterator[Dict]:
+    """Generate response using LLM, yielding answer deltas as they are produced.
+
+    Yields {"type": "delta", "content": ...} events, then one final
+    {"type": "done", "answer": ..., "cached": ..., "cost": ...} event once
+    cost has been logged and the answer cached. If the LLM call fails, an
+    {"type": "error", "message": ...} event replaces whatever was streamed
+    and the done event has "error": True.
+
+    Cost is logged even when the client goes away mid-stream (from the
+    streamed text when the API did not report usage yet); only complete
+    answers are cached.
+    """
+    
+    # Check cache first
+    if use_cache:
+        cached = await get_cached_answer(
+            db, candidate.id, question, question_embedding, signature=candidate_signature(candidate)
+        )
+        if cached:
+            yield {"type": "delta", "content": cached}
+            yield {"type": "done", "answer": cached, "cached": True, "cost": 0.0}
+            return
+    
+    # Daily budget guard: in-memory running total, no query
+    model = select_model(candidate.id)
+    if model is None:
+        answer = budget_exceeded_answer(candidate)
+        yield {"type": "delta", "content": answer}
+        yield {"type": "done", "answer": answer, "cached": False, "cost": 0.0, "budget_exceeded": True}
+        return
+    
+    context_sections, tokens_saved = prompt_context(candidate, context_sections)
+    system_prompt = build_system_prompt(candidate, context_sections)
+    parts = []
+    input_tokens = output_tokens = 0
+    completed = failed = False
+    
+    started = time.perf_counter()
+    try:
+        try:
+            # Use Mistral
+            stream = await mistral_client.chat.stream_async(
+                model=model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt
+                    },
+                    {
+                        "role": "user",
+                        "content": question
+                    }
+                ],
+                max_tokens=1024
+            )
+            
+            async for event in stream:
+                chunk = event.data
+                if chunk.choices and chunk.choices[0].delta.content:
+                    parts.append(chunk.choices[0].delta.content)
+                    yield {"type": "delta", "content": chunk.choices[0].delta.content}
+                # Usage is reported on the last chunk
+                if chunk.usage:
+                    input_tokens = chunk.usage.prompt_tokens
+                    output_tokens = chunk.usage.completion_tokens
+            
+            completed = True
+            stage_seconds.observe(time.perf_counter() - started, stage="llm")
+            
+        except Exception as e:
+            print(f"Mistral error: {e}")
+            failed = True
+            llm_requests.inc(model=model, status="error")
+            errors.inc(kind="llm")
+    finally:
+        # Runs on client disconnect too; shielded so cancellation cannot cut it short
+        answer = "".join(parts)
+        if not completed and not input_tokens and parts:
+            input_tokens = estimate_tokens(system_prompt) + estimate_tokens(question)
+            output_tokens = estimate_tokens(answer)
+        cost = 0.0
+        if completed or parts:
+            bookkeeping = asyncio.ensure_future(_record_stream(
+                candidate, model, question, answer, input_tokens, output_tokens,
+                use_cache and completed, question_embedding
+            ))
+            _stream_bookkeeping.add(bookkeeping)
+            bookkeeping.add_done_callback(_stream_bookkeeping.discard)
+            cost = await asyncio.shield(bookkeeping)
+    
+    if failed:
+        # The client shows this in place of any partial answer
+        yield {"type": "error", "message": TECHNICAL_ERROR_ANSWER}
+        yield {"type": "done", "answer": TECHNICAL_ERROR_ANSWER, "cached": False, "cost": cost, "error": True}
+        return
+    
+    yield {"type": "done", "answer": answer, "cached": False, "cost": cost, "context_tokens_saved": tokens_saved}
@@ -0,0 +1,170 @@
+import asyncio
+from collections import defaultdict
+from typing import List, Optional, Tuple
+from sqlalchemy import insert, select
+from answer_cache import answer_cache
+from budget import cost_tracker
+from config import settings
+from database import AsyncSessionLocal, Conversation, CostLog, CostRollup, QACache, dialect_insert
+from metrics import errors, timed
+from semantic_cache import semantic_cache
+
+class LogWriter:
+    """Write-behind logging of conversations, LLM costs and cached answers.
+
+    Requests enqueue records and return; a background task writes them in
+    bulk, every interval seconds or as soon as batch_size records are queued.
+    The queue is bounded: when the database falls behind, callers wait for
+    room instead of piling up records in memory. close() drains the queue.
+    """
+
+    def __init__(self, batch_size: int, interval: float, max_queue: int):
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Write everything queued so far, then stop."""
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    async def log_conversation(self, **values):
+        await self._put(Conversation, values)
+
+    async def log_cost(self, **values):
+        await self._put(CostLog, values)
+
+    async def cache_answer(self, signature: str, **values):
+        """Queue a QACache row; it reaches the in-memory caches once written."""
+        await self._put(QACache, {**values, "signature": signature})
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches
+        }
+
+    async def _put(self, model, values: dict):
+        if self._task is None:
+            # Not started (scripts, shutdown): write directly
+            await self._write([(model, values)])
+            return
+        await self._queue.put((model, values))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = []
+            item = await self._queue.get()
+            deadline = loop.time() + self.interval
+            while True:
+                if item is None:
+                    stopping = True
+                    # Drain what is left behind the sentinel
+                    while not self._queue.empty():
+                        item = self._queue.get_nowait()
+                        if item is not None:
+                            batch.append(item)
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            if batch:
+                await self._write(batch)
+
+    @timed("log_write")
+    async def _write(self, batch: List[Tuple[type, dict]]):
+        rows = defaultdict(list)
+        for model, values in batch:
+            rows[model].append(values)
+
+        # Cost logs also feed the daily rollups, one upsert per candidate/day/model
+        rollups = defaultdict(lambda: {"requests": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0})
+        for values in rows.get(CostLog, []):
+            rollup = rollups[(values["candidate_id"], values["date"].date(), values["model"])]
+            rollup["requests"] += 1
+            rollup["input_tokens"] += values["input_tokens"]
+            rollup["output_tokens"] += values["output_tokens"]
+            rollup["cost_usd"] += values["cost_usd"]
+
+        answers = rows.pop(QACache, [])
+        for attempt in range(2):
+            try:
+                totals = []
+                async with AsyncSessionLocal() as db:
+                    for model, model_rows in rows.items():
+                        await db.execute(insert(model), model_rows)
+                    cached = await self._insert_answers(db, answers) if answers else []
+                    for (candidate_id, day, model), rollup in rollups.items():
+                        stmt = dialect_insert(db, CostRollup).values(
+                            candidate_id=candidate_id, day=day, model=model, **rollup
+                        )
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=["candidate_id", "day", "model"],
+                            set_={column: getattr(CostRollup, column) + value for column, value in rollup.items()}
+                        ).returning(CostRollup.cost_usd)
+                        result = await db.execute(stmt)
+                        totals.append((candidate_id, model, day, result.scalar_one()))
+                    await db.commit()
+                break
+            except Exception as e:
+                print(f"Log write failed ({len(batch)} records): {e}")
+                errors.inc(kind="log_write")
+                if attempt:
+                    self.dropped += len(batch)
+                    return
+
+        for candidate_id, model, day, model_total in totals:
+            cost_tracker.record(candidate_id, model, day, model_total)
+        for cache_id, values in cached:
+            answer_cache.put(values["candidate_id"], values["signature"], values["question_hash"], cache_id, values["answer"])
+            if values["question_embedding"] is not None:
+                semantic_cache.add(values["candidate_id"], values["signature"], cache_id, values["question_embedding"])
+        self.written += len(batch)
+        self.batches += 1
+
+    @staticmethod
+    async def _insert_answers(db, answers: List[dict]) -> List[Tuple[int, dict]]:
+        """Insert answers whose question is not cached yet. Returns (id, values) of the new rows."""
+        candidate_ids = {values["candidate_id"] for values in answers}
+        result = await db.execute(select(QACache.candidate_id, QACache.question_hash, QACache.signature).where(
+            QACache.candidate_id.in_(candidate_ids),
+            QACache.question_hash.in_({values["question_hash"] for values in answers})
+        ))
+        known = set(result.all())
+        new = []
+        for values in answers:
+            key = (values["candidate_id"], values["question_hash"], values["signature"])
+            if key not in known:
+                known.add(key)
+                new.append(values)
+        if not new:
+            return []
+
+        result = await db.execute(insert(QACache).returning(QACache.id, sort_by_parameter_order=True), new)
+        return list(zip(result.scalars().all(), new))
+
+log_writer = LogWriter(
+    batch_size=settings.LOG_WRITE_BATCH_SIZE,
+    interval=settings.LOG_WRITE_INTERVAL_SECONDS,
+    max_queue=settings.LOG_WRITE_MAX_QUEUE
+)
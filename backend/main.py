@@ -1,26 +1,55 @@
 import os
+import json
+import asyncio
 import time
 import re
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from pydantic import BaseModel, EmailStr
 import aiofiles
 
-from database import init_db, get_db, Candidate, Conversation, CostLog
+from database import (
+    init_db,
+    get_db,
+    get_async_db,
+    async_engine,
+    AsyncSessionLocal,
+    Candidate,
+    Conversation,
+    IngestionJob
+)
 from auth import (
     get_password_hash, 
     verify_password, 
     create_access_token, 
     get_current_candidate
 )
-from document_processor import process_document, search_program
-from llm import generate_response, get_daily_cost
-from rate_limiter import is_rate_limited, hash_ip
+from document_processor import (
+    search_documents_async,
+    search_executor,
+    query_embedding_cache,
+    query_batcher
+)
+from jobs import ingestion_jobs, job_to_dict
+from vector_store import vector_store
+from migrate_vectors import unmigrated_legacy_files
+from embedding_store import shared_embeddings
+from semantic_cache import semantic_cache
+from llm import (
+    check_pricing, generate_response, generate_response_stream, get_daily_cost, invalidate_cached_answers, llm_calls
+)
+from answer_cache import answer_cache
+from budget import cost_tracker
+from log_writer import log_writer
+from metrics import Gauge, registry, stage_seconds
+from cache_eviction import qa_cache_evictor
+from rate_limiter import check_rate_limit, hash_ip
 from config import settings
 
 # Initialize FastAPI app
@@ -37,10 +66,41 @@ app.add_middleware(
 
 # Initialize database on startup
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     init_db()
     os.makedirs(settings.CHROMA_PERSIST_DIR, exist_ok=True)
     os.makedirs("uploads", exist_ok=True)
+    check_pricing(settings.PRIMARY_MODEL, settings.BUDGET_FALLBACK_MODEL)
+    legacy = unmigrated_legacy_files()
+    if legacy:
+        print(f"Warning: {len(legacy)} legacy .pkl vector files are not migrated and not served; "
+              f"run python migrate_vectors.py (see DEPLOYMENT.md)")
+    orphaned = ingestion_jobs.fail_orphaned(restarted=True)
+    if orphaned:
+        print(f"Marked {orphaned} interrupted ingestion jobs as failed")
+    async with AsyncSessionLocal() as db:
+        await cost_tracker.load(db)
+    log_writer.start()
+    app.state.answer_cache_flusher = asyncio.create_task(
+        answer_cache.run_flusher(settings.ANSWER_CACHE_FLUSH_SECONDS)
+    )
+    app.state.qa_cache_eviction = asyncio.create_task(
+        qa_cache_evictor.run(settings.QA_CACHE_EVICTION_INTERVAL_SECONDS)
+    )
+    app.state.ingestion_heartbeat = asyncio.create_task(
+        ingestion_jobs.run_heartbeat(settings.INGESTION_HEARTBEAT_SECONDS)
+    )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.ingestion_heartbeat.cancel()
+    app.state.qa_cache_eviction.cancel()
+    app.state.answer_cache_flusher.cancel()
+    await answer_cache.flush()
+    await log_writer.close()
+    search_executor.shutdown(wait=False)
+    ingestion_jobs.shutdown()
+    await async_engine.dispose()
 
 # Pydantic models
 class CandidateRegister(BaseModel):
@@ -156,11 +216,10 @@ def get_current_user(candidate: Candidate = Depends(get_current_candidate)):
     }
 
 # Program Upload Routes
-@app.post("/api/program/upload")
+@app.post("/api/program/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_program(
     file: UploadFile = File(...),
-    candidate: Candidate = Depends(get_current_candidate),
-    db: Session = Depends(get_db)
+    candidate: Candidate = Depends(get_current_candidate)
 ):
     """Upload and process program document."""
     # Validate file type
@@ -187,38 +246,21 @@ async def upload_program(
         content = await file.read()
         await out_file.write(content)
     
-    try:
-        # Process document
-        result = process_document(file_path, candidate.id, file.filename)
-        
-        # Update candidate
-        candidate.program_uploaded = True
-        candidate.program_filename = file.filename
-        candidate.program_processed = True
-        candidate.program_processed_at = datetime.utcnow()
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": "Program processed successfully",
-            "details": result
-        }
+    # Process document in the background; flags are updated when the job finishes
+    job = await ingestion_jobs.submit_async(candidate.id, "program", file.filename, file_path)
     
-    except Exception as e:
-        # Clean up on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing document: {str(e)}"
-        )
+    return {
+        "success": True,
+        "message": "Program queued for processing",
+        "job_id": job.id,
+        "status": job.status
+    }
 
 # Talking Points Upload Routes
-@app.post("/api/talking-points/upload")
+@app.post("/api/talking-points/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_talking_points(
     file: UploadFile = File(...),
-    candidate: Candidate = Depends(get_current_candidate),
-    db: Session = Depends(get_db)
+    candidate: Candidate = Depends(get_current_candidate)
 ):
     """Upload and process talking points document."""
     # Validate file type
@@ -245,38 +287,21 @@ async def upload_talking_points(
         content = await file.read()
         await out_file.write(content)
     
-    try:
-        # Process document
-        result = process_document(file_path, candidate.id, file.filename, doc_type="talking_points")
-        
-        # Update candidate
-        candidate.talking_points_uploaded = True
-        candidate.talking_points_filename = file.filename
-        candidate.talking_points_processed = True
-        candidate.talking_points_processed_at = datetime.utcnow()
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": "Talking points processed successfully",
-            "details": result
-        }
+    # Process document in the background; flags are updated when the job finishes
+    job = await ingestion_jobs.submit_async(candidate.id, "talking_points", file.filename, file_path)
     
-    except Exception as e:
-        # Clean up on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing document: {str(e)}"
-        )
+    return {
+        "success": True,
+        "message": "Talking points queued for processing",
+        "job_id": job.id,
+        "status": job.status
+    }
 
 # Competitive Position Upload Routes
-@app.post("/api/competitive/upload")
+@app.post("/api/competitive/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_competitive(
     file: UploadFile = File(...),
-    candidate: Candidate = Depends(get_current_candidate),
-    db: Session = Depends(get_db)
+    candidate: Candidate = Depends(get_current_candidate)
 ):
     """Upload and process competitive positioning document."""
     # Validate file type
@@ -303,31 +328,36 @@ async def upload_competitive(
         content = await file.read()
         await out_file.write(content)
     
-    try:
-        # Process document
-        result = process_document(file_path, candidate.id, file.filename, doc_type="competitive")
-        
-        # Update candidate
-        candidate.competitive_uploaded = True
-        candidate.competitive_filename = file.filename
-        candidate.competitive_processed = True
-        candidate.competitive_processed_at = datetime.utcnow()
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": "Competitive positioning processed successfully",
-            "details": result
-        }
+    # Process document in the background; flags are updated when the job finishes
+    job = await ingestion_jobs.submit_async(candidate.id, "competitive", file.filename, file_path)
     
-    except Exception as e:
-        # Clean up on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    return {
+        "success": True,
+        "message": "Competitive positioning queued for processing",
+        "job_id": job.id,
+        "status": job.status
+    }
+
+# Ingestion Job Routes
+@app.get("/api/jobs/{job_id}")
+def get_ingestion_job(
+    job_id: str,
+    candidate: Candidate = Depends(get_current_candidate),
+    db: Session = Depends(get_db)
+):
+    """Get status and progress of a document ingestion job."""
+    job = db.query(IngestionJob).filter(
+        IngestionJob.id == job_id,
+        IngestionJob.candidate_id == candidate.id
+    ).first()
+    
+    if not job:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error processing document: {str(e)}"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
         )
+    
+    return job_to_dict(job)
 
 # Agent Configuration Routes
 @app.put("/api/agent/config")
@@ -337,6 +367,7 @@ def update_agent_config(
     db: Session = Depends(get_db)
 ):
     """Update agent configuration."""
+    previous_style = (candidate.tone, candidate.response_length)
     if config.agent_name is not None:
         candidate.agent_name = config.agent_name
     if config.tone is not None:
@@ -354,6 +385,10 @@ def update_agent_config(
             )
         candidate.response_length = config.response_length
     
+    # Answers cached under the previous tone or length are no longer right
+    if (candidate.tone, candidate.response_length) != previous_style:
+        invalidate_cached_answers(db, candidate.id)
+    
     db.commit()
     
     return {
@@ -388,15 +423,16 @@ def get_chat_info(slug: str, db: Session = Depends(get_db)):
     }
 
 @app.post("/api/chat/{slug}/message", response_model=ChatResponse)
-def send_message(
+async def send_message(
     slug: str,
     message: ChatMessage,
     request: Request,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Send a message to the candidate's chatbot."""
     # Get candidate
-    candidate = db.query(Candidate).filter(Candidate.slug == slug).first()
+    result = await db.execute(select(Candidate).where(Candidate.slug == slug).limit(1))
+    candidate = result.scalars().first()
     
     if not candidate or not candidate.program_processed:
         raise HTTPException(
@@ -404,9 +440,9 @@ def send_message(
             detail="Chat not available"
         )
     
-    # Get client IP and check rate limit
+    # Get client IP and check rate limit (counts this message)
     client_ip = get_client_ip(request)
-    is_limited, remaining = is_rate_limited(db, candidate.id, client_ip)
+    is_limited, remaining = await check_rate_limit(db, candidate.id, client_ip)
     
     if is_limited:
         raise HTTPException(
@@ -416,32 +452,32 @@ def send_message(
     
     # Search for relevant context
     start_time = time.time()
-    context_sections = search_program(candidate.id, message.question, n_results=5)
+    # The question's embedding from the search also keys the semantic answer cache
+    context_sections, question_embedding = await search_documents_async(candidate.id, message.question, n_results=5)
     
     if not context_sections:
         answer = f"Je n'ai pas encore accès au programme complet. Je vous encourage à contacter {candidate.name} directement."
         cached = False
     else:
         # Generate response
-        result = generate_response(db, candidate, message.question, context_sections)
+        result = await generate_response(
+            db, candidate, message.question, context_sections, question_embedding=question_embedding
+        )
         answer = result["answer"]
         cached = result.get("cached", False)
     
     response_time_ms = int((time.time() - start_time) * 1000)
+    stage_seconds.observe(time.time() - start_time, stage="chat")
     
-    # Log conversation
-    conversation = Conversation(
+    # Log conversation (written in the background)
+    await log_writer.log_conversation(
         candidate_id=candidate.id,
         ip_hash=hash_ip(client_ip),
         question=message.question,
         answer=answer,
+        created_at=datetime.utcnow(),
         response_time_ms=response_time_ms
     )
-    db.add(conversation)
-    db.commit()
-    
-    # Get updated remaining count
-    _, remaining = is_rate_limited(db, candidate.id, client_ip)
     
     return {
         "answer": answer,
@@ -449,6 +485,88 @@ def send_message(
         "remaining_messages": remaining
     }
 
+def sse_event(data: dict) -> str:
+    """Format a server-sent event."""
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/api/chat/{slug}/stream")
+async def stream_message(
+    slug: str,
+    message: ChatMessage,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Send a message to the candidate's chatbot, streaming the answer as server-sent events."""
+    # Get candidate
+    result = await db.execute(select(Candidate).where(Candidate.slug == slug).limit(1))
+    candidate = result.scalars().first()
+    
+    if not candidate or not candidate.program_processed:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat not available"
+        )
+    
+    # Get client IP and check rate limit (counts this message)
+    client_ip = get_client_ip(request)
+    is_limited, remaining = await check_rate_limit(db, candidate.id, client_ip)
+    
+    if is_limited:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily message limit reached. Please try again tomorrow."
+        )
+    
+    # Search for relevant context before the stream starts
+    start_time = time.time()
+    # The question's embedding from the search also keys the semantic answer cache
+    context_sections, question_embedding = await search_documents_async(candidate.id, message.question, n_results=5)
+    
+    async def event_stream():
+        # The request session is closed once the response starts; use our own
+        async with AsyncSessionLocal() as stream_db:
+            if not context_sections:
+                answer = f"Je n'ai pas encore accès au programme complet. Je vous encourage à contacter {candidate.name} directement."
+                cached = False
+                yield sse_event({"type": "delta", "content": answer})
+            else:
+                async for event in generate_response_stream(
+                    stream_db, candidate, message.question, context_sections, question_embedding=question_embedding
+                ):
+                    if event["type"] == "done":
+                        answer = event["answer"]
+                        cached = event["cached"]
+                    else:
+                        yield sse_event(event)
+            
+            response_time_ms = int((time.time() - start_time) * 1000)
+            stage_seconds.observe(time.time() - start_time, stage="chat_stream")
+            
+            # Log conversation (written in the background)
+            await log_writer.log_conversation(
+                candidate_id=candidate.id,
+                ip_hash=hash_ip(client_ip),
+                question=message.question,
+                answer=answer,
+                created_at=datetime.utcnow(),
+                response_time_ms=response_time_ms
+            )
+            
+            yield sse_event({
+                "type": "done",
+                "cached": cached,
+                "remaining_messages": remaining
+            })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 # Analytics Routes
 @app.get("/api/analytics/overview")
 def get_analytics_overview(
@@ -583,6 +701,40 @@ def get_hourly_activity(
     }
 
 # Health check endpoints
+# Point-in-time values, read on each scrape
+registry.register(Gauge(
+    "eluia_log_queue_depth", "Conversation and cost records waiting to be written.",
+    lambda: log_writer.stats()["queued"]
+))
+registry.register(Gauge(
+    "eluia_llm_calls_in_flight", "LLM completions in progress.",
+    lambda: llm_calls.stats()["in_flight"]
+))
+registry.register(Gauge(
+    "eluia_embedding_batcher_pending", "Query embeddings waiting for the next batch.",
+    lambda: query_batcher.stats()["pending"]
+))
+registry.register(Gauge(
+    "eluia_cache_entries", "Entries in the in-process caches.",
+    lambda: {
+        "query_embeddings": len(query_embedding_cache),
+        "vector_indexes": vector_store.stats()["entries"],
+        "answers": answer_cache.stats()["entries"]
+    },
+    labelname="cache"
+))
+
+registry.register(Gauge(
+    "eluia_shared_embeddings", "Entries and bytes in the embedding store shared by all candidates.",
+    shared_embeddings.size,
+    labelname="measure"
+))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 def health_check():
     """Basic health check"""
@@ -604,7 +756,18 @@ def api_health_check():
         "status": "healthy",
         "service": "eluia-api",
         "database": db_status,
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "caches": {
+            "query_embeddings": query_embedding_cache.stats(),
+            "vector_indexes": vector_store.stats(),
+            "shared_embeddings": shared_embeddings.stats(),
+            "answers": answer_cache.stats(),
+            "answer_eviction": qa_cache_evictor.stats(),
+            "semantic_answers": semantic_cache.stats()
+        },
+        "embedding_batcher": query_batcher.stats(),
+        "llm_calls": llm_calls.stats(),
+        "log_writer": log_writer.stats()
     }
 
 if __name__ == "__main__":
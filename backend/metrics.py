@@ -0,0 +1,190 @@
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cached lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+class Histogram:
+    """Distribution of observed values over cumulative buckets, optionally split by labels."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (last = +Inf)], sum
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, key, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), cumulative
+
+class Gauge:
+    """Value read when metrics are collected: function returns a number or {label value: number}."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, function: Callable, labelname: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.function = function
+        self.labelname = labelname
+
+    def samples(self):
+        value = self.function()
+        if self.labelname is None:
+            yield self.name, "", value
+            return
+        for label, label_value in value.items():
+            yield self.name, _format_labels((self.labelname,), (label,)), label_value
+
+class Registry:
+    """Metrics exposed on /metrics in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                print(f"Metric {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "eluia_stage_duration_seconds", "Duration of chat and ingestion hot-path stages.", ["stage"]
+))
+answer_cache_lookups = registry.register(Counter(
+    "eluia_answer_cache_lookups_total", "Answer cache lookups by outcome.", ["result"]
+))
+query_embedding_lookups = registry.register(Counter(
+    "eluia_query_embedding_cache_lookups_total", "Query embedding cache lookups by outcome.", ["result"]
+))
+singleflight_calls = registry.register(Counter(
+    "eluia_singleflight_calls_total", "Coalesced LLM calls: executed, or collapsed onto one in flight.", ["outcome"]
+))
+llm_requests = registry.register(Counter(
+    "eluia_llm_requests_total", "LLM completions by model and outcome.", ["model", "status"]
+))
+llm_tokens = registry.register(Counter(
+    "eluia_llm_tokens_total", "LLM tokens by model and direction.", ["model", "direction"]
+))
+context_tokens = registry.register(Counter(
+    "eluia_context_tokens_total", "Estimated context tokens retrieved by search and sent to the LLM.", ["kind"]
+))
+context_tokens_saved = registry.register(Histogram(
+    "eluia_context_tokens_saved", "Estimated prompt tokens saved per LLM request by context assembly.",
+    buckets=(0, 100, 250, 500, 1000, 2000, 4000, 8000)
+))
+errors = registry.register(Counter(
+    "eluia_errors_total", "Errors on the chat path by kind.", ["kind"]
+))
+rate_limited = registry.register(Counter(
+    "eluia_rate_limited_total", "Chat messages rejected by the daily rate limit."
+))
+
+def timed(stage: str):
+    """Decorator observing each call of a sync or async function in stage_seconds."""
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    stage_seconds.observe(time.perf_counter() - start, stage=stage)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                stage_seconds.observe(time.perf_counter() - start, stage=stage)
+        return wrapper
+    return decorator
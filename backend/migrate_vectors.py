@@ -0,0 +1,90 @@
+"""
+One-shot migration of legacy pickle vector files to the memory-mapped layout.
+
+Usage: python migrate_vectors.py [--keep] [--keyword-index]
+
+Converts every vectors/candidate_{id}_{doc_type}.pkl (and the older
+vectors/candidate_{id}.pkl, treated as the program) into the versioned
+directory format written by vector_store.save_document_vectors. The pickle
+is removed once converted unless --keep is given. The API does not read
+pickles: the deploy start commands run this script before uvicorn (see
+DEPLOYMENT.md), and it returns at once when there is nothing to convert.
+
+With --keyword-index, also adds the BM25 index used by hybrid search to
+current document versions written before it existed.
+"""
+import os
+import re
+import sys
+import glob
+import pickle
+from typing import List, Tuple
+from vector_store import VECTORS_DIR, DocumentVectors, document_dir, save_document_vectors, save_keyword_index
+
+LEGACY_FILE_PATTERN = re.compile(r"^candidate_(\d+)(?:_(program|talking_points|competitive))?\.pkl$")
+
+def legacy_vector_files() -> List[Tuple[str, int, str]]:
+    """(path, candidate_id, doc_type) of each legacy pickle vector file."""
+    files = []
+    for path in sorted(glob.glob(os.path.join(VECTORS_DIR, "candidate_*.pkl"))):
+        match = LEGACY_FILE_PATTERN.match(os.path.basename(path))
+        if match:
+            files.append((path, int(match.group(1)), match.group(2) or "program"))
+    return files
+
+def is_migrated(candidate_id: int, doc_type: str) -> bool:
+    return os.path.exists(os.path.join(document_dir(candidate_id, doc_type), "CURRENT"))
+
+def unmigrated_legacy_files() -> List[str]:
+    """Legacy pickles whose document the API cannot serve yet (checked at startup)."""
+    return [path for path, candidate_id, doc_type in legacy_vector_files() if not is_migrated(candidate_id, doc_type)]
+
+def migrate_legacy_vectors(keep: bool = False) -> int:
+    """Convert legacy pickle files. Returns number of migrated documents."""
+    migrated = 0
+    for path, candidate_id, doc_type in legacy_vector_files():
+        # Never overwrite a document already processed in the new format
+        if is_migrated(candidate_id, doc_type):
+            print(f"Skipping {path}: candidate {candidate_id} {doc_type} already migrated")
+        else:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+            metadata = data.get("metadata", [{} for _ in data["chunks"]])
+            source = metadata[0].get("source", "Unknown") if metadata else "Unknown"
+            save_document_vectors(
+                candidate_id,
+                data.get("doc_type", doc_type),
+                data["chunks"],
+                metadata,
+                data["embeddings"],
+                source=source
+            )
+            migrated += 1
+            print(f"Migrated {path} ({len(data['chunks'])} chunks)")
+
+        if not keep:
+            os.remove(path)
+
+    return migrated
+
+def backfill_keyword_indexes() -> int:
+    """Add a BM25 index to current document versions without one. Returns number of documents indexed."""
+    indexed = 0
+    for current_file in sorted(glob.glob(os.path.join(VECTORS_DIR, "candidate_*", "CURRENT"))):
+        with open(current_file) as f:
+            version = f.read().strip()
+        version_dir = os.path.join(os.path.dirname(current_file), version)
+        if os.path.exists(os.path.join(version_dir, "bm25_terms.npy")):
+            continue
+        document = DocumentVectors(version_dir, version)
+        save_keyword_index(version_dir, [document.chunks[i] for i in range(len(document))])
+        indexed += 1
+        print(f"Indexed {version_dir} ({len(document)} chunks)")
+    return indexed
+
+if __name__ == "__main__":
+    count = migrate_legacy_vectors(keep="--keep" in sys.argv)
+    print(f"Done: {count} document(s) migrated")
+    if "--keyword-index" in sys.argv:
+        count = backfill_keyword_indexes()
+        print(f"Done: {count} document(s) keyword-indexed")
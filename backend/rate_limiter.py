@@ -1,34 +1,97 @@
+import os
 import hashlib
-from datetime import datetime, timedelta
-from typing import Optional
-from sqlalchemy.orm import Session
-from database import Conversation
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import RateLimitCounter, dialect_insert
 from config import settings
+from metrics import rate_limited, timed
 
 def hash_ip(ip: str) -> str:
     """Hash IP address for privacy."""
     return hashlib.sha256(ip.encode()).hexdigest()
 
-def get_daily_message_count(db: Session, candidate_id: int, ip: str) -> int:
-    """Get number of messages sent by this IP today."""
-    ip_hash = hash_ip(ip)
-    today = datetime.utcnow().date()
-    
-    count = db.query(Conversation).filter(
-        Conversation.candidate_id == candidate_id,
-        Conversation.ip_hash == ip_hash,
-        Conversation.created_at >= today
-    ).count()
-    
-    return count
+class MemoryRateLimitStore:
+    """Daily message counters held in this process.
+
+    O(1) per message. Each worker counts separately, so use the database
+    backend when running several workers.
+    """
+
+    def __init__(self):
+        self._day = None
+        self._counts: Dict[Tuple[int, str], int] = {}
+
+    async def increment(self, db: AsyncSession, candidate_id: int, ip_hash: str,
+                        day: date, limit: int) -> Optional[int]:
+        """Count one message. Returns the new count, or None if limit was already reached."""
+        if day != self._day:
+            # Counters of previous days are never read again
+            self._day = day
+            self._counts = {}
+        key = (candidate_id, ip_hash)
+        count = self._counts.get(key, 0)
+        if count >= limit:
+            return None
+        self._counts[key] = count + 1
+        return count + 1
+
+class DatabaseRateLimitStore:
+    """Daily message counters in the rate_limit_counters table, shared by all workers.
+
+    One upsert per message on the (candidate_id, ip_hash, day) primary key
+    that increments the counter only while it is below the limit.
+    """
+
+    def __init__(self):
+        self._pruned_day = None
+
+    async def increment(self, db: AsyncSession, candidate_id: int, ip_hash: str,
+                        day: date, limit: int) -> Optional[int]:
+        """Count one message. Returns the new count, or None if limit was already reached."""
+        if day != self._pruned_day:
+            self._pruned_day = day
+            await db.execute(delete(RateLimitCounter).where(RateLimitCounter.day < day))
+        
+        stmt = dialect_insert(db, RateLimitCounter).values(
+            candidate_id=candidate_id, ip_hash=ip_hash, day=day, count=1
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["candidate_id", "ip_hash", "day"],
+            set_={"count": RateLimitCounter.count + 1},
+            where=RateLimitCounter.count < limit
+        ).returning(RateLimitCounter.count)
+        result = await db.execute(stmt)
+        count = result.scalar_one_or_none()
+        await db.commit()
+        return count
+
+RATE_LIMIT_STORES = {
+    "memory": MemoryRateLimitStore,
+    "database": DatabaseRateLimitStore
+}
+
+rate_limit_store = RATE_LIMIT_STORES[settings.RATE_LIMIT_BACKEND]()
+
+# uvicorn and gunicorn start this many workers
+if settings.RATE_LIMIT_BACKEND == "memory" and int(os.environ.get("WEB_CONCURRENCY", "1")) > 1:
+    print(f"Warning: RATE_LIMIT_BACKEND=memory counts messages per worker, so with "
+          f"{os.environ['WEB_CONCURRENCY']} workers an IP gets up to that many times RATE_LIMIT_PER_DAY; "
+          f"use RATE_LIMIT_BACKEND=database")
 
-def is_rate_limited(db: Session, candidate_id: int, ip: str) -> tuple[bool, int]:
+@timed("rate_limit")
+async def check_rate_limit(db: AsyncSession, candidate_id: int, ip: str) -> tuple[bool, int]:
     """
-    Check if IP is rate limited.
-    Returns: (is_limited, remaining_messages)
+    Check the IP's daily quota and count this message against it.
+    Returns: (is_limited, remaining_messages after this one)
     """
-    count = get_daily_message_count(db, candidate_id, ip)
-    remaining = max(0, settings.RATE_LIMIT_PER_DAY - count)
-    is_limited = count >= settings.RATE_LIMIT_PER_DAY
+    limit = settings.RATE_LIMIT_PER_DAY
+    count = await rate_limit_store.increment(
+        db, candidate_id, hash_ip(ip), datetime.utcnow().date(), limit
+    )
+    if count is None:
+        rate_limited.inc()
+        return True, 0
     
-    return is_limited, remaining
+    return False, max(0, limit - count)
@@ -0,0 +1,155 @@
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from cache import LRUCache
+from config import settings
+from answer_cache import signature_matches
+from database import QACache
+
+# Rows are re-read this far back from the newest one seen: a transaction that
+# committed late can hold older created_at values (and lower ids)
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+def encode_embedding(embedding: np.ndarray) -> bytes:
+    """Normalized float32 bytes of a question embedding, as stored in QACache."""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tobytes()
+
+class CachedQuestions:
+    """Embeddings of one candidate's cached questions, with their QACache ids.
+
+    Only answers generated under signature are indexed.
+
+    Rows live in the first size rows of buffers that double when full, so
+    adding a question does not copy the whole matrix.
+    """
+
+    def __init__(self, dim: int, signature: str = "", capacity: int = 16):
+        self.signature = signature
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self._known = set()
+        self.loaded_until: Optional[datetime] = None
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def add(self, rows):
+        rows = [(cache_id, blob) for cache_id, blob in rows if cache_id not in self._known]
+        if not rows:
+            return
+        needed = self.size + len(rows)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            ids = np.empty(capacity, dtype=np.int64)
+            matrix = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+            ids[:self.size] = self.ids[:self.size]
+            matrix[:self.size] = self.matrix[:self.size]
+            self.ids, self.matrix = ids, matrix
+        for cache_id, blob in rows:
+            self.ids[self.size] = cache_id
+            self.matrix[self.size] = np.frombuffer(blob, dtype=np.float32)
+            self._known.add(cache_id)
+            self.size += 1
+
+    def remove(self, cache_id: int):
+        if cache_id not in self._known:
+            return
+        # The last row takes the place of the removed one
+        row = int(np.flatnonzero(self.ids[:self.size] == cache_id)[0])
+        last = self.size - 1
+        self.ids[row] = self.ids[last]
+        self.matrix[row] = self.matrix[last]
+        self.size = last
+        self._known.discard(cache_id)
+
+    def nearest(self, query: np.ndarray) -> Tuple[Optional[int], float]:
+        if not self.size:
+            return None, 0.0
+        sims = self.matrix[:self.size] @ query
+        best = int(np.argmax(sims))
+        return int(self.ids[best]), float(sims[best])
+
+class SemanticAnswerCache:
+    """Per-candidate in-memory index of cached question embeddings.
+
+    A new question hits when its nearest cached question for the candidate is
+    at least threshold cosine-similar. Indexes are loaded from QACache on first
+    use and pick up rows written by other workers every refresh_seconds.
+    """
+
+    def __init__(self, threshold: float, refresh_seconds: float, max_candidates: int):
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self._indexes = LRUCache(max_entries=max_candidates)
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, db: AsyncSession, candidate_id: int, signature: str,
+                     embedding: np.ndarray) -> Optional[int]:
+        """QACache id of the closest cached question above the threshold, if any."""
+        query = np.frombuffer(encode_embedding(embedding), dtype=np.float32)
+        index = await self._refresh(db, candidate_id, signature, len(query))
+        cache_id, similarity = index.nearest(query)
+        if cache_id is None or similarity < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cache_id
+
+    def add(self, candidate_id: int, signature: str, cache_id: int, embedding_bytes: bytes):
+        """Record a newly cached question of this worker."""
+        index = self._indexes.get(candidate_id)
+        if index is not None and index.signature == signature:
+            index.add([(cache_id, embedding_bytes)])
+
+    def discard(self, candidate_id: int, cache_id: int):
+        index = self._indexes.get(candidate_id)
+        if index is not None:
+            index.remove(cache_id)
+
+    def invalidate(self, candidate_id: int):
+        self._indexes.pop(candidate_id)
+
+    def stats(self) -> dict:
+        return {
+            "candidates": len(self._indexes),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    async def _refresh(self, db: AsyncSession, candidate_id: int, signature: str, dim: int) -> CachedQuestions:
+        index = self._indexes.get(candidate_id)
+        if index is None or index.signature != signature:
+            index = CachedQuestions(dim, signature)
+            self._indexes.put(candidate_id, index)
+        if time.monotonic() - index.refreshed_at < self.refresh_seconds:
+            return index
+
+        # Known ids in the overlap are skipped by add
+        query = select(QACache.id, QACache.question_embedding, QACache.created_at).where(
+            QACache.candidate_id == candidate_id,
+            QACache.question_embedding.isnot(None),
+            signature_matches(signature)
+        )
+        if index.loaded_until is not None:
+            query = query.where(QACache.created_at >= index.loaded_until - REFRESH_OVERLAP)
+        result = await db.execute(query.order_by(QACache.created_at))
+        rows = result.all()
+        index.add([(cache_id, blob) for cache_id, blob, _ in rows if len(blob) == dim * 4])
+        if rows:
+            index.loaded_until = max(index.loaded_until or rows[-1][2], rows[-1][2])
+        index.refreshed_at = time.monotonic()
+        return index
+
+semantic_cache = SemanticAnswerCache(
+    threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    refresh_seconds=settings.SEMANTIC_CACHE_REFRESH_SECONDS,
+    max_candidates=settings.SEMANTIC_CACHE_MAX_CANDIDATES
+)
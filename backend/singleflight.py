@@ -0,0 +1,59 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from metrics import singleflight_calls
+
+class SingleFlight:
+    """Coalesces concurrent async calls with the same key into one execution.
+
+    The first caller for a key runs the call; callers arriving while it is in
+    flight await the same result instead of starting their own. If the
+    running call is cancelled, a waiting caller takes over and runs it.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Run call() unless one is in flight for key. Returns (result, shared)."""
+        while key in self._calls:
+            future = self._calls[key]
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Only the owner was cancelled: retry; we were cancelled: propagate
+                if not future.cancelled():
+                    raise
+                continue
+            self.collapsed += 1
+            singleflight_calls.inc(outcome="collapsed")
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.executions += 1
+        singleflight_calls.inc(outcome="executed")
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved: there may be no waiters
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "collapsed": self.collapsed
+        }
@@ -0,0 +1,49 @@
+import os
+import sys
+import uuid
+import tempfile
+import pytest
+
+# Modules import each other by name, as when the API runs from backend/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# The benchmark helpers (synthetic documents, StubEncoder) are shared with the tests
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+# Vectors, embedding stores and the database are written relative to the working directory
+os.chdir(tempfile.mkdtemp(prefix="eluia_tests_"))
+os.environ.setdefault("MISTRAL_API_KEY", "test")
+os.environ["DATABASE_URL"] = "sqlite:///./test.db"
+
+from synthetic import StubEncoder
+
+@pytest.fixture
+def embedding_model(monkeypatch):
+    import document_processor
+    model = StubEncoder(dim=64)
+    monkeypatch.setattr(document_processor, "embedding_model", model)
+    return model
+
+@pytest.fixture(scope="session")
+def database():
+    """The test database, created once by init_db."""
+    import database
+    database.init_db()
+    return database
+
+@pytest.fixture
+def make_candidate(database):
+    """Creates a candidate with a unique email and slug, returns its id."""
+    def make(**fields) -> int:
+        key = uuid.uuid4().hex[:12]
+        db = database.SessionLocal()
+        try:
+            candidate = database.Candidate(
+                email=f"{key}@example.org", hashed_password="x", name="Jean Dupont", slug=f"jean-dupont-{key}", **fields
+            )
+            db.add(candidate)
+            db.commit()
+            return candidate.id
+        finally:
+            db.close()
+    return make
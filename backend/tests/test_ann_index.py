@@ -0,0 +1,45 @@
+import numpy as np
+from ann_index import IVFIndex, build_ivf
+from config import settings
+from vector_store import VectorStore, normalize_embeddings, save_document_vectors
+
+def clustered_embeddings(n: int, dim: int = 64, clusters: int = 40, seed: int = 0) -> np.ndarray:
+    """Topics of a program: chunks gather around a few directions, as real embeddings do."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    rows = centers[rng.integers(clusters, size=n)] + 0.35 * rng.standard_normal((n, dim))
+    return normalize_embeddings(rows)
+
+def test_probed_lists_recall_the_exact_top_10():
+    embeddings = clustered_embeddings(3000)
+    index = IVFIndex(*build_ivf(embeddings))
+    queries = clustered_embeddings(100, seed=1)
+
+    found = 0
+    for query in queries:
+        exact = set(np.argsort(-(embeddings @ query))[:10].tolist())
+        probed = index.probe(query, n_probe=8)
+        scores = embeddings[probed] @ query
+        found += len(exact & set(probed[np.argsort(-scores)[:10]].tolist()))
+    assert found / (10 * len(queries)) >= 0.9
+
+def test_every_row_is_in_exactly_one_list():
+    centroids, offsets, rows = build_ivf(clustered_embeddings(500), n_lists=10)
+    assert len(centroids) == 10
+    assert offsets[-1] == 500
+    assert sorted(rows.tolist()) == list(range(500))
+
+def test_probe_widens_to_return_enough_rows():
+    index = IVFIndex(*build_ivf(clustered_embeddings(500), n_lists=50))
+    query = clustered_embeddings(1, seed=2)[0]
+    assert len(index.probe(query, n_probe=1, min_rows=100)) >= 100
+
+def test_large_documents_are_searched_through_their_ivf_index(monkeypatch):
+    monkeypatch.setattr(settings, "ANN_MIN_CHUNKS", 500)
+    embeddings = clustered_embeddings(800)
+    save_document_vectors(140, "program", [f"chunk {i}" for i in range(800)],
+                          [{"page": 1} for _ in range(800)], embeddings, "p.pdf")
+    index = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"]).load_index(140)
+
+    assert index.segments[0].ivf is not None
+    assert index.search(embeddings[123], n_results=1)[0]["text"] == "chunk 123"
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import datetime
+import answer_cache as answer_cache_module
+import llm
+from answer_cache import AnswerCache, candidate_signature
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(answer_cache_module.time, "monotonic", lambda: now[0])
+    cache = AnswerCache(max_entries=8, ttl_seconds=60)
+    cache.put(1, "sig", "hash", 10, "réponse")
+
+    assert cache.get(1, "sig", "hash") == (10, "réponse")
+    assert cache.get(1, "other-sig", "hash") is None
+    now[0] += 61
+    assert cache.get(1, "sig", "hash") is None
+
+def test_invalidate_drops_only_that_candidate():
+    cache = AnswerCache(max_entries=8, ttl_seconds=60)
+    cache.put(1, "sig", "hash", 10, "a")
+    cache.put(2, "sig", "hash", 20, "b")
+    cache.invalidate(1)
+    assert cache.get(1, "sig", "hash") is None
+    assert cache.get(2, "sig", "hash") == (20, "b")
+
+def test_signature_changes_with_uploads_and_settings(database):
+    candidate = database.Candidate(tone="formel", response_length="court")
+    before = candidate_signature(candidate)
+    candidate.program_processed_at = datetime.utcnow()
+    assert candidate_signature(candidate) != before
+
+def test_flush_writes_accumulated_hits_in_one_batch(database, make_candidate):
+    db = database.SessionLocal()
+    try:
+        row = database.QACache(candidate_id=make_candidate(), question_hash="h", question="q", answer="a", hit_count=1)
+        db.add(row)
+        db.commit()
+        cache_id = row.id
+    finally:
+        db.close()
+
+    cache = AnswerCache(max_entries=8, ttl_seconds=60)
+    for _ in range(3):
+        cache.record_hit(cache_id)
+    assert cache.stats()["pending_hit_updates"] == 1
+
+    async def flush():
+        try:
+            await cache.flush()
+        finally:
+            await database.async_engine.dispose()
+    asyncio.run(flush())
+
+    assert cache.stats()["pending_hit_updates"] == 0
+    db = database.SessionLocal()
+    try:
+        assert db.get(database.QACache, cache_id).hit_count == 4
+    finally:
+        db.close()
+
+def test_answers_generated_under_another_signature_are_not_served(database, make_candidate):
+    candidate_id = make_candidate()
+    db = database.SessionLocal()
+    try:
+        # Written by the log writer after an upload invalidated the candidate's answers
+        db.add(database.QACache(candidate_id=candidate_id, question_hash=llm.hash_question("Transports ?"),
+                                question="Transports ?", answer="ancienne", signature="before-upload"))
+        db.add(database.QACache(candidate_id=candidate_id, question_hash=llm.hash_question("Écoles ?"),
+                                question="Écoles ?", answer="d'avant les signatures"))
+        db.commit()
+    finally:
+        db.close()
+
+    async def lookup(question):
+        try:
+            async with database.AsyncSessionLocal() as db:
+                return await llm.get_cached_answer(db, candidate_id, question, signature="after-upload")
+        finally:
+            await database.async_engine.dispose()
+    assert asyncio.run(lookup("Transports ?")) is None
+    assert asyncio.run(lookup("Écoles ?")) == "d'avant les signatures"
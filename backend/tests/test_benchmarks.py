@@ -0,0 +1,31 @@
+import random
+import numpy as np
+import document_processor
+from chunking import SPECIAL_TOKENS
+from extraction import iter_docx_pages, iter_pdf_pages
+from synthetic import StubEncoder, question_pool, stub_encode, synthetic_text, write_docx, write_pdf
+
+def test_synthetic_documents_go_through_extraction(tmp_path):
+    rng = random.Random(0)
+    pages = [synthetic_text(rng, 200) for _ in range(3)]
+    write_pdf(str(tmp_path / "programme.pdf"), pages)
+    write_docx(str(tmp_path / "programme.docx"), pages)
+
+    extracted = list(iter_pdf_pages(str(tmp_path / "programme.pdf")))
+    assert [number for number, _ in extracted] == [1, 2, 3]
+    assert extracted[0][1].split()[:5] == pages[0].split()[:5]
+    assert " ".join(text for _, text in iter_docx_pages(str(tmp_path / "programme.docx"))).split() == \
+        " ".join(pages).split()
+
+def test_questions_and_stub_embeddings():
+    pool = question_pool(40)
+    assert len(set(pool)) == 40
+    np.testing.assert_array_equal(stub_encode(pool[:2]), stub_encode(pool[:2]))
+    assert stub_encode(pool[:2], dim=16).shape == (2, 16)
+
+def test_stub_encoder_replaces_the_model_for_chunking_too(monkeypatch):
+    monkeypatch.setattr(document_processor, "embedding_model", StubEncoder())
+    chunker = document_processor.document_chunker("program")
+    units, _, _ = chunker.split(synthetic_text(random.Random(1), 300))
+    assert units and chunker.max_tokens == StubEncoder().max_seq_length - SPECIAL_TOKENS
+    assert document_processor.create_embeddings(units).shape == (len(units), 512)
@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import budget
+from budget import DailyCostTracker, select_model
+from config import settings
+
+def test_totals_sum_models_and_reset_each_day():
+    tracker = DailyCostTracker()
+    today = datetime.utcnow().date()
+    tracker.record(1, "mistral-small-latest", today, 0.5)
+    tracker.record(1, "mistral-small-latest", today, 0.75)
+    tracker.record(1, "open-mistral-7b", today, 0.25)
+    tracker.record(2, "open-mistral-7b", today, 3.0)
+    assert tracker.daily_cost(1) == 1.0
+
+    # A late record of yesterday's cost must not count today
+    tracker.record(1, "open-mistral-7b", today - timedelta(days=1), 9.0)
+    assert tracker.daily_cost(1) == 1.0
+
+    tracker.record(2, "open-mistral-7b", today + timedelta(days=1), 0.1)
+    assert tracker.daily_cost(1) == 0.0
+
+def test_load_seeds_today_totals_from_rollups(database, make_candidate):
+    candidate_id = make_candidate()
+    today = datetime.utcnow().date()
+    db = database.SessionLocal()
+    try:
+        db.add_all([
+            database.CostRollup(candidate_id=candidate_id, day=today, model="mistral-small-latest", cost_usd=4.0),
+            database.CostRollup(candidate_id=candidate_id, day=today, model="open-mistral-7b", cost_usd=0.5),
+            database.CostRollup(candidate_id=candidate_id, day=today - timedelta(days=1), model="open-mistral-7b",
+                                cost_usd=7.0)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    tracker = DailyCostTracker()
+
+    async def load():
+        try:
+            async with database.AsyncSessionLocal() as db:
+                await tracker.load(db)
+        finally:
+            await database.async_engine.dispose()
+    asyncio.run(load())
+    assert tracker.daily_cost(candidate_id) == 4.5
+
+@pytest.mark.parametrize("mode, model", [
+    ("fallback", "open-mistral-7b"),
+    ("cache_only", None),
+    ("alert", "mistral-small-latest")
+])
+def test_model_once_the_budget_is_reached(monkeypatch, mode, model):
+    monkeypatch.setattr(budget, "cost_tracker", DailyCostTracker())
+    monkeypatch.setattr(settings, "DAILY_BUDGET_ALERT_USD", 2.0)
+    monkeypatch.setattr(settings, "BUDGET_EXCEEDED_MODE", mode)
+    monkeypatch.setattr(settings, "PRIMARY_MODEL", "mistral-small-latest")
+    monkeypatch.setattr(settings, "BUDGET_FALLBACK_MODEL", "open-mistral-7b")
+    today = datetime.utcnow().date()
+
+    budget.cost_tracker.record(7, "mistral-small-latest", today, 1.5)
+    assert select_model(7) == "mistral-small-latest"
+    budget.cost_tracker.record(7, "mistral-small-latest", today, 2.5)
+    assert select_model(7) == model
+    assert select_model(8) == "mistral-small-latest"
@@ -0,0 +1,32 @@
+from cache import LRUCache
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_byte_budget_bounds_the_cache():
+    cache = LRUCache(max_bytes=10, sizeof=len)
+    cache.put("a", "x" * 4)
+    cache.put("b", "x" * 4)
+    cache.put("c", "x" * 4)
+    assert len(cache) == 2
+    assert cache.stats()["bytes"] == 8
+
+    # Larger than the whole budget: never cached
+    cache.put("d", "x" * 11)
+    assert "d" not in cache
+
+def test_hits_and_misses_are_counted():
+    cache = LRUCache(max_entries=4)
+    cache.put("q", 1)
+    cache.get("q")
+    cache.get("other")
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,56 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from cache_eviction import QACacheEvictor
+
+def add_answers(database, candidate_id: int, rows):
+    db = database.SessionLocal()
+    try:
+        for i, (hit_count, age_days) in enumerate(rows):
+            db.add(database.QACache(candidate_id=candidate_id, question_hash=f"h{i}", question=f"q{i}", answer="a",
+                                    hit_count=hit_count, last_used=datetime.utcnow() - timedelta(days=age_days)))
+        db.commit()
+    finally:
+        db.close()
+
+def remaining(database, candidate_id: int):
+    db = database.SessionLocal()
+    try:
+        rows = db.query(database.QACache).filter(database.QACache.candidate_id == candidate_id)
+        return sorted(row.question for row in rows)
+    finally:
+        db.close()
+
+def evict(database, evictor: QACacheEvictor) -> dict:
+    async def run():
+        try:
+            return await evictor.evict()
+        finally:
+            await database.async_engine.dispose()
+    return asyncio.run(run())
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        QACacheEvictor(max_entries_per_candidate=10, max_age_days=30, policy="fifo", batch_size=10)
+
+@pytest.mark.parametrize("policy, kept", [
+    ("lru", ["q0", "q1", "q2"]),
+    ("lfu", ["q2", "q3", "q4"])
+])
+def test_candidates_are_trimmed_by_policy(database, make_candidate, policy, kept):
+    candidate_id = make_candidate()
+    # (hit_count, days since last use): recently used answers are rarely hit
+    add_answers(database, candidate_id, [(0, 1), (1, 2), (5, 3), (6, 4), (7, 5)])
+    evictor = QACacheEvictor(max_entries_per_candidate=3, max_age_days=0, policy=policy, batch_size=1)
+
+    assert evict(database, evictor)["trimmed"] >= 2
+    assert remaining(database, candidate_id) == kept
+
+def test_answers_unused_for_too_long_expire(database, make_candidate):
+    candidate_id = make_candidate()
+    add_answers(database, candidate_id, [(3, 1), (3, 40), (3, 100)])
+    evictor = QACacheEvictor(max_entries_per_candidate=0, max_age_days=30, policy="lru", batch_size=10)
+
+    assert evict(database, evictor)["expired"] >= 2
+    assert remaining(database, candidate_id) == ["q0"]
+    assert evictor.stats()["passes"] == 1
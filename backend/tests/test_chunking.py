@@ -0,0 +1,52 @@
+import json
+import pytest
+from chunking import (
+    SPECIAL_TOKENS, SentenceChunker, WordWindowChunker, estimate_tokens, get_chunker, split_paragraphs, split_sentences
+)
+from config import settings
+
+def test_sentences_split_at_ends_but_not_after_abbreviations():
+    assert split_sentences("M. Dupont soutient le projet. « Nous agirons vite ! » Le vote a lieu en mai.") == [
+        "M. Dupont soutient le projet.",
+        "« Nous agirons vite ! »",
+        "Le vote a lieu en mai."
+    ]
+    assert split_sentences("Selon J. Martin, art. 3 du texte. Fin.") == ["Selon J. Martin, art. 3 du texte.", "Fin."]
+
+def test_paragraphs_break_on_blank_lines_lists_and_sentence_ends():
+    text = "Notre programme\npour la ville.\n\nPriorités :\n- écoles\n- transports.\nMerci."
+    assert split_paragraphs(text) == ["Notre programme pour la ville.", "Priorités :", "- écoles", "- transports.",
+                                      "Merci."]
+
+def test_units_fit_the_model_and_point_to_their_parent():
+    sentences = [f"Phrase numéro {i} du programme municipal." for i in range(12)]
+    text = " ".join(sentences[:6]) + "\n\n" + " ".join(sentences[6:])
+    units, parents, parent_ids = SentenceChunker(max_tokens=20, parent_words=40).split(text)
+
+    assert len(parents) == 2
+    assert all(tokens <= 20 for tokens in estimate_tokens(units))
+    for unit, parent_id in zip(units, parent_ids):
+        assert unit in parents[parent_id]
+    assert " ".join(units) == " ".join(parents) == " ".join(sentences)
+
+def test_long_sentences_are_split_into_word_windows():
+    sentence = " ".join(f"mot{i}" for i in range(100)) + "."
+    units, parents, _ = SentenceChunker(max_tokens=30, parent_words=500).split(sentence)
+    assert len(units) > 1 and all(tokens <= 30 for tokens in estimate_tokens(units))
+    assert " ".join(units) == parents[0] == sentence
+
+def test_overlap_repeats_previous_sentences():
+    text = " ".join(f"Phrase {i} courte." for i in range(6))
+    units, _, _ = SentenceChunker(max_tokens=10, parent_words=100, overlap_sentences=1).split(text)
+    assert units[1].startswith(units[0].split(". ")[-1])
+
+def test_chunker_options_by_doc_type(monkeypatch):
+    monkeypatch.setattr(settings, "CHUNKING_STRATEGY", "sentence")
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 0)
+    monkeypatch.setattr(settings, "CHUNKING_BY_DOC_TYPE", json.dumps({"competitive": {"strategy": "words"}}))
+
+    assert get_chunker("program", model_max_tokens=128).max_tokens == 128 - SPECIAL_TOKENS
+    assert isinstance(get_chunker("competitive"), WordWindowChunker)
+    monkeypatch.setattr(settings, "CHUNKING_STRATEGY", "paragraphs")
+    with pytest.raises(ValueError):
+        get_chunker("program")
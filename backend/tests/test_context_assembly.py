@@ -0,0 +1,40 @@
+from context_assembly import MIN_OVERLAP_WORDS, assemble_context, estimate_tokens
+
+def words(prefix: str, count: int) -> list:
+    return [f"{prefix}{i}" for i in range(count)]
+
+def section(text: str, page: int = 1, **fields) -> dict:
+    return {"text": text, "doc_type": "program", "source": "programme.pdf", "page": page, **fields}
+
+def test_overlapping_chunks_of_a_page_are_merged():
+    text = words("w", 60)
+    first = " ".join(text[:40])
+    second = " ".join(text[40 - MIN_OVERLAP_WORDS:])
+    assembled, tokens = assemble_context([section(second), section(first)], max_tokens=1000)
+
+    assert [passage["text"] for passage in assembled] == [" ".join(text)]
+    assert tokens["context_tokens"] == estimate_tokens(" ".join(text))
+    assert tokens["tokens_saved"] == tokens["retrieved_tokens"] - tokens["context_tokens"] > 0
+
+def test_units_sharing_a_parent_send_and_count_it_once():
+    parent = " ".join(words("p", 50))
+    sections = [section(f"unit {i}", parent=parent) for i in range(3)]
+    assembled, tokens = assemble_context(sections, max_tokens=1000)
+
+    assert [passage["text"] for passage in assembled] == [parent]
+    assert tokens["retrieved_tokens"] == tokens["context_tokens"] == estimate_tokens(parent)
+    assert tokens["tokens_saved"] == 0
+
+def test_passages_fill_the_budget_in_rank_order_and_end_on_a_sentence():
+    best = " ".join(words("a", 50))
+    second = " ".join(words("b", 60) + ["fin."] + words("c", 20))
+    third = " ".join(words("d", 50))
+    assembled, tokens = assemble_context(
+        [section(best, page=1), section(second, page=2), section(third, page=3)],
+        max_tokens=estimate_tokens(best) + 100
+    )
+
+    assert [passage["page"] for passage in assembled] == [1, 2]
+    assert assembled[0]["text"] == best
+    assert assembled[1]["text"].endswith("fin.")
+    assert tokens["context_tokens"] <= estimate_tokens(best) + 100
@@ -0,0 +1,31 @@
+import asyncio
+import numpy as np
+from document_processor import query_embedding_cache, search_documents, search_documents_async
+from vector_store import save_document_vectors
+
+def save_program(candidate_id: int, model, chunks):
+    save_document_vectors(candidate_id, "program", chunks, [{"page": i + 1} for i in range(len(chunks))],
+                          model.encode(chunks), "programme.pdf")
+
+def test_async_search_matches_the_sync_search(embedding_model):
+    chunks = ["Plus de pistes cyclables", "Une police municipale", "Des crèches ouvertes le samedi"]
+    save_program(150, embedding_model, chunks)
+
+    expected = search_documents(150, chunks[1], n_results=2)
+    results, embedding = asyncio.run(search_documents_async(150, chunks[1], n_results=2))
+    assert results == expected
+    assert results[0]["text"] == chunks[1]
+    np.testing.assert_array_equal(embedding, embedding_model.encode([chunks[1]])[0])
+
+def test_async_search_of_an_unprocessed_candidate_is_empty(embedding_model):
+    assert asyncio.run(search_documents_async(151, "transports ?")) == ([], None)
+
+def test_async_search_embeds_the_question_once(embedding_model):
+    save_program(152, embedding_model, ["Un marché bio le dimanche"])
+    stats = query_embedding_cache.stats()
+    encoded = embedding_model.encoded
+
+    asyncio.run(search_documents_async(152, "Quand ouvrira le marché ?"))
+    assert embedding_model.encoded == encoded + 1
+    after = query_embedding_cache.stats()
+    assert (after["hits"], after["misses"]) == (stats["hits"], stats["misses"] + 1)
@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from embedding_batcher import EmbeddingBatcher
+
+class RecordingEncoder:
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        return np.array([[len(text), i] for i, text in enumerate(texts)], dtype=np.float32)
+
+def test_concurrent_queries_share_one_model_call():
+    encode = RecordingEncoder()
+    batcher = EmbeddingBatcher(encode, window_ms=200, max_batch_size=16)
+    texts = [f"question {i}" for i in range(8)]
+    with ThreadPoolExecutor(8) as pool:
+        vectors = list(pool.map(batcher.embed, texts))
+
+    assert len(encode.calls) == 1
+    assert [vector[0] for vector in vectors] == [len(text) for text in texts]
+
+def test_identical_texts_in_a_batch_are_encoded_once():
+    encode = RecordingEncoder()
+    batcher = EmbeddingBatcher(encode, window_ms=200, max_batch_size=16)
+    futures = [batcher.submit("même question") for _ in range(3)]
+    vectors = [future.result(timeout=5) for future in futures]
+
+    assert encode.calls == [["même question"]]
+    assert all(np.array_equal(vector, vectors[0]) for vector in vectors)
+    # Each caller gets its own array
+    assert vectors[0] is not vectors[1]
+
+def test_encoder_errors_reach_every_caller():
+    def fail(texts):
+        raise RuntimeError("model unavailable")
+    batcher = EmbeddingBatcher(fail, window_ms=50, max_batch_size=4)
+    futures = [batcher.submit(text) for text in ("a", "b")]
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+import threading
+import numpy as np
+import embedding_store
+from embedding_store import ChunkEmbeddingStore, SharedEmbeddingStore, chunk_hash
+from vector_store import VECTORS_DIR
+
+os.makedirs(VECTORS_DIR, exist_ok=True)
+
+def vector(value: float, dim: int = 8) -> np.ndarray:
+    return np.full(dim, value, dtype=np.float32)
+
+def test_chunk_hash_ignores_spacing_and_unicode_form():
+    assert chunk_hash("Une  crèche\nle samedi") == chunk_hash("Une crèche le samedi")
+    assert chunk_hash("Une crèche") != chunk_hash("Une école")
+
+def test_save_keeps_listed_entries_and_reloads():
+    store = ChunkEmbeddingStore(201)
+    old, new, dropped = chunk_hash("ancien"), chunk_hash("nouveau"), chunk_hash("retiré")
+    store.save({old: vector(1), dropped: vector(2)}, keep=[old, dropped])
+    store.save({new: vector(3)}, keep=[old, new])
+
+    reloaded = ChunkEmbeddingStore(201)
+    assert len(reloaded) == 2 and dropped not in reloaded
+    np.testing.assert_array_equal(reloaded.get(old), vector(1))
+    np.testing.assert_array_equal(reloaded.get(new), vector(3))
+
+def test_concurrent_saves_keep_every_job_entries():
+    # Each store is loaded before any save, like jobs ingesting two documents at once
+    stores = [ChunkEmbeddingStore(202) for _ in range(8)]
+    barrier = threading.Barrier(len(stores))
+
+    def ingest(i: int):
+        entries = {chunk_hash(f"chunk {i}"): vector(i)}
+        barrier.wait()
+        stores[i].save(entries, entries.keys())
+
+    threads = [threading.Thread(target=ingest, args=(i,)) for i in range(len(stores))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reloaded = ChunkEmbeddingStore(202)
+    assert len(reloaded) == len(stores)
+    for i in range(len(stores)):
+        np.testing.assert_array_equal(reloaded.get(chunk_hash(f"chunk {i}")), vector(i))
+    assert not [name for name in os.listdir(VECTORS_DIR) if name.endswith(".tmp")]
+
+def test_shared_store_counts_hits_and_misses(tmp_path):
+    store = SharedEmbeddingStore(str(tmp_path / "shared.db"), max_bytes=1024 * 1024)
+    known, unknown = chunk_hash("connu"), chunk_hash("inconnu")
+    store.put_many({known: vector(5)})
+
+    found = store.get_many([known, unknown, known])
+    assert list(found) == [known]
+    np.testing.assert_array_equal(found[known], vector(5))
+    assert store.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+    assert store.size() == {"entries": 1, "bytes": 32}
+
+def test_shared_store_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = iter(range(1, 1000))
+    monkeypatch.setattr(embedding_store.time, "time", lambda: float(next(clock)))
+    # Room for three 32-byte embeddings
+    store = SharedEmbeddingStore(str(tmp_path / "shared.db"), max_bytes=96)
+    keys = [chunk_hash(f"chunk {i}") for i in range(4)]
+    for i, key in enumerate(keys[:3]):
+        store.put_many({key: vector(i)})
+    store.get_many([keys[0]])
+    store.put_many({keys[3]: vector(3)})
+
+    assert set(store.get_many(keys)) == {keys[0], keys[2], keys[3]}
+    assert store.stats()["evictions"] == 1
+    assert store.size() == {"entries": 3, "bytes": 96}
+
+def test_shared_store_totals_follow_replacements_and_existing_stores(tmp_path):
+    path = str(tmp_path / "shared.db")
+    store = SharedEmbeddingStore(path, max_bytes=1024 * 1024)
+    key = chunk_hash("chunk")
+    store.put_many({key: vector(1)})
+    store.put_many({key: vector(1, dim=16), chunk_hash("other"): vector(2)})
+    assert store.size() == {"entries": 2, "bytes": 96}
+
+    # A store written before the totals existed gets them computed once
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE totals")
+    assert SharedEmbeddingStore(path, max_bytes=1024 * 1024).size() == {"entries": 2, "bytes": 96}
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+import docx
+from extraction import iter_docx_pages
+from document_processor import process_document
+
+def write_docx(path: str, paragraph_count: int):
+    document = docx.Document()
+    for i in range(paragraph_count):
+        document.add_paragraph(f"Paragraphe {i}. " + "mot " * 98)
+    document.save(path)
+
+def test_docx_pages_group_paragraphs_by_words(tmp_path):
+    path = str(tmp_path / "programme.docx")
+    write_docx(path, 12)
+    pages = list(iter_docx_pages(path))
+    assert [number for number, _ in pages] == [1, 2, 3]
+    assert pages[0][1].startswith("Paragraphe 0.") and "Paragraphe 5." in pages[1][1]
+
+def test_pool_extraction_yields_the_same_pages(tmp_path):
+    path = str(tmp_path / "programme.docx")
+    write_docx(path, 12)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        assert list(iter_docx_pages(path, pool)) == list(iter_docx_pages(path))
+
+def test_process_document_reports_progress_while_streaming(tmp_path, embedding_model):
+    path = str(tmp_path / "programme.docx")
+    write_docx(path, 12)
+    updates = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        result = process_document(path, 9101, "programme.docx", progress=lambda **update: updates.append(update),
+                                  cpu_pool=pool)
+
+    assert result["total_pages"] == 3
+    assert result["total_chunks"] > 0 and embedding_model.encoded == result["chunks_embedded"]
+    assert [update["stage"] for update in updates if "stage" in update] == ["extracting", "embedding", "persisting"]
+    assert [update["pages_parsed"] for update in updates if "pages_parsed" in update] == [1, 2, 3]
+    assert set(result["timings_ms"]) == {"extract", "chunk", "embed", "persist"}
@@ -0,0 +1,142 @@
+import socket
+import subprocess
+import time
+from datetime import datetime, timedelta
+import docx
+from sqlalchemy import or_
+import jobs
+from config import settings
+from jobs import IngestionJobManager, WORKER_ID
+
+def wait_for(database, job_id: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db = database.SessionLocal()
+        try:
+            job = db.get(database.IngestionJob, job_id)
+            if job.status in ("succeeded", "failed"):
+                return job
+        finally:
+            db.close()
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def write_docx(path: str, paragraphs):
+    document = docx.Document()
+    for paragraph in paragraphs:
+        document.add_paragraph(paragraph)
+    document.save(path)
+
+def test_job_ingests_the_document_and_flags_the_candidate(database, make_candidate, embedding_model, tmp_path):
+    candidate_id = make_candidate()
+    path = str(tmp_path / "programme.docx")
+    write_docx(path, ["Nous créerons des pistes cyclables.", "Nous ouvrirons une crèche le samedi."])
+    manager = IngestionJobManager(workers=1, process_workers=1)
+    try:
+        job = manager.submit(candidate_id, "program", "programme.docx", path)
+        assert job.status == "queued" and job.worker == WORKER_ID
+        job = wait_for(database, job.id)
+    finally:
+        manager.shutdown()
+
+    assert job.status == "succeeded", job.error
+    db = database.SessionLocal()
+    try:
+        assert db.get(database.Candidate, candidate_id).program_processed
+    finally:
+        db.close()
+
+def test_failed_job_records_the_error(database, make_candidate, embedding_model, tmp_path):
+    path = tmp_path / "broken.pdf"
+    path.write_bytes(b"not a pdf")
+    manager = IngestionJobManager(workers=1, process_workers=1)
+    try:
+        job = wait_for(database, manager.submit(make_candidate(), "program", "broken.pdf", str(path)).id)
+    finally:
+        manager.shutdown()
+    assert job.status == "failed" and job.error
+
+def add_running_jobs(database, candidate_id: int, workers: dict, heartbeat_at: datetime):
+    db = database.SessionLocal()
+    try:
+        db.query(database.IngestionJob).filter(or_(
+            database.IngestionJob.status.in_(("queued", "running")), database.IngestionJob.id.like("orphan-%")
+        )).delete(synchronize_session=False)
+        for name, worker in workers.items():
+            db.add(database.IngestionJob(id=f"orphan-{name}", candidate_id=candidate_id, doc_type="program",
+                                         filename="p.pdf", file_path="p.pdf", status="running", worker=worker,
+                                         heartbeat_at=heartbeat_at))
+        db.commit()
+    finally:
+        db.close()
+
+def statuses(database, names) -> dict:
+    db = database.SessionLocal()
+    try:
+        return {name: db.get(database.IngestionJob, f"orphan-{name}").status for name in names}
+    finally:
+        db.close()
+
+def test_only_jobs_of_vanished_workers_are_failed(database, make_candidate):
+    sibling = subprocess.Popen(["sleep", "30"])
+    workers = {
+        "other_host": "other-replica:1",
+        "sibling": f"{socket.gethostname()}:{sibling.pid}",
+        "dead": f"{socket.gethostname()}:{2 ** 22 + 1}",
+        "own": WORKER_ID,
+        "unknown": None
+    }
+    try:
+        add_running_jobs(database, make_candidate(), workers, datetime.utcnow())
+        manager = IngestionJobManager(workers=1, process_workers=1)
+
+        # Recent heartbeats: another host's replica is still running its job
+        assert manager.fail_orphaned() == 1
+        assert statuses(database, workers) == {
+            "other_host": "running", "sibling": "running", "dead": "failed", "own": "running", "unknown": "running"
+        }
+        # A restarted server can reuse the pid recorded on its predecessor's jobs
+        assert manager.fail_orphaned(restarted=True) == 1
+        assert statuses(database, ["own"]) == {"own": "failed"}
+    finally:
+        sibling.kill()
+
+def test_jobs_without_a_recent_heartbeat_are_failed(database, make_candidate):
+    workers = {"other_host": "other-replica:1", "unknown": None, "own": WORKER_ID}
+    stale = datetime.utcnow() - timedelta(seconds=settings.INGESTION_STALE_SECONDS + 1)
+    add_running_jobs(database, make_candidate(), workers, stale)
+    manager = IngestionJobManager(workers=1, process_workers=1)
+
+    # This process's own jobs are kept alive by heartbeat(), never failed while it runs
+    manager.heartbeat()
+    assert manager.fail_orphaned() == 2
+    assert statuses(database, workers) == {"other_host": "failed", "unknown": "failed", "own": "running"}
+
+def test_a_failed_job_is_not_resurrected_when_its_thread_completes(database, make_candidate, embedding_model,
+                                                                      tmp_path, monkeypatch):
+    candidate_id = make_candidate()
+    path = str(tmp_path / "programme.docx")
+    write_docx(path, ["Nous planterons mille arbres."])
+    manager = IngestionJobManager(workers=1, process_workers=1)
+
+    def process_document(*args, **kwargs):
+        # Another replica's sweep gives up on the job while it is processed
+        db = database.SessionLocal()
+        db.query(database.IngestionJob).filter_by(id=job.id).update({"status": "failed", "error": "Interrupted"})
+        db.commit()
+        db.close()
+        return {"total_chunks": 1}
+    monkeypatch.setattr(jobs, "process_document", process_document)
+
+    job = manager.submit(candidate_id, "program", "programme.docx", path)
+    try:
+        job = wait_for(database, job.id)
+        time.sleep(0.2)
+    finally:
+        manager.shutdown()
+    db = database.SessionLocal()
+    try:
+        assert db.get(database.IngestionJob, job.id).status == "failed"
+        assert not db.get(database.Candidate, candidate_id).program_processed
+    finally:
+        db.close()
@@ -0,0 +1,42 @@
+import numpy as np
+from lexical_index import BM25Index, bm25_scores, build_bm25, fold, reciprocal_rank_fusion, tokenize
+
+CHUNKS = [
+    "Nous créerons des pistes cyclables dans tous les quartiers.",
+    "La révision du PLU protégera les espaces verts.",
+    "Les locaux associatifs seront rénovés en 2027.",
+    "Nous ouvrirons une piste de ski synthétique."
+]
+
+def index(chunks) -> BM25Index:
+    return BM25Index(*build_bm25(chunks))
+
+def test_fold_and_tokenize():
+    assert fold("Œuvre à l'État") == "oeuvre a l'etat"
+    assert tokenize("Quels locaux pour les associations en 2027 ?") == ["local", "association", "2027"]
+    assert tokenize("Le PLU et la ZFE") == ["plu", "zfe"]
+
+def test_bm25_ranks_matching_rows_across_segments():
+    first, second = index(CHUNKS[:2]), index(CHUNKS[2:])
+    starts = np.array([0, 2, 4, 6])
+    scores = bm25_scores([first, second, None], starts, "Pistes cyclables ?")
+
+    assert scores.shape == (6,)
+    assert set(np.flatnonzero(scores)) == {0, 3}
+    # Both query terms beat one
+    assert scores[0] > scores[3]
+    assert bm25_scores([first, second, None], starts, "de la le").sum() == 0
+
+def test_bm25_matches_digits_and_acronyms():
+    scores = bm25_scores([index(CHUNKS)], np.array([0, len(CHUNKS)]), "Que prévoit le PLU ?")
+    assert int(np.argmax(scores)) == 1
+    scores = bm25_scores([index(CHUNKS)], np.array([0, len(CHUNKS)]), "local 2027")
+    assert int(np.argmax(scores)) == 2
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    rows, scores = reciprocal_rank_fusion([np.array([1, 2, 3]), np.array([2, 3, 4])], [1.0, 1.0])
+    assert rows[0] == 2 and set(rows.tolist()) == {1, 2, 3, 4}
+    assert np.all(np.diff(scores) <= 0)
+
+    rows, _ = reciprocal_rank_fusion([np.array([1, 2]), np.array([2, 1])], [2.0, 1.0])
+    assert rows.tolist() == [1, 2]
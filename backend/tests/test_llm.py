@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import llm
+from database import Candidate
+
+def candidate() -> Candidate:
+    return Candidate(id=160, name="Jean Dupont", tone="friendly", response_length="concise")
+
+def chunk(content, usage=None):
+    return SimpleNamespace(data=SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))],
+        usage=usage
+    ))
+
+@pytest.fixture
+def bookkeeping(monkeypatch):
+    """Costs logged and answers cached by the LLM module."""
+    recorded = {"costs": [], "cached": []}
+
+    async def log_cost(candidate_id, model, input_tokens, output_tokens, operation):
+        await asyncio.sleep(0.01)
+        recorded["costs"].append((input_tokens, output_tokens))
+        return 0.001
+
+    async def cache_answer(candidate_id, question, answer, question_embedding=None, signature=""):
+        recorded["cached"].append(answer)
+
+    async def no_cached_answer(*args, **kwargs):
+        return None
+
+    monkeypatch.setattr(llm, "log_cost", log_cost)
+    monkeypatch.setattr(llm, "cache_answer", cache_answer)
+    monkeypatch.setattr(llm, "get_cached_answer", no_cached_answer)
+    return recorded
+
+def stream_of(monkeypatch, chunks, error=None, delay=0.0):
+    async def stream_async(**kwargs):
+        async def events():
+            for item in chunks:
+                await asyncio.sleep(delay)
+                yield item
+            if error is not None:
+                raise error
+        return events()
+    monkeypatch.setattr(llm.mistral_client.chat, "stream_async", stream_async)
+
+def generate(question="Quelle politique de transports ?"):
+    sections = [{"text": "Plus de pistes cyclables.", "page": 1, "source": "p.pdf", "doc_type": "program"}]
+    return llm.generate_response_stream(None, candidate(), question, sections)
+
+async def collect(stream):
+    return [event async for event in stream]
+
+def test_complete_stream_logs_usage_and_caches_the_answer(monkeypatch, bookkeeping):
+    usage = SimpleNamespace(prompt_tokens=900, completion_tokens=3)
+    stream_of(monkeypatch, [chunk("Des "), chunk("pistes "), chunk("cyclables.", usage)])
+    events = asyncio.run(collect(generate()))
+
+    assert [event["content"] for event in events if event["type"] == "delta"] == ["Des ", "pistes ", "cyclables."]
+    assert events[-1]["type"] == "done" and events[-1]["cost"] == 0.001
+    assert bookkeeping["costs"] == [(900, 3)]
+    assert bookkeeping["cached"] == ["Des pistes cyclables."]
+
+def test_closed_stream_still_logs_the_cost_of_streamed_tokens(monkeypatch, bookkeeping):
+    stream_of(monkeypatch, [chunk(f"mot{i} ") for i in range(50)])
+
+    async def disconnect_after_two_deltas():
+        stream = generate()
+        await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+
+    asyncio.run(disconnect_after_two_deltas())
+    assert len(bookkeeping["costs"]) == 1
+    input_tokens, output_tokens = bookkeeping["costs"][0]
+    assert input_tokens > 0 and output_tokens > 0
+    # A partial answer is never cached
+    assert bookkeeping["cached"] == []
+
+def test_cancelled_stream_finishes_its_bookkeeping(monkeypatch, bookkeeping):
+    stream_of(monkeypatch, [chunk(f"mot{i} ") for i in range(50)], delay=0.01)
+
+    async def cancel_mid_stream():
+        task = asyncio.create_task(collect(generate()))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Let a shielded write that outlived the request complete
+        await asyncio.sleep(0.05)
+
+    asyncio.run(cancel_mid_stream())
+    assert len(bookkeeping["costs"]) == 1
+    assert bookkeeping["cached"] == []
+
+def test_error_after_deltas_replaces_the_partial_answer(monkeypatch, bookkeeping):
+    stream_of(monkeypatch, [chunk("Début de réponse ")], error=RuntimeError("connection reset"))
+    events = asyncio.run(collect(generate()))
+
+    assert [event["type"] for event in events] == ["delta", "error", "done"]
+    assert events[1]["message"] == llm.TECHNICAL_ERROR_ANSWER
+    assert events[2]["error"] is True
+    assert bookkeeping["cached"] == []
+    assert len(bookkeeping["costs"]) == 1
@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+import pytest
+import log_writer as log_writer_module
+from answer_cache import AnswerCache
+from budget import DailyCostTracker
+from log_writer import LogWriter
+
+@pytest.fixture
+def caches(monkeypatch):
+    """Fresh in-memory caches fed by the writer."""
+    answers, tracker = AnswerCache(max_entries=16, ttl_seconds=60), DailyCostTracker()
+    monkeypatch.setattr(log_writer_module, "answer_cache", answers)
+    monkeypatch.setattr(log_writer_module, "cost_tracker", tracker)
+    return answers, tracker
+
+def run(database, writer: LogWriter, records):
+    async def write():
+        try:
+            writer.start()
+            for method, values in records:
+                await getattr(writer, method)(**values)
+            await writer.close()
+        finally:
+            await database.async_engine.dispose()
+    asyncio.run(write())
+
+def cost(candidate_id: int, usd: float) -> dict:
+    return {"candidate_id": candidate_id, "date": datetime.utcnow(), "model": "mistral-small-latest",
+            "input_tokens": 100, "output_tokens": 50, "cost_usd": usd, "operation": "chat"}
+
+def answer(candidate_id: int, question_hash: str, text: str, signature: str = "sig") -> dict:
+    return {"signature": signature, "candidate_id": candidate_id, "question_hash": question_hash,
+            "question": "Quelle est votre position ?", "answer": text, "question_embedding": None}
+
+def test_records_are_written_in_batches_and_roll_up_costs(database, make_candidate, caches):
+    _, tracker = caches
+    candidate_id = make_candidate()
+    writer = LogWriter(batch_size=3, interval=5, max_queue=100)
+    records = [("log_cost", cost(candidate_id, 0.25)) for _ in range(4)]
+    records += [("log_conversation", {"candidate_id": candidate_id, "question": "q", "answer": "a"})] * 2
+    run(database, writer, records)
+
+    assert writer.stats() == {"queued": 0, "written": 6, "dropped": 0, "batches": 2}
+    assert tracker.daily_cost(candidate_id) == 1.0
+    db = database.SessionLocal()
+    try:
+        rollup = db.query(database.CostRollup).filter_by(candidate_id=candidate_id).one()
+        assert (rollup.requests, rollup.input_tokens, rollup.cost_usd) == (4, 400, 1.0)
+        assert db.query(database.Conversation).filter_by(candidate_id=candidate_id).count() == 2
+    finally:
+        db.close()
+
+def test_cached_answers_are_deduplicated_then_served_from_memory(database, make_candidate, caches):
+    answers, _ = caches
+    candidate_id = make_candidate()
+    run(database, LogWriter(batch_size=10, interval=5, max_queue=100), [("cache_answer", answer(candidate_id, "h1", "first"))])
+    run(database, LogWriter(batch_size=10, interval=5, max_queue=100), [
+        ("cache_answer", answer(candidate_id, "h1", "again")),
+        ("cache_answer", answer(candidate_id, "h2", "second")),
+        ("cache_answer", answer(candidate_id, "h2", "duplicate")),
+        ("cache_answer", answer(candidate_id, "h2", "after upload", signature="new-sig"))
+    ])
+
+    db = database.SessionLocal()
+    try:
+        rows = db.query(database.QACache).filter_by(candidate_id=candidate_id).order_by(database.QACache.id).all()
+        assert [(row.question_hash, row.signature, row.answer) for row in rows] == [
+            ("h1", "sig", "first"), ("h2", "sig", "second"), ("h2", "new-sig", "after upload")
+        ]
+    finally:
+        db.close()
+    assert answers.get(candidate_id, "sig", "h1") == (rows[0].id, "first")
+    assert answers.get(candidate_id, "sig", "h2") == (rows[1].id, "second")
+    assert answers.get(candidate_id, "new-sig", "h2") == (rows[2].id, "after upload")
+
+def test_records_are_written_directly_when_not_started(database, make_candidate, caches):
+    candidate_id = make_candidate()
+    writer = LogWriter(batch_size=10, interval=5, max_queue=100)
+
+    async def write():
+        try:
+            await writer.log_cost(**cost(candidate_id, 0.5))
+        finally:
+            await database.async_engine.dispose()
+    asyncio.run(write())
+    assert caches[1].daily_cost(candidate_id) == 0.5
@@ -0,0 +1,66 @@
+import asyncio
+import docx
+from document_processor import embed_query, process_document
+from metrics import Counter, Gauge, Histogram, Registry, stage_seconds, timed
+
+def stage_count(stage: str) -> int:
+    counts = {labels: value for name, labels, value in stage_seconds.samples() if name.endswith("_count")}
+    return counts.get(f'{{stage="{stage}"}}', 0)
+
+def test_render_prometheus_text_format():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ["status"]))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    registry.register(Gauge("queue", "Queued.", lambda: {"logs": 3}, labelname="kind"))
+    registry.register(Gauge("broken", "Fails.", lambda: 1 / 0))
+    requests.inc(status="ok")
+    requests.inc(2, status="ok")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(4.0)
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{status="ok"} 3',
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 4.55",
+        "latency_seconds_count 3",
+        "# HELP queue Queued.",
+        "# TYPE queue gauge",
+        'queue{kind="logs"} 3'
+    ]
+
+def test_timed_observes_sync_and_async_calls_even_when_they_fail():
+    @timed("test_sync")
+    def fail():
+        raise ValueError
+
+    @timed("test_async")
+    async def wait():
+        await asyncio.sleep(0)
+        return 42
+
+    try:
+        fail()
+    except ValueError:
+        pass
+    assert asyncio.run(wait()) == 42
+    assert stage_count("test_sync") == 1
+    assert stage_count("test_async") == 1
+
+def test_ingestion_embeddings_are_not_timed_as_query_embedding(tmp_path, embedding_model):
+    path = str(tmp_path / "programme.docx")
+    document = docx.Document()
+    document.add_paragraph("Nous rénoverons toutes les écoles de la ville avant la fin du mandat.")
+    document.save(path)
+    embed, ingest = stage_count("embed"), stage_count("ingest_embed")
+
+    process_document(path, 9301, "programme.docx")
+    assert (stage_count("embed"), stage_count("ingest_embed")) == (embed, ingest + 1)
+    embed_query("Que ferez-vous pour les écoles ?")
+    assert stage_count("embed") == embed + 1
@@ -0,0 +1,32 @@
+import asyncio
+from datetime import date, timedelta
+import pytest
+from rate_limiter import DatabaseRateLimitStore, MemoryRateLimitStore, hash_ip
+
+TODAY = date(2026, 3, 15)
+
+def count_messages(database, store, candidate_id: int, days, limit: int = 2):
+    async def run():
+        try:
+            async with database.AsyncSessionLocal() as db:
+                return [await store.increment(db, candidate_id, hash_ip("203.0.113.7"), day, limit) for day in days]
+        finally:
+            await database.async_engine.dispose()
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("store_class", [MemoryRateLimitStore, DatabaseRateLimitStore])
+def test_messages_are_counted_up_to_the_daily_limit(database, make_candidate, store_class):
+    candidate_id = make_candidate()
+    store = store_class()
+    assert count_messages(database, store, candidate_id, [TODAY] * 3) == [1, 2, None]
+    assert count_messages(database, store, make_candidate(), [TODAY]) == [1]
+    assert count_messages(database, store, candidate_id, [TODAY + timedelta(days=1)]) == [1]
+
+def test_database_counts_are_shared_by_workers(database, make_candidate):
+    candidate_id = make_candidate()
+    assert count_messages(database, DatabaseRateLimitStore(), candidate_id, [TODAY]) == [1]
+    assert count_messages(database, DatabaseRateLimitStore(), candidate_id, [TODAY] * 2) == [2, None]
+
+def test_ips_are_stored_hashed():
+    assert hash_ip("203.0.113.7") != "203.0.113.7"
+    assert hash_ip("203.0.113.7") == hash_ip("203.0.113.7")
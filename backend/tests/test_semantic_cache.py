@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime
+import numpy as np
+from semantic_cache import REFRESH_OVERLAP, CachedQuestions, SemanticAnswerCache, encode_embedding
+
+DIM = 16
+
+def unit(seed: int) -> np.ndarray:
+    return np.frombuffer(encode_embedding(np.random.default_rng(seed).standard_normal(DIM)), dtype=np.float32)
+
+def test_cached_questions_grow_and_remove_in_place():
+    index = CachedQuestions(DIM, capacity=2)
+    index.add([(i, unit(i).tobytes()) for i in range(5)])
+    index.add([(3, unit(3).tobytes())])
+    assert len(index) == 5 and len(index.ids) >= 5
+
+    index.remove(1)
+    index.remove(42)
+    assert len(index) == 4
+    assert sorted(index.ids[:index.size].tolist()) == [0, 2, 3, 4]
+    for i in (0, 2, 3, 4):
+        cache_id, similarity = index.nearest(unit(i))
+        assert cache_id == i and similarity > 0.999
+
+def test_empty_index_has_no_nearest_question():
+    assert CachedQuestions(DIM).nearest(unit(0)) == (None, 0.0)
+
+def add_question(database, candidate_id: int, seed: int, created_at: datetime, signature: str = "sig") -> int:
+    db = database.SessionLocal()
+    try:
+        row = database.QACache(candidate_id=candidate_id, question_hash=f"q{seed}", question=f"question {seed}",
+                               answer=f"réponse {seed}", question_embedding=unit(seed).tobytes(), created_at=created_at,
+                               signature=signature)
+        db.add(row)
+        db.commit()
+        return row.id
+    finally:
+        db.close()
+
+def lookup(database, cache: SemanticAnswerCache, candidate_id: int, seed: int, signature: str = "sig"):
+    async def run():
+        try:
+            async with database.AsyncSessionLocal() as db:
+                return await cache.lookup(db, candidate_id, signature, unit(seed))
+        finally:
+            await database.async_engine.dispose()
+    return asyncio.run(run())
+
+def test_lookup_hits_similar_questions_only(database, make_candidate):
+    candidate_id = make_candidate()
+    cache_id = add_question(database, candidate_id, 1, datetime.utcnow())
+    cache = SemanticAnswerCache(threshold=0.9, refresh_seconds=0, max_candidates=4)
+
+    assert lookup(database, cache, candidate_id, 1) == cache_id
+    assert lookup(database, cache, candidate_id, 2) is None
+    assert cache.stats() == {"candidates": 1, "hits": 1, "misses": 1}
+
+def test_refresh_picks_up_rows_committed_late_with_older_timestamps(database, make_candidate):
+    candidate_id = make_candidate()
+    now = datetime.utcnow()
+    add_question(database, candidate_id, 1, now)
+    cache = SemanticAnswerCache(threshold=0.9, refresh_seconds=0, max_candidates=4)
+    assert lookup(database, cache, candidate_id, 2) is None
+
+    # Other workers' transactions started earlier but committed after the first refresh
+    late_id = add_question(database, candidate_id, 2, now - REFRESH_OVERLAP / 2)
+    add_question(database, candidate_id, 3, now - 2 * REFRESH_OVERLAP)
+    assert lookup(database, cache, candidate_id, 2) == late_id
+    assert lookup(database, cache, candidate_id, 3) is None
+
+def test_added_and_discarded_questions_apply_to_loaded_indexes(database, make_candidate):
+    candidate_id = make_candidate()
+    cache = SemanticAnswerCache(threshold=0.9, refresh_seconds=3600, max_candidates=4)
+    assert lookup(database, cache, candidate_id, 4) is None
+
+    cache.add(candidate_id, "sig", 999_001, unit(4).tobytes())
+    cache.add(candidate_id, "other-sig", 999_002, unit(5).tobytes())
+    assert lookup(database, cache, candidate_id, 4) == 999_001
+    assert lookup(database, cache, candidate_id, 5) is None
+    cache.discard(candidate_id, 999_001)
+    assert lookup(database, cache, candidate_id, 4) is None
+
+def test_only_questions_answered_under_the_current_signature_hit(database, make_candidate):
+    candidate_id = make_candidate()
+    now = datetime.utcnow()
+    add_question(database, candidate_id, 1, now, signature="before-upload")
+    legacy_id = add_question(database, candidate_id, 2, now, signature=None)
+    current_id = add_question(database, candidate_id, 3, now, signature="after-upload")
+    cache = SemanticAnswerCache(threshold=0.9, refresh_seconds=3600, max_candidates=4)
+
+    assert lookup(database, cache, candidate_id, 1, "before-upload") is not None
+    # A new signature rebuilds the index even before the refresh interval
+    assert lookup(database, cache, candidate_id, 1, "after-upload") is None
+    assert lookup(database, cache, candidate_id, 2, "after-upload") == legacy_id
+    assert lookup(database, cache, candidate_id, 3, "after-upload") == current_id
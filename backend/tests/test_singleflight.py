@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def answer():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "réponse"
+
+        results = await asyncio.gather(*(flight.do("q", answer) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {"réponse"}
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "collapsed": 4}
+
+def test_waiters_receive_the_owner_error():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("mistral down")
+
+        return flight, await asyncio.gather(flight.do("q", fail), flight.do("q", fail), return_exceptions=True)
+
+    flight, results = asyncio.run(run())
+    assert [str(result) for result in results] == ["mistral down", "mistral down"]
+    assert flight.stats()["executions"] == 1
+
+def test_waiter_takes_over_when_the_owner_is_cancelled():
+    async def run():
+        flight = SingleFlight()
+        started = []
+
+        async def answer():
+            started.append(1)
+            await asyncio.sleep(0.05)
+            return "réponse"
+
+        owner = asyncio.create_task(flight.do("q", answer))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("q", answer))
+        await asyncio.sleep(0.01)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return flight, started, await waiter
+
+    flight, started, result = asyncio.run(run())
+    assert result == ("réponse", False)
+    assert len(started) == 2
+    assert flight.stats()["in_flight"] == 0
+
+def test_cancelled_waiter_does_not_cancel_the_owner():
+    async def run():
+        flight = SingleFlight()
+
+        async def answer():
+            await asyncio.sleep(0.05)
+            return "réponse"
+
+        owner = asyncio.create_task(flight.do("q", answer))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("q", answer))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await owner
+
+    assert asyncio.run(run()) == ("réponse", False)
@@ -0,0 +1,147 @@
+import os
+import pickle
+import numpy as np
+import pytest
+from migrate_vectors import migrate_legacy_vectors, unmigrated_legacy_files
+from vector_store import (
+    STORAGE_DTYPES, VECTORS_DIR, VectorStore, document_dir, normalize_embeddings, quantize_embeddings,
+    save_document_vectors, score_embeddings
+)
+
+DIM = 32
+DOC_TYPES = ["program", "talking_points", "competitive"]
+
+def random_embeddings(n: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+def save(candidate_id: int, doc_type: str, chunks, embeddings, **kwargs) -> str:
+    metadata = [{"page": i + 1, "chunk": i} for i in range(len(chunks))]
+    return save_document_vectors(candidate_id, doc_type, chunks, metadata, embeddings, f"{doc_type}.pdf", **kwargs)
+
+def test_index_is_cached_until_a_new_version_is_saved():
+    store = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"])
+    save(101, "program", ["a", "b"], random_embeddings(2))
+
+    index = store.load_index(101)
+    assert store.load_index(101) is index
+
+    save(101, "program", ["a", "b", "c"], random_embeddings(3))
+    reloaded = store.load_index(101)
+    assert reloaded is not index
+    assert len(reloaded) == 3
+
+def test_unprocessed_candidate_has_no_index():
+    store = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"])
+    assert store.load_index(102) is None
+
+def test_cache_is_bounded_by_bytes():
+    store = VectorStore(max_bytes=DIM * 4 * 150, doc_types=["program"])
+    save(103, "program", [f"chunk {i}" for i in range(100)], random_embeddings(100))
+    save(104, "program", [f"chunk {i}" for i in range(100)], random_embeddings(100, seed=1))
+
+    store.load_index(103)
+    store.load_index(104)
+    assert store.stats()["entries"] == 1
+
+def test_saved_document_round_trips_through_the_mapped_format():
+    embeddings = random_embeddings(3)
+    path = save(110, "program", ["Sécurité", "Écologie", "Culture"], embeddings)
+    store = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"])
+    document = store.load(110, "program")
+
+    assert [document.chunks[i] for i in range(3)] == ["Sécurité", "Écologie", "Culture"]
+    assert document.pages.tolist() == [1, 2, 3]
+    assert isinstance(document.embeddings, np.memmap)
+    normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.testing.assert_allclose(document.embeddings, normalized, rtol=1e-6)
+    assert document.version == os.path.basename(path)
+
+def test_new_version_replaces_the_previous_one():
+    first = save(111, "program", ["old"], random_embeddings(1))
+    second = save(111, "program", ["new"], random_embeddings(1))
+    assert not os.path.exists(first)
+    assert sorted(os.listdir(document_dir(111, "program"))) == ["CURRENT", os.path.basename(second)]
+
+def test_parents_and_hashes_are_stored_with_their_units():
+    metadata = [{"page": 1, "parent": 0}, {"page": 1, "parent": 0}, {"page": 2, "parent": 1}]
+    hashes = [bytes([i]) * 16 for i in range(3)]
+    save_document_vectors(112, "program", ["u1", "u2", "u3"], metadata, random_embeddings(3), "p.pdf",
+                          hashes=hashes, parents=["u1 u2", "u3"])
+    document = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"]).load(112, "program")
+
+    assert [document.parents[int(i)] for i in document.parent_ids] == ["u1 u2", "u1 u2", "u3"]
+    assert [row.tobytes() for row in document.hashes] == hashes
+
+def test_legacy_pickles_are_migrated_by_the_cli_function():
+    os.makedirs(VECTORS_DIR, exist_ok=True)
+    legacy = os.path.join(VECTORS_DIR, "candidate_113_talking_points.pkl")
+    with open(legacy, "wb") as f:
+        pickle.dump({"chunks": ["a", "b"], "metadata": [{"page": 1, "source": "tp.docx"}, {"page": 2}],
+                     "embeddings": random_embeddings(2)}, f)
+
+    assert unmigrated_legacy_files() == [legacy]
+    assert migrate_legacy_vectors() == 1
+    assert not os.path.exists(legacy) and unmigrated_legacy_files() == []
+    document = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["talking_points"]).load(113, "talking_points")
+    assert document.source == "tp.docx"
+    assert len(document) == 2
+
+def test_kept_pickles_of_migrated_documents_are_not_reported():
+    os.makedirs(VECTORS_DIR, exist_ok=True)
+    legacy = os.path.join(VECTORS_DIR, "candidate_114.pkl")
+    with open(legacy, "wb") as f:
+        pickle.dump({"chunks": ["a"], "embeddings": random_embeddings(1)}, f)
+
+    assert migrate_legacy_vectors(keep=True) == 1
+    assert os.path.exists(legacy) and legacy not in unmigrated_legacy_files()
+    assert migrate_legacy_vectors() == 0
+    assert not os.path.exists(legacy)
+
+def unit(index: int) -> np.ndarray:
+    vector = np.zeros(DIM, dtype=np.float32)
+    vector[index] = 1.0
+    return vector
+
+def test_one_search_ranks_all_documents_of_a_candidate():
+    save(120, "program", ["programme transports"], np.stack([unit(0) + 0.2 * unit(1)]))
+    save(120, "talking_points", ["éléments transports"], np.stack([unit(0)]))
+    save(120, "competitive", ["adversaire culture"], np.stack([unit(2)]))
+    index = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=DOC_TYPES).load_index(120)
+
+    results = index.search(unit(0), n_results=2)
+    assert [result["doc_type"] for result in results] == ["talking_points", "program"]
+    assert results[0]["similarity"] == pytest.approx(1.0)
+
+def test_search_filters_and_weights_document_types():
+    save(121, "program", ["programme"], np.stack([unit(0)]))
+    save(121, "competitive", ["adversaire"], np.stack([unit(0) + 0.1 * unit(1)]))
+    index = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=DOC_TYPES).load_index(121)
+
+    assert [r["doc_type"] for r in index.search(unit(0), 2, doc_types=["competitive"])] == ["competitive"]
+    weighted = index.search(unit(0), 2, weights={"program": 0.5})
+    assert [r["doc_type"] for r in weighted] == ["competitive", "program"]
+
+@pytest.mark.parametrize("dtype", STORAGE_DTYPES)
+def test_quantized_storage_keeps_the_ranking(dtype):
+    embeddings = normalize_embeddings(random_embeddings(200, seed=3))
+    matrix, scales = quantize_embeddings(embeddings, dtype)
+    queries = normalize_embeddings(random_embeddings(20, seed=4))
+
+    for query in queries:
+        exact = embeddings @ query
+        scores = score_embeddings(matrix, query, scales)
+        np.testing.assert_allclose(scores, exact, atol=0.02)
+        assert int(np.argmax(scores)) == int(np.argmax(exact))
+
+def test_int8_documents_store_codes_and_scales():
+    save(130, "program", [f"c{i}" for i in range(50)], random_embeddings(50), dtype="int8")
+    document = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"]).load(130, "program")
+    assert document.embeddings.dtype == np.int8
+    assert document.scales.shape == (DIM,)
+
+    index = VectorStore(max_bytes=64 * 1024 * 1024, doc_types=["program"]).load_index(130)
+    assert index.search(random_embeddings(50)[7], n_results=1)[0]["text"] == "c7"
+
+def test_unknown_storage_dtype_is_rejected():
+    with pytest.raises(ValueError):
+        quantize_embeddings(random_embeddings(2), "int4")
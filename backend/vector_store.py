@@ -0,0 +1,461 @@
+import os
+import json
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from ann_index import IVFIndex, build_ivf
+from lexical_index import BM25Index, bm25_scores, build_bm25, reciprocal_rank_fusion
+from cache import LRUCache
+from config import settings
+from metrics import timed
+
+VECTORS_DIR = "./vectors"
+os.makedirs(VECTORS_DIR, exist_ok=True)
+
+# On-disk layout of a processed document (one directory per candidate and doc type):
+#
+#   candidate_{id}_{doc_type}/CURRENT          name of the live version directory
+#   candidate_{id}_{doc_type}/{version}/
+#       meta.json        format version, counts, dimensions, storage dtype, source filename
+#       embeddings.npy   (n_chunks, dim) L2-normalized matrix in the storage dtype
+#                        (float32, float16 or int8), loaded with mmap_mode="r"
+#       scales.npy       (dim,) float32 per-dimension scales, int8 storage only
+#       chunks.bin       UTF-8 chunk texts, concatenated
+#       offsets.npy      (n_chunks + 1,) int64 byte offsets into chunks.bin
+#       pages.npy        (n_chunks,) int32 page numbers
+#       chunk_ids.npy    (n_chunks,) int32 chunk index within its page
+#       hashes.npy       (n_chunks, 16) uint8 content hashes of the chunks (see embedding_store)
+#       parents.bin      optional UTF-8 parent passages, concatenated (see chunking.SentenceChunker)
+#       parent_offsets.npy  (n_parents + 1,) int64 byte offsets into parents.bin
+#       parent_ids.npy   (n_chunks,) int32 parent passage of each chunk
+#       ivf_*.npy        optional IVF centroids, list offsets and row ids (ANN_MIN_CHUNKS and up)
+#       bm25_*.npy       BM25 inverted index of the chunks: sorted term ids, posting offsets,
+#                        posting rows and frequencies, chunk lengths (see lexical_index)
+#
+# Versions are immutable: a new upload writes a fresh version directory and then
+# swaps CURRENT atomically, so workers that still map the old files are unaffected.
+# Format 1 stored raw float32 embeddings; they are normalized when loaded.
+FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+# Rows scored per step for non-float32 storage, bounding the float32 temporary
+SCORE_BLOCK_ROWS = 8192
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so cosine similarity becomes a plain dot product."""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+def quantize_embeddings(embeddings: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Convert normalized float32 embeddings to the storage dtype.
+
+    int8 uses symmetric scalar quantization with one scale per dimension.
+    Returns (matrix, scales), scales being None for float storage.
+    """
+    if dtype == "float32":
+        return np.ascontiguousarray(embeddings, dtype=np.float32), None
+    if dtype == "float16":
+        return np.ascontiguousarray(embeddings, dtype=np.float16), None
+    if dtype == "int8":
+        scales = np.abs(embeddings).max(axis=0) / 127.0 if len(embeddings) else np.ones(embeddings.shape[-1])
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(embeddings / scales), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unsupported storage dtype: {dtype} (expected one of {', '.join(STORAGE_DTYPES)})")
+
+def score_embeddings(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None,
+                     out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Dot product of every stored row with a normalized float32 query."""
+    if scales is not None:
+        # codes * scales . q == codes . (q * scales)
+        query = query * scales
+    if out is None:
+        out = np.empty(len(matrix), dtype=np.float32)
+    if matrix.dtype == np.float32:
+        np.dot(matrix, query, out=out)
+        return out
+    for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+        block = matrix[start:start + SCORE_BLOCK_ROWS]
+        out[start:start + len(block)] = block.astype(np.float32) @ query
+    return out
+
+def document_dir(candidate_id: int, doc_type: str) -> str:
+    """Directory holding all stored versions of a candidate document."""
+    return os.path.join(VECTORS_DIR, f"candidate_{candidate_id}_{doc_type}")
+
+BM25_FILES = ("offsets", "rows", "freqs", "lengths", "terms")
+
+def save_keyword_index(version_dir: str, chunks: List[str]):
+    """Write the BM25 index of a version's chunks, for hybrid search.
+
+    bm25_terms.npy is renamed into place last: once it exists, the index is complete.
+    """
+    arrays = dict(zip(("terms", "offsets", "rows", "freqs", "lengths"), build_bm25(chunks)))
+    for name in BM25_FILES:
+        path = os.path.join(version_dir, f"bm25_{name}.npy")
+        with open(f"{path}.tmp", "wb") as f:
+            np.save(f, arrays[name])
+        os.replace(f"{path}.tmp", path)
+
+def save_document_vectors(candidate_id: int, doc_type: str, chunks: List[str],
+                          metadata: List[dict], embeddings: np.ndarray, source: str,
+                          dtype: Optional[str] = None, hashes: Optional[List[bytes]] = None,
+                          parents: Optional[List[str]] = None) -> str:
+    """Write a new version of a candidate document and make it current. Returns its path.
+
+    With parents, each chunk's metadata gives the index of its parent passage under "parent".
+    """
+    dtype = dtype or settings.VECTOR_STORAGE_DTYPE
+    normalized = normalize_embeddings(embeddings)
+    matrix, scales = quantize_embeddings(normalized, dtype)
+
+    base_dir = document_dir(candidate_id, doc_type)
+    version = f"v{time.time_ns()}_{os.getpid()}"
+    version_dir = os.path.join(base_dir, version)
+    os.makedirs(version_dir)
+
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+
+    np.save(os.path.join(version_dir, "embeddings.npy"), matrix)
+    if scales is not None:
+        np.save(os.path.join(version_dir, "scales.npy"), scales)
+    np.save(os.path.join(version_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(version_dir, "pages.npy"),
+            np.array([m.get("page", 0) for m in metadata], dtype=np.int32))
+    np.save(os.path.join(version_dir, "chunk_ids.npy"),
+            np.array([m.get("chunk", 0) for m in metadata], dtype=np.int32))
+    with open(os.path.join(version_dir, "chunks.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    if hashes is not None:
+        np.save(os.path.join(version_dir, "hashes.npy"),
+                np.frombuffer(b"".join(hashes), dtype=np.uint8).reshape(len(hashes), -1))
+
+    if parents is not None:
+        encoded_parents = [parent.encode("utf-8") for parent in parents]
+        parent_offsets = np.zeros(len(encoded_parents) + 1, dtype=np.int64)
+        parent_offsets[1:] = np.cumsum([len(data) for data in encoded_parents])
+        np.save(os.path.join(version_dir, "parent_offsets.npy"), parent_offsets)
+        np.save(os.path.join(version_dir, "parent_ids.npy"),
+                np.array([m["parent"] for m in metadata], dtype=np.int32))
+        with open(os.path.join(version_dir, "parents.bin"), "wb") as f:
+            f.write(b"".join(encoded_parents))
+
+    save_keyword_index(version_dir, chunks)
+
+    # Large documents also get an approximate nearest-neighbour index
+    ann = None
+    if len(chunks) >= settings.ANN_MIN_CHUNKS:
+        centroids, list_offsets, list_rows = build_ivf(normalized)
+        np.save(os.path.join(version_dir, "ivf_centroids.npy"), centroids)
+        np.save(os.path.join(version_dir, "ivf_offsets.npy"), list_offsets)
+        np.save(os.path.join(version_dir, "ivf_rows.npy"), list_rows)
+        ann = {"type": "ivf", "n_lists": len(centroids)}
+    with open(os.path.join(version_dir, "meta.json"), "w") as f:
+        json.dump({
+            "format_version": FORMAT_VERSION,
+            "candidate_id": candidate_id,
+            "doc_type": doc_type,
+            "source": source,
+            "count": len(chunks),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "dtype": dtype,
+            "normalized": True,
+            "ann": ann,
+            "created_at": time.time()
+        }, f)
+
+    # Swap CURRENT atomically, then drop superseded versions
+    current_file = os.path.join(base_dir, "CURRENT")
+    with open(f"{current_file}.{version}", "w") as f:
+        f.write(version)
+    os.replace(f"{current_file}.{version}", current_file)
+
+    for name in os.listdir(base_dir):
+        path = os.path.join(base_dir, name)
+        if name != version and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+    return version_dir
+
+class ChunkTexts:
+    """Read-only sequence of chunk texts decoded on access from the memory-mapped chunks.bin."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray):
+        self._data = data
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+class DocumentVectors:
+    """Memory-mapped chunks, metadata and embeddings of one candidate document."""
+
+    def __init__(self, path: str, version: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("format_version") not in SUPPORTED_FORMAT_VERSIONS:
+            raise ValueError(f"Unsupported vector format in {path}: {self.meta.get('format_version')}")
+
+        self.doc_type = self.meta["doc_type"]
+        self.source = self.meta.get("source", "Unknown")
+        self.version = version
+        # Read-only mappings: pages are shared between worker processes via the page cache
+        self.embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.scales = None
+        if self.meta.get("dtype") == "int8":
+            self.scales = np.load(os.path.join(path, "scales.npy"))
+        elif not self.meta.get("normalized"):
+            # Format 1: raw embeddings, normalized once into a private copy
+            self.embeddings = normalize_embeddings(self.embeddings)
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self.pages = np.load(os.path.join(path, "pages.npy"), mmap_mode="r")
+        self.chunk_ids = np.load(os.path.join(path, "chunk_ids.npy"), mmap_mode="r")
+        if self.offsets[-1] > 0:
+            text_data = np.memmap(os.path.join(path, "chunks.bin"), dtype=np.uint8, mode="r")
+        else:
+            text_data = np.zeros(0, dtype=np.uint8)
+        self.chunks = ChunkTexts(text_data, self.offsets)
+        self.parents = None
+        self.parent_ids = None
+        self.parent_offsets = None
+        if os.path.exists(os.path.join(path, "parent_ids.npy")):
+            self.parent_ids = np.load(os.path.join(path, "parent_ids.npy"), mmap_mode="r")
+            self.parent_offsets = np.load(os.path.join(path, "parent_offsets.npy"), mmap_mode="r")
+            if self.parent_offsets[-1] > 0:
+                parent_data = np.memmap(os.path.join(path, "parents.bin"), dtype=np.uint8, mode="r")
+            else:
+                parent_data = np.zeros(0, dtype=np.uint8)
+            self.parents = ChunkTexts(parent_data, self.parent_offsets)
+        self.hashes = None
+        if os.path.exists(os.path.join(path, "hashes.npy")):
+            self.hashes = np.load(os.path.join(path, "hashes.npy"), mmap_mode="r")
+        self.bm25 = None
+        if os.path.exists(os.path.join(path, "bm25_terms.npy")):
+            self.bm25 = BM25Index(*(
+                np.load(os.path.join(path, f"bm25_{name}.npy"), mmap_mode="r")
+                for name in ("terms", "offsets", "rows", "freqs", "lengths")
+            ))
+        self.ivf = None
+        if (self.meta.get("ann") or {}).get("type") == "ivf":
+            self.ivf = IVFIndex(
+                np.load(os.path.join(path, "ivf_centroids.npy")),
+                np.load(os.path.join(path, "ivf_offsets.npy")),
+                np.load(os.path.join(path, "ivf_rows.npy"), mmap_mode="r")
+            )
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate mapped size, used for cache accounting."""
+        parents = 0
+        if self.parents is not None:
+            parents = int(self.parent_offsets[-1]) + self.parent_offsets.nbytes + self.parent_ids.nbytes
+        return (self.embeddings.nbytes + int(self.offsets[-1]) + self.offsets.nbytes +
+                self.pages.nbytes + self.chunk_ids.nbytes + parents + (self.ivf.nbytes if self.ivf else 0) +
+                (self.bm25.nbytes if self.bm25 else 0))
+
+class CandidateIndex:
+    """All processed documents of a candidate behind one score vector.
+
+    Each document type is a segment of rows in a shared row space, with parallel
+    arrays giving each row's document type. Segments keep their memory-mapped,
+    pre-normalized storage, so a query is a dot product per segment written into
+    one score buffer, followed by a single argpartition top-k.
+
+    Candidates with at least ANN_MIN_CHUNKS rows switch to approximate search:
+    segments carrying an IVF index only score the ANN_NPROBE closest lists,
+    while small segments are still scored exhaustively.
+    """
+
+    def __init__(self, segments: List[DocumentVectors]):
+        self.segments = segments
+        self.version = tuple((seg.doc_type, seg.version) for seg in segments)
+        self.doc_types = [seg.doc_type for seg in segments]
+
+        sizes = [len(seg) for seg in segments]
+        self.segment_starts = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self.doc_type_codes = np.repeat(np.arange(len(segments), dtype=np.int8), sizes)
+
+    def __len__(self) -> int:
+        return int(self.segment_starts[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size, used for cache accounting."""
+        return self.doc_type_codes.nbytes + sum(seg.nbytes for seg in self.segments)
+
+    @timed("similarity")
+    def search(self, query_embedding: np.ndarray, n_results: int = 5,
+               doc_types: Optional[List[str]] = None,
+               weights: Optional[Dict[str, float]] = None,
+               query_text: Optional[str] = None) -> List[dict]:
+        """Return the top n_results chunks for a query embedding.
+
+        doc_types restricts the search to some document types and weights scales
+        each type's similarity, both applied on the score vector without rescanning.
+        With query_text (and HYBRID_SEARCH_ENABLED), the best HYBRID_CANDIDATES
+        rows by similarity and by BM25 keyword score are merged by reciprocal
+        rank fusion, so exact terms the embedding blurs still rank.
+        """
+        if len(self) == 0 or n_results <= 0:
+            return []
+
+        query = normalize_embeddings(query_embedding)
+        use_ann = settings.ANN_NPROBE > 0 and len(self) >= settings.ANN_MIN_CHUNKS
+        hybrid = (query_text is not None and settings.HYBRID_SEARCH_ENABLED and
+                  any(seg.bm25 is not None for seg in self.segments))
+        n_candidates = max(n_results, settings.HYBRID_CANDIDATES) if hybrid else n_results
+        rows, similarities = self._score(query, use_ann, min_rows=n_candidates)
+        scores = similarities
+
+        type_weights = None
+        if doc_types is not None or weights:
+            type_weights = np.array([
+                (weights or {}).get(doc_type, 1.0) if doc_types is None or doc_type in doc_types else 0.0
+                for doc_type in self.doc_types
+            ], dtype=np.float32)
+            row_weights = type_weights[self.doc_type_codes[rows]]
+            # Weights raise or lower a row's rank whatever the sign of its similarity
+            with np.errstate(divide="ignore"):
+                weighted = np.where(similarities >= 0, similarities * row_weights, similarities / row_weights)
+            scores = np.where(row_weights > 0, weighted, -np.inf)
+
+        k = min(n_candidates, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        top = top[np.isfinite(scores[top])]
+        hits = dict(zip(rows[top].tolist(), similarities[top].tolist()))
+
+        ranking = rows[top]
+        if hybrid:
+            keyword_scores = bm25_scores([seg.bm25 for seg in self.segments], self.segment_starts, query_text)
+            if type_weights is not None:
+                keyword_scores *= type_weights[self.doc_type_codes]
+            matched = np.flatnonzero(keyword_scores > 0)
+            if len(matched):
+                if len(matched) > n_candidates:
+                    matched = matched[np.argpartition(-keyword_scores[matched], n_candidates - 1)[:n_candidates]]
+                keyword_ranking = matched[np.argsort(-keyword_scores[matched], kind="stable")]
+                ranking, _ = reciprocal_rank_fusion([ranking, keyword_ranking], [1.0, settings.HYBRID_LEXICAL_WEIGHT])
+
+        results = []
+        for row in ranking[:n_results].tolist():
+            code = self.doc_type_codes[row]
+            segment = self.segments[code]
+            local = int(row - self.segment_starts[code])
+            similarity = hits.get(row)
+            if similarity is None:
+                # Found by keywords only (or outside the probed ANN lists)
+                similarity = float(score_embeddings(segment.embeddings[local:local + 1], query, segment.scales)[0])
+            result = {
+                "text": segment.chunks[local],
+                "page": int(segment.pages[local]),
+                "source": segment.source,
+                "doc_type": segment.doc_type,
+                "similarity": similarity
+            }
+            if segment.parents is not None:
+                # Matched on a small unit; the passage around it goes to the prompt
+                result["parent"] = segment.parents[int(segment.parent_ids[local])]
+            results.append(result)
+        return results
+
+    def _score(self, query: np.ndarray, use_ann: bool, min_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Score rows against a query. Returns (row ids, similarities)."""
+        if not use_ann or all(seg.ivf is None for seg in self.segments):
+            similarities = np.empty(len(self), dtype=np.float32)
+            for code, segment in enumerate(self.segments):
+                start, end = self.segment_starts[code], self.segment_starts[code + 1]
+                score_embeddings(segment.embeddings, query, segment.scales, out=similarities[start:end])
+            return np.arange(len(self)), similarities
+
+        all_rows, all_similarities = [], []
+        for code, segment in enumerate(self.segments):
+            if segment.ivf is not None:
+                local = np.sort(segment.ivf.probe(query, settings.ANN_NPROBE, min_rows=min_rows))
+                similarities = score_embeddings(segment.embeddings[local], query, segment.scales)
+            else:
+                local = np.arange(len(segment))
+                similarities = score_embeddings(segment.embeddings, query, segment.scales)
+            all_rows.append(local + self.segment_starts[code])
+            all_similarities.append(similarities)
+        return np.concatenate(all_rows), np.concatenate(all_similarities)
+
+class VectorStore:
+    """Per-process cache of candidate indexes, bounded by memory (LRU by bytes).
+
+    Entries are keyed by candidate and revalidated against each document's
+    CURRENT pointer on every access, so a new version written by another
+    worker is picked up without restarting.
+    """
+
+    def __init__(self, max_bytes: int, doc_types: List[str]):
+        self.doc_types = doc_types
+        self._cache = LRUCache(max_bytes=max_bytes, sizeof=lambda index: index.nbytes)
+
+    def load(self, candidate_id: int, doc_type: str) -> Optional[DocumentVectors]:
+        """Open the current version of a candidate document, or None if it was never processed."""
+        base_dir = document_dir(candidate_id, doc_type)
+        for attempt in range(2):
+            version = self._current_version(candidate_id, doc_type)
+            if version is None:
+                return None
+            try:
+                return DocumentVectors(os.path.join(base_dir, version), version)
+            except FileNotFoundError:
+                # Version was superseded and removed while we were opening it; re-read CURRENT
+                if attempt:
+                    raise
+
+    @timed("load_index")
+    def load_index(self, candidate_id: int) -> Optional[CandidateIndex]:
+        """Return the unified index of a candidate, or None if no document was processed."""
+        versions = []
+        for doc_type in self.doc_types:
+            version = self._current_version(candidate_id, doc_type)
+            if version is not None:
+                versions.append((doc_type, version))
+        versions = tuple(versions)
+        if not versions:
+            self._cache.pop(candidate_id)
+            return None
+
+        cached = self._cache.get(candidate_id)
+        if cached is not None and cached.version == versions:
+            return cached
+
+        segments = [self.load(candidate_id, doc_type) for doc_type, _ in versions]
+        index = CandidateIndex([segment for segment in segments if segment is not None])
+        self._cache.put(candidate_id, index)
+        return index
+
+    def invalidate(self, candidate_id: int):
+        """Drop the cached index of a candidate."""
+        self._cache.pop(candidate_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+    def _current_version(self, candidate_id: int, doc_type: str) -> Optional[str]:
+        try:
+            with open(os.path.join(document_dir(candidate_id, doc_type), "CURRENT")) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+vector_store = VectorStore(
+    max_bytes=settings.VECTOR_CACHE_MAX_MB * 1024 * 1024,
+    doc_types=["program", "talking_points", "competitive"]
+)
@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { program } from '../utils/api';
+import { program, jobs } from '../utils/api';
 
 export default function ProgramUpload({ user, onUploadComplete }) {
   const [file, setFile] = useState(null);
@@ -49,7 +49,10 @@ export default function ProgramUpload({ user, onUploadComplete }) {
         setUploadProgress(progress);
       });
 
-      setSuccess(`Program uploaded and processed successfully! ${response.data.details.total_chunks} sections indexed.`);
+      // Processing runs in the background; wait for the ingestion job to finish
+      const job = await jobs.waitFor(response.data.job_id);
+
+      setSuccess(`Program uploaded and processed successfully! ${job.result.total_chunks} sections indexed.`);
       setFile(null);
       
       // Reset file input
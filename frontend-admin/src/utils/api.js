@@ -17,6 +17,25 @@ export const auth = {
   me: () => axios.get(`${API_BASE}/auth/me`, { headers: getAuthHeaders() }).catch(handleError),
 };
 
+export const jobs = {
+  get: (jobId) =>
+    axios.get(`${API_BASE}/jobs/${jobId}`, { headers: getAuthHeaders() }).catch(handleError),
+  // Poll an ingestion job until it finishes; resolves with the job, rejects on failure
+  waitFor: async (jobId, onProgress, intervalMs = 1000) => {
+    while (true) {
+      const { data: job } = await jobs.get(jobId);
+      if (onProgress) onProgress(job);
+      if (job.status === 'succeeded') return job;
+      if (job.status === 'failed') {
+        const error = new Error(job.error || 'Processing failed');
+        error.response = { data: { detail: `Error processing document: ${job.error}` } };
+        throw error;
+      }
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
+};
+
 export const program = {
   upload: (file, onProgress) => {
     const formData = new FormData();
@@ -31,7 +50,7 @@ export const program = {
   },
 };
 
-export const uploadTalkingPoints = async (file) => {
+export const uploadTalkingPoints = async (file, onProgress) => {
   const formData = new FormData();
   formData.append('file', file);
   const response = await axios.post(`${API_BASE}/talking-points/upload`, formData, {
@@ -40,10 +59,11 @@ export const uploadTalkingPoints = async (file) => {
       'Content-Type': 'multipart/form-data',
     },
   }).catch(handleError);
-  return response.data;
+  // Processing runs in the background; wait for the ingestion job to finish
+  return jobs.waitFor(response.data.job_id, onProgress);
 };
 
-export const uploadCompetitive = async (file) => {
+export const uploadCompetitive = async (file, onProgress) => {
   const formData = new FormData();
   formData.append('file', file);
   const response = await axios.post(`${API_BASE}/competitive/upload`, formData, {
@@ -52,7 +72,8 @@ export const uploadCompetitive = async (file) => {
       'Content-Type': 'multipart/form-data',
     },
   }).catch(handleError);
-  return response.data;
+  // Processing runs in the background; wait for the ingestion job to finish
+  return jobs.waitFor(response.data.job_id, onProgress);
 };
 
 export const agent = {
@@ -53,28 +53,78 @@ export default function Chat() {
     setMessages(prev => [...prev, { type: 'user', text: userMessage }]);
     setSending(true);
 
+    let started = false;
+
     try {
-      const response = await axios.post(`/api/chat/${slug}/message`, {
-        question: userMessage
+      // Stream the answer so it appears as it is generated
+      const response = await fetch(`/api/chat/${slug}/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ question: userMessage })
       });
 
-      // Add assistant response
-      setMessages(prev => [...prev, {
-        type: 'assistant',
-        text: response.data.answer,
-        cached: response.data.cached
-      }]);
+      if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw { status: response.status, detail: data.detail };
+      }
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      const updateAnswer = (update) => {
+        setMessages(prev => {
+          const last = prev[prev.length - 1];
+          return [...prev.slice(0, -1), update(last)];
+        });
+      };
 
-      setRemaining(response.data.remaining_messages);
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const event of events) {
+          if (!event.startsWith('data: ')) continue;
+          const data = JSON.parse(event.slice(6));
+
+          if (data.type === 'delta') {
+            if (!started) {
+              // Add assistant response
+              started = true;
+              setMessages(prev => [...prev, { type: 'assistant', text: data.content }]);
+            } else {
+              updateAnswer(last => ({ ...last, text: last.text + data.content }));
+            }
+          } else if (data.type === 'error') {
+            if (!started) {
+              started = true;
+              setMessages(prev => [...prev, { type: 'assistant', text: data.message }]);
+            } else {
+              updateAnswer(last => ({ ...last, text: data.message }));
+            }
+          } else if (data.type === 'done') {
+            if (started) {
+              updateAnswer(last => ({ ...last, cached: data.cached }));
+            }
+            setRemaining(data.remaining_messages);
+          }
+        }
+      }
     } catch (err) {
-      if (err.response?.status === 429) {
+      if (err.status === 429) {
         setError('Vous avez atteint la limite quotidienne de 20 messages. Revenez demain !');
       } else {
-        setError(err.response?.data?.detail || 'Erreur lors de l\'envoi du message');
+        setError(err.detail || 'Erreur lors de l\'envoi du message');
       }
       
-      // Remove user message on error
-      setMessages(prev => prev.slice(0, -1));
+      // Remove user message on error (keep a partially streamed answer)
+      if (!started) {
+        setMessages(prev => prev.slice(0, -1));
+      }
     } finally {
       setSending(false);
     }
@@ -153,7 +203,7 @@ export default function Chat() {
               </div>
             ))}
             
-            {sending && (
+            {sending && messages[messages.length - 1]?.type === 'user' && (
               <div className="flex justify-start">
                 <div className="bg-gray-100 rounded-lg px-4 py-3">
                   <div className="flex gap-1">
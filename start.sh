@@ -30,7 +30,8 @@ mkdir -p backend/chroma_db
 echo "Starting backend (FastAPI on port 8000)..."
 cd backend
 source venv/bin/activate
-python main.py > ../backend.log 2>&1 &
+python migrate_vectors.py > ../backend.log 2>&1
+python main.py >> ../backend.log 2>&1 &
 BACKEND_PID=$!
 echo "✓ Backend started (PID: $BACKEND_PID)"
 cd ..